@@ -0,0 +1,66 @@
+# admission.py - Pre-flight checks on a video before any audio is downloaded
+# YouTube metadata decides whether a video is transcribed, at what priority and with which Whisper model
+
+import re
+
+_ISO_DURATION = re.compile(r"^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+class AdmissionRejected(Exception):
+    """The video cannot be transcribed within the configured budgets"""
+
+
+def parse_duration(value):
+    """Seconds in an ISO 8601 duration such as PT1H2M3S, or None if unparseable"""
+    match = _ISO_DURATION.match(value or "")
+    if not match or value == "P":
+        return None
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def video_info(item):
+    """Admission-relevant fields of a YouTube videos().list item"""
+    snippet = item.get("snippet", {})
+    details = item.get("contentDetails", {})
+    return {
+        "video_id": item.get("id"),
+        "title": snippet.get("title"),
+        "duration": parse_duration(details.get("duration")),
+        "captions": details.get("caption") == "true",
+        "live": snippet.get("liveBroadcastContent", "none"),  # none | live | upcoming
+    }
+
+
+class AdmissionPolicy:
+    """Decides whether and how a video without captions is transcribed (0 disables a budget)"""
+
+    def __init__(self, max_minutes=0, low_priority_minutes=0, small_model_minutes=0, small_model=None):
+        self.max_minutes = max_minutes                    # Longer videos are rejected
+        self.low_priority_minutes = low_priority_minutes  # Longer videos wait behind shorter ones
+        self.small_model_minutes = small_model_minutes    # Longer videos use small_model
+        self.small_model = small_model
+
+    def decide(self, info):
+        """Return {"low_priority", "model", "reason"}; model None means the default model
+
+        Raises AdmissionRejected for live streams, premieres and videos over the length limit.
+        Videos without metadata are admitted, leaving the download limits as the only guard.
+        """
+        if info is None or info.get("live") == "none" and info.get("duration") is None:
+            return {"low_priority": False, "model": None, "reason": "no metadata"}
+        if info.get("live") == "live":
+            raise AdmissionRejected("Live streams can be summarized once the broadcast has ended.")
+        if info.get("live") == "upcoming":
+            raise AdmissionRejected("This premiere or scheduled stream has not started yet.")
+
+        minutes = info["duration"] / 60
+        if self.max_minutes and minutes > self.max_minutes:
+            raise AdmissionRejected(
+                f"Video is {minutes:.0f} minutes long; audio transcription is limited to {self.max_minutes} minutes.")
+
+        low_priority = bool(self.low_priority_minutes and minutes > self.low_priority_minutes)
+        model = None
+        if self.small_model and self.small_model_minutes and minutes > self.small_model_minutes:
+            model = self.small_model
+        return {"low_priority": low_priority, "model": model, "reason": f"{minutes:.0f} min"}
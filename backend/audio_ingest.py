@@ -0,0 +1,259 @@
+# audio_ingest.py - Fetch YouTube audio as 16 kHz mono PCM for Whisper
+# yt-dlp streams the audio track into ffmpeg, which pipes raw samples back to us
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+SAMPLE_RATE = 16000          # Whisper's native sample rate
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # Mono, 16-bit samples
+_READ_SIZE = 1 << 16
+
+_PROGRESS = re.compile(r'\[download\]\s+([\d.]+)%')
+
+# Fingerprints: 32 bits per 64 ms hop from energy differences between 33 bands (300-3000 Hz)
+# in overlapping 375 ms frames; the overlap keeps bits stable when two copies start a little apart
+_FP_FRAME = 6000
+_FP_HOP = 1024
+_FP_BANDS = 33
+_FP_BLOCK = 256  # Frames per FFT batch, bounding memory on long audio
+
+
+class IngestCancelled(Exception):
+    """Raised when the caller cancels an in-progress download"""
+
+
+def to_float32(samples):
+    """Samples in Whisper's float32 range; int16 PCM (e.g. a spooled memmap slice) is converted"""
+    if samples.dtype == np.int16:
+        return np.multiply(samples, np.float32(1 / 32768), dtype=np.float32)
+    return np.asarray(samples, dtype=np.float32)
+
+
+@lru_cache(maxsize=1)
+def find_tools():
+    """Locate yt-dlp and ffmpeg once per process"""
+    return {"yt-dlp": shutil.which("yt-dlp"), "ffmpeg": shutil.which("ffmpeg")}
+
+
+def require_tools(*names):
+    """Raise a helpful error if a required tool is missing"""
+    tools = find_tools()
+    for name in names:
+        if not tools.get(name):
+            hint = "pip install yt-dlp" if name == "yt-dlp" else "install ffmpeg and add it to PATH"
+            raise RuntimeError(f"{name} not installed. Install with: {hint}")
+    return tools
+
+
+def _watch(processes, cancel_event, deadline, finished, state):
+    """Kill the pipeline on cancel or timeout so blocked reads return"""
+    while not finished.wait(0.2):
+        if cancel_event is not None and cancel_event.is_set():
+            state["cancelled"] = True
+        elif time.monotonic() > deadline:
+            state["timed_out"] = True
+        else:
+            continue
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+        return
+
+
+def decode_file(path):
+    """Decode an audio file to a 16 kHz mono float32 array with ffmpeg"""
+    tools = require_tools("ffmpeg")
+    result = subprocess.run(
+        [tools["ffmpeg"], "-nostdin", "-loglevel", "error", "-i", path,
+         "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Audio decoding failed: {result.stderr.decode('utf-8', 'replace')[:500]}")
+    audio = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+
+def fingerprint(audio, max_seconds=300):
+    """Spectral fingerprint of the first max_seconds of 16 kHz audio, one uint32 per hop
+
+    Each bit is the sign of a change in the energy difference of two neighbouring bands, which
+    survives re-encoding, resampling and volume changes but not different content.
+    Frames 20 dB below the median are 0; silent audio has no usable fingerprint and yields an empty array.
+    """
+    audio = to_float32(audio[:int(max_seconds * SAMPLE_RATE)])
+    if len(audio) < _FP_FRAME + _FP_HOP or np.sqrt(np.mean(np.square(audio))) < 1e-4:
+        return np.zeros(0, dtype=np.uint32)
+
+    frequencies = np.fft.rfftfreq(_FP_FRAME, 1 / SAMPLE_RATE)
+    edges = np.searchsorted(frequencies, np.geomspace(300, 3000, _FP_BANDS + 1))
+    window = np.hanning(_FP_FRAME).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, _FP_FRAME)[::_FP_HOP]
+
+    energy = np.empty((len(frames), _FP_BANDS), dtype=np.float32)
+    for start in range(0, len(frames), _FP_BLOCK):
+        power = np.abs(np.fft.rfft(frames[start:start + _FP_BLOCK] * window, axis=1)) ** 2
+        energy[start:start + _FP_BLOCK] = np.add.reduceat(power[:, edges[0]:edges[-1]], edges[:-1] - edges[0], axis=1)
+
+    bands = energy[:, :-1] - energy[:, 1:]
+    bits = bands[1:] - bands[:-1] > 0
+    words = np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+    # Bits of pauses are mostly noise; quiet frames become 0, which comparisons skip
+    loudness = energy.sum(axis=1)[1:]
+    words[loudness < 0.01 * np.median(loudness)] = 0
+    return words
+
+
+def fingerprint_distance(a, b, max_shift=32, min_frames=150):
+    """Bit error rate of the best alignment within +-max_shift hops (0 = same audio, ~0.5 = unrelated)
+
+    Fingerprints may be arrays or their stored bytes. Only hops that are loud in both count;
+    too little overlap gives 1.0.
+    """
+    a, b = (np.frombuffer(f, dtype="<u4") if isinstance(f, bytes) else np.asarray(f, dtype=np.uint32)
+            for f in (a, b))
+    best = 1.0
+    for shift in range(-max_shift, max_shift + 1):
+        x, y = a[max(0, shift):], b[max(0, -shift):]
+        count = min(len(x), len(y))
+        x, y = x[:count], y[:count]
+        loud = (x != 0) & (y != 0)
+        frames = int(loud.sum())
+        if frames < min_frames:
+            continue
+        errors = int(np.unpackbits((x[loud] ^ y[loud]).view(np.uint8)).sum())
+        best = min(best, errors / (32 * frames))
+    return best
+
+
+def stream_audio(video_id, cancel_event=None, on_progress=None, timeout=300,
+                 max_seconds=3 * 3600, spool_dir=None):
+    """Return the video's audio at 16 kHz, without ever writing an intermediate WAV
+
+    Samples are collected in memory and returned as float32. With spool_dir they go to a temp
+    file instead and come back as a read-only int16 memmap; consumers convert one slice at a
+    time with to_float32, so the audio is never held in RAM as a whole. The file is unlinked
+    at once and its pages are freed with the mapping. Windows cannot unlink a mapped file, so
+    there the spool is converted to an in-memory float32 array as in stream mode.
+    """
+    tools = require_tools("yt-dlp", "ffmpeg")
+    max_bytes = int(max_seconds * BYTES_PER_SECOND)
+
+    downloader = subprocess.Popen(
+        [
+            tools["yt-dlp"],
+            "--no-warnings",
+            "--newline",
+            "-f", "bestaudio/best",
+            "--max-filesize", "100M",  # Size limit on the compressed source
+            "-o", "-",                 # Write media to stdout
+            f"https://www.youtube.com/watch?v={video_id}"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    decoder = subprocess.Popen(
+        [
+            tools["ffmpeg"], "-nostdin", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "pipe:1"
+        ],
+        stdin=downloader.stdout,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    downloader.stdout.close()  # ffmpeg owns the pipe now
+
+    # yt-dlp reports progress on stderr when media goes to stdout
+    download_errors = []
+    def read_progress():
+        for raw in downloader.stderr:
+            line = raw.decode("utf-8", "replace")
+            match = _PROGRESS.search(line)
+            if match:
+                if on_progress:
+                    on_progress(float(match.group(1)) / 100)
+            elif line.strip():
+                download_errors.append(line)
+    decode_errors = []
+    def read_decoder_errors():
+        decode_errors.extend(line.decode("utf-8", "replace") for line in decoder.stderr)
+
+    finished = threading.Event()
+    state = {"cancelled": False, "timed_out": False}
+    threads = [
+        threading.Thread(target=read_progress, daemon=True),
+        threading.Thread(target=read_decoder_errors, daemon=True),
+        threading.Thread(target=_watch, daemon=True, args=(
+            [downloader, decoder], cancel_event, time.monotonic() + timeout, finished, state)),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Unique per-call spool file, so concurrent requests never collide
+    spool = None
+    if spool_dir is not None:
+        spool = tempfile.NamedTemporaryFile(dir=spool_dir, prefix=f"widviz_{video_id}_",
+                                            suffix=".pcm", delete=False)
+    buffer = bytearray()
+    size = 0
+    try:
+        while True:
+            data = decoder.stdout.read(_READ_SIZE)
+            if not data:
+                break
+            size += len(data)
+            if size > max_bytes:
+                raise RuntimeError(f"Audio is longer than the {max_seconds // 60} minute limit")
+            if spool:
+                spool.write(data)
+            else:
+                buffer.extend(data)
+
+        decoder.wait()
+        downloader.wait()
+        finished.set()
+        for thread in threads[:2]:
+            thread.join(timeout=5)
+
+        if state["cancelled"]:
+            raise IngestCancelled()
+        if state["timed_out"]:
+            raise RuntimeError(f"Download took too long (max {timeout // 60} minutes)")
+        if downloader.returncode != 0:
+            raise RuntimeError(f"Download failed: {''.join(download_errors)[:500]}")
+        if decoder.returncode != 0 or size == 0:
+            raise RuntimeError(f"Audio decoding failed: {''.join(decode_errors)[:500]}")
+
+        # Drop a trailing odd byte
+        if spool:
+            spool.close()
+            pcm = np.memmap(spool.name, dtype=np.int16, mode="r", shape=(size // 2,))
+            if os.name != "nt":
+                os.remove(spool.name)  # The mapping keeps the samples readable until released
+                return pcm
+        else:
+            pcm = np.frombuffer(buffer, dtype=np.int16, count=size // 2)
+        audio = to_float32(pcm)
+        del pcm  # Release the mapping so the spool file can be deleted on Windows
+        return audio
+    finally:
+        finished.set()
+        for process in (downloader, decoder):
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if spool:
+            spool.close()
+            if os.path.exists(spool.name):
+                os.remove(spool.name)
@@ -0,0 +1,168 @@
+# db_query_benchmark.py - Query plans and latencies of the notes/goals hot queries
+# Usage: python benchmarks/db_query_benchmark.py [--users 200] [--goals-per-user 2000]
+# Seeds a scratch database at schema version 2, measures, applies the index migration, measures again
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb.cursors  # noqa: E402
+from migrations import LATEST_VERSION, connect, migrate  # noqa: E402
+
+BATCH = 5000
+
+# The calendar query before and after it was made sargable, plus the notes list page
+QUERIES = {
+    "goals_month_functions": (
+        "SELECT id, goal_text, DATE(goal_date) AS goal_date, status FROM goals "
+        "WHERE email = %(email)s AND MONTH(goal_date) = %(month)s AND YEAR(goal_date) = %(year)s"
+    ),
+    "goals_month_range": (
+        "SELECT id, goal_text, goal_date, status FROM goals "
+        "WHERE email = %(email)s AND goal_date >= %(start)s AND goal_date < %(end)s"
+    ),
+    "notes_list_page": (
+        "SELECT id, title, LEFT(content, 120) AS preview, created_at, updated_at FROM notes "
+        "WHERE user_email = %(email)s AND deleted_at IS NULL "
+        "ORDER BY created_at DESC, id DESC LIMIT 51"
+    ),
+}
+
+
+def seed(conn, users, goals_per_user, notes_per_user, rng):
+    """Insert users with goals spread over three years and notes spread over one"""
+    cur = conn.cursor()
+    emails = [f"bench{i}@example.com" for i in range(users)]
+    cur.executemany("INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
+                    [(email.split("@")[0], email, "x") for email in emails])
+
+    first_day = date.today() - timedelta(days=365)
+    rows = []
+    for email in emails:
+        for _ in range(goals_per_user):
+            goal_date = first_day + timedelta(days=rng.randrange(3 * 365))
+            rows.append((email, "Benchmark goal", goal_date, rng.choice(("pending", "completed"))))
+            if len(rows) >= BATCH:
+                cur.executemany("INSERT INTO goals (email, goal_text, goal_date, status) "
+                                "VALUES (%s, %s, %s, %s)", rows)
+                rows = []
+    if rows:
+        cur.executemany("INSERT INTO goals (email, goal_text, goal_date, status) "
+                        "VALUES (%s, %s, %s, %s)", rows)
+
+    rows = []
+    for email in emails:
+        for i in range(notes_per_user):
+            created_at = first_day + timedelta(seconds=rng.randrange(365 * 86400))
+            rows.append((email, f"Note {i}", "Lorem ipsum dolor sit amet. " * 20, created_at))
+            if len(rows) >= BATCH:
+                cur.executemany("INSERT INTO notes (user_email, title, content, created_at) "
+                                "VALUES (%s, %s, %s, %s)", rows)
+                rows = []
+    if rows:
+        cur.executemany("INSERT INTO notes (user_email, title, content, created_at) "
+                        "VALUES (%s, %s, %s, %s)", rows)
+
+    conn.commit()
+    cur.execute("ANALYZE TABLE goals, notes")
+    cur.fetchall()
+    cur.close()
+    return emails
+
+
+def measure(conn, emails, repeats, rng):
+    """EXPLAIN each query once, then time it for randomly chosen users and months"""
+    cur = conn.cursor(MySQLdb.cursors.DictCursor)
+    today = date.today()
+    start = today.replace(day=1)
+    end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+    results = {}
+    for name, sql in QUERIES.items():
+        params = {"email": emails[0], "month": start.month, "year": start.year,
+                  "start": start, "end": end}
+        cur.execute("EXPLAIN " + sql, params)
+        plan = [{key: row.get(key) for key in ("table", "type", "key", "rows", "filtered", "Extra")}
+                for row in cur.fetchall()]
+
+        timings = []
+        for _ in range(repeats):
+            params["email"] = rng.choice(emails)
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = {
+            "plan": plan,
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+            "max_ms": round(timings[-1], 3),
+        }
+    cur.close()
+    return results
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Compare notes/goals query plans before and after indexing")
+    parser.add_argument("--database", default="widviz_benchmark",
+                        help="Scratch database to create (dropped afterwards unless --keep)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--goals-per-user", type=int, default=2000)
+    parser.add_argument("--notes-per-user", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    admin = connect()
+    admin.cursor().execute(f"CREATE DATABASE `{args.database}`")
+    try:
+        conn = connect(args.database)
+        rng = random.Random(args.seed)
+        quiet = lambda message: None
+
+        # Version 2 is the schema before the hot-query indexes
+        migrate(conn, target=2, log=quiet)
+        started = time.perf_counter()
+        emails = seed(conn, args.users, args.goals_per_user, args.notes_per_user, rng)
+        seed_seconds = time.perf_counter() - started
+
+        before = measure(conn, emails, args.repeats, random.Random(args.seed))
+        migrate(conn, log=quiet)
+        after = measure(conn, emails, args.repeats, random.Random(args.seed))
+        conn.close()
+
+        report = {
+            "users": args.users,
+            "goals": args.users * args.goals_per_user,
+            "notes": args.users * args.notes_per_user,
+            "seed_seconds": round(seed_seconds, 2),
+            "before": {"schema_version": 2, "queries": before},
+            "after": {"schema_version": LATEST_VERSION, "queries": after},
+        }
+    finally:
+        if not args.keep:
+            admin.cursor().execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        admin.close()
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
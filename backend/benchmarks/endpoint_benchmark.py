@@ -0,0 +1,316 @@
+# endpoint_benchmark.py - Latency percentiles and throughput of the main API endpoints, end to end
+# Usage: python benchmarks/endpoint_benchmark.py [--concurrency 8] [--output report.json] [--baseline old.json]
+# Ollama, YouTube and MySQL are replaced by local stand-ins (standins.py), so runs are repeatable anywhere
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fixtures import SAMPLE_RATE, load_wav, synthetic_speech, transcript_text  # noqa: E402
+from standins import FakeOllama, FakeYouTube, connect, create_schema  # noqa: E402
+
+REPORT_FORMAT = 1  # Bump when the report layout changes
+SCENARIOS = ["get_notes", "get_goals", "export_pdf", "summarize_video", "generate_quiz"]
+OLLAMA_SCENARIOS = {"summarize_video", "generate_quiz"}  # Slow; sized by --ollama-requests
+COMPARED = [("p50_ms", 1), ("p95_ms", 1), ("p99_ms", 1), ("throughput_rps", -1)]  # (metric, direction of worse)
+
+
+# ===== Setup =====
+
+def seed(path, users, notes_per_user, goals_per_user, rng):
+    """Create users with notes over the past year and goals over the past and next six months"""
+    create_schema(path)
+    conn = connect(path)
+    cur = conn.cursor()
+    emails = [f"bench{i}@example.com" for i in range(users)]
+    cur.executemany("INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
+                    [(email.split("@")[0], email, "x") for email in emails])
+
+    now = datetime.now().replace(microsecond=0)
+    today = date.today()
+    notes, goals = [], []
+    for email in emails:
+        for i in range(notes_per_user):
+            created_at = now - timedelta(seconds=rng.randrange(365 * 86400))
+            content = transcript_text(rng.randrange(50, 400), seed=rng.randrange(1 << 30))
+            notes.append((email, f"Note {i}", content, created_at, created_at))
+        for _ in range(goals_per_user):
+            goal_date = today + timedelta(days=rng.randrange(-182, 183))
+            goals.append((email, "Benchmark goal", goal_date, rng.choice(("pending", "completed"))))
+    cur.executemany("INSERT INTO notes (user_email, title, content, created_at, updated_at) "
+                    "VALUES (%s, %s, %s, %s, %s)", notes)
+    cur.executemany("INSERT INTO goals (email, goal_text, goal_date, status) VALUES (%s, %s, %s, %s)", goals)
+    conn.commit()
+
+    cur.execute("SELECT id, user_email FROM notes")
+    note_ids = {}
+    for note_id, email in cur.fetchall():
+        note_ids.setdefault(email, []).append(note_id)
+    cur.close()
+    conn.close()
+    return note_ids
+
+
+def start_backend(args, work_dir, ollama_url, db_path):
+    """Import the backend against the stand-ins and serve it on a local port; returns (module, server, base URL)"""
+    # Environment first: the backend reads it at import time (load_dotenv does not override it)
+    os.environ.update({
+        "OLLAMA_URL": ollama_url,
+        "CACHE_DB_PATH": os.path.join(work_dir, "cache.sqlite3"),
+        "OUTBOX_DB_PATH": os.path.join(work_dir, "outbox.sqlite3"),
+        "SEARCH_DIR": os.path.join(work_dir, "search"),
+        "PDF_CACHE_DIR": os.path.join(work_dir, "pdf_cache"),
+        "SESSION_SECRET": "endpoint-benchmark",
+        "EMAIL_TRANSPORT": "smtp",
+        "WHISPER_WARMUP": "",
+        "FINGERPRINT_DEDUPE": "false",  # Every video gets the same fixture audio
+    })
+    import widviz_backend as backend
+    from db_pool import ConnectionPool
+    from werkzeug.serving import make_server
+
+    backend.mysql.pool = ConnectionPool(lambda: connect(db_path), size=args.db_pool_size)
+    # Videos without captions "download" the fixture audio and go through the real transcriber
+    audio = load_wav(args.audio) if args.audio else synthetic_speech(args.audio_seconds)
+    youtube = FakeYouTube(args.transcript_words, args.caption_ratio, args.youtube_ms / 1000,
+                          duration=len(audio) / SAMPLE_RATE)
+    backend.get_youtube = lambda: youtube
+
+    def fetch_fixture_audio(video_id, cancel_event=None, on_progress=None):
+        time.sleep(args.download_ms / 1000)
+        return audio
+    backend.fetch_audio = fetch_fixture_audio
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No per-request access log
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="backend", daemon=True).start()
+    return backend, server, f"http://127.0.0.1:{server.server_port}"
+
+
+def build_calls(name, count, offset, users, note_ids, args, rng):
+    """The requests of one scenario as (method, path, json body, headers), reproducible for a seed"""
+    calls = []
+    today = date.today()
+    for i in range(offset, offset + count):
+        email, headers = rng.choice(users)
+        if name == "get_notes":
+            calls.append(("GET", "/api/notes", None, headers))
+        elif name == "get_goals":
+            months = today.year * 12 + today.month - 1 + rng.randrange(-5, 6)  # The seeded year of goals
+            calls.append(("GET", f"/api/goals?month={months % 12 + 1}&year={months // 12}", None, headers))
+        elif name == "export_pdf":
+            calls.append(("GET", f"/api/notes/export_pdf?id={rng.choice(note_ids[email])}", None, headers))
+        elif name == "summarize_video":
+            # A new video each time, so every request runs the whole pipeline
+            calls.append(("POST", "/api/summarize_video", {"video_id": f"bench{i:06d}"}, headers))
+        elif name == "generate_quiz":
+            transcript = transcript_text(args.transcript_words, seed=i)
+            calls.append(("POST", "/api/generate_quiz", {"transcript": transcript}, headers))
+    return calls
+
+
+# ===== Measurement =====
+
+def run_calls(base_url, calls, concurrency):
+    """Send the calls from `concurrency` threads; returns latencies (ms), error samples and wall time"""
+    pending = iter(calls)
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                call = next(pending, None)
+            if call is None:
+                return
+            method, path, body, headers = call
+            started = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, headers=headers, timeout=600)
+                # Most endpoints report failures as {"success": false} with status 200
+                error = None if response.status_code == 200 and response.json().get("success") else \
+                    f"{response.status_code}: {response.text[:200]}"
+            except (requests.RequestException, ValueError) as e:
+                error = str(e)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if error:
+                    errors.append(error)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies, errors, seconds):
+    latencies = sorted(latencies)
+    # Inclusive quantiles stay within the observed range for small samples
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    result = {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 2) if seconds else 0,
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def environment():
+    """Where the numbers came from (compare reports from the same machine)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "commit": commit}
+
+
+# ===== Comparison =====
+
+def compare(baseline, report, max_regression):
+    """Print each metric's change against a baseline report; return the regressions beyond max_regression"""
+    regressions = []
+    print(f"{'scenario':<18}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}", file=sys.stderr)
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            print(f"{name:<18}(not in baseline)", file=sys.stderr)
+            continue
+        for metric, worse in COMPARED:
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            flag = ""
+            if max_regression is not None and change * worse > max_regression:
+                regressions.append(f"{name} {metric}")
+                flag = "  REGRESSION"
+            print(f"{name:<18}{metric:<16}{old:>12}{new:>12}{change:>+10.1%}{flag}", file=sys.stderr)
+    if baseline.get("config") != report.get("config"):
+        print("Note: the reports were produced with different settings", file=sys.stderr)
+    return regressions
+
+
+# ===== Main =====
+
+def run(args):
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix="widviz_bench_")
+    ollama = FakeOllama(args.token_ms / 1000, args.first_token_ms / 1000, args.summary_tokens,
+                        args.malformed_every).start()
+    try:
+        db_path = os.path.join(work_dir, "widviz.sqlite3")
+        note_ids = seed(db_path, args.users, args.notes_per_user, args.goals_per_user, rng)
+        backend, server, base_url = start_backend(args, work_dir, ollama.url, db_path)
+        users = [(email, {"Authorization": f"Bearer {backend.sessions.issue(email, email.split('@')[0])}"})
+                 for email in sorted(note_ids)]
+
+        scenarios = {}
+        for name in args.scenarios:
+            count = args.ollama_requests if name in OLLAMA_SCENARIOS else args.requests
+            warmup = build_calls(name, args.warmup, 0, users, note_ids, args, rng)
+            calls = build_calls(name, count, args.warmup, users, note_ids, args, rng)
+            run_calls(base_url, warmup, args.concurrency)
+            scenarios[name] = summarize(*run_calls(base_url, calls, args.concurrency))
+            print(f"{name}: p50 {scenarios[name]['p50_ms']} ms, p95 {scenarios[name]['p95_ms']} ms, "
+                  f"{scenarios[name]['throughput_rps']} req/s", file=sys.stderr)
+        server.shutdown()
+    finally:
+        ollama.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "candidate",
+                                                                             "max_regression")}
+    return {"format": REPORT_FORMAT, "created": datetime.now().isoformat(timespec="seconds"),
+            "environment": environment(), "config": config, "scenarios": scenarios}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the main API endpoints against local stand-ins")
+    parser.add_argument("--scenarios", type=lambda value: [s.strip() for s in value.split(",") if s.strip()],
+                        default=SCENARIOS, help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per database scenario")
+    parser.add_argument("--ollama-requests", type=int, default=20, help="Measured requests per Ollama scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--notes-per-user", type=int, default=200)
+    parser.add_argument("--goals-per-user", type=int, default=400)
+    parser.add_argument("--db-pool-size", type=int, default=10)
+    parser.add_argument("--token-ms", type=float, default=20, help="Fake Ollama delay per generated token")
+    parser.add_argument("--first-token-ms", type=float, default=100, help="Fake Ollama delay before the first token")
+    parser.add_argument("--summary-tokens", type=int, default=120, help="Tokens in each fake summary")
+    parser.add_argument("--malformed-every", type=int, default=0,
+                        help="Make every Nth fake quiz question invalid (exercises the retry path)")
+    parser.add_argument("--youtube-ms", type=float, default=100, help="Fake YouTube API latency per call")
+    parser.add_argument("--transcript-words", type=int, default=1500)
+    parser.add_argument("--caption-ratio", type=float, default=1.0,
+                        help="Share of videos with captions; the rest are transcribed (needs an STT backend)")
+    parser.add_argument("--audio", help="16-bit WAV used as every downloaded video (default: synthetic speech)")
+    parser.add_argument("--audio-seconds", type=int, default=60)
+    parser.add_argument("--download-ms", type=float, default=500, help="Simulated audio download time")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Report to compare against (differences are printed to stderr)")
+    parser.add_argument("--candidate", help="Compare this saved report to --baseline instead of running")
+    parser.add_argument("--max-regression", type=float,
+                        help="Exit with status 1 if a latency grows or throughput drops by more than this fraction")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.candidate and not args.baseline:
+        parser.error("--candidate needs --baseline")
+
+    if args.candidate:
+        with open(args.candidate) as f:
+            report = json.load(f)
+    else:
+        report = run(args)
+        output = json.dumps(report, indent=2, sort_keys=True)  # Stable key order keeps diffs small
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(output + "\n")
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.max_regression)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# fixtures.py - Deterministic audio and text fixtures for the backend benchmarks
+# A real speech clip gives more representative numbers; pass one with --audio
+
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Vocabulary for synthetic transcripts and notes (word lengths similar to spoken English)
+WORDS = ("the", "a", "of", "and", "to", "in", "is", "that", "we", "this", "it", "for", "on", "with",
+         "video", "data", "model", "people", "energy", "market", "history", "system", "question",
+         "important", "example", "because", "different", "research", "process", "together",
+         "government", "temperature", "information", "experiment", "understand", "remember")
+
+
+def synthetic_speech(seconds=60, seed=0):
+    """Speech-like test signal: voiced 'syllables' with pitch glides and pauses"""
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        # A burst of 3-8 syllables, then a pause like the end of a phrase
+        for _ in range(rng.integers(3, 9)):
+            if position >= len(audio):
+                break
+            length = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+            t = np.arange(length) / SAMPLE_RATE
+            pitch = rng.uniform(100, 220) * (1 + 0.2 * t / t[-1])
+            phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+            voiced = sum(np.sin(phase * k) / k for k in range(1, 6))
+            envelope = np.sin(np.pi * t / t[-1])
+            chunk = (0.2 * voiced * envelope).astype(np.float32)
+            end = min(len(audio), position + length)
+            audio[position:end] = chunk[:end - position]
+            position = end + int(rng.uniform(0.03, 0.08) * SAMPLE_RATE)
+        position += int(rng.uniform(0.3, 0.8) * SAMPLE_RATE)
+
+    audio += rng.normal(0, 0.005, len(audio)).astype(np.float32)  # Room noise
+    return audio
+
+
+def transcript_text(words=1500, seed=0):
+    """Caption-like text: sentences of 6-20 words, the same for the same seed"""
+    rng = np.random.default_rng(seed)
+    sentences, remaining = [], words
+    while remaining > 0:
+        length = min(remaining, int(rng.integers(6, 21)))
+        chosen = [WORDS[i] for i in rng.integers(0, len(WORDS), length)]
+        sentences.append(" ".join(chosen).capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def load_wav(path):
+    """Read a 16-bit PCM WAV file as 16 kHz mono float32"""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV files are supported")
+        channels, rate = wav.getnchannels(), wav.getframerate()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    audio = pcm.reshape(-1, channels).mean(axis=1).astype(np.float32) / 32768.0
+    if rate != SAMPLE_RATE:
+        # Linear resampling is accurate enough for timing measurements
+        positions = np.arange(0, len(audio), rate / SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+def write_wav(path, audio):
+    """Write a 16 kHz mono float32 array as a 16-bit PCM WAV file"""
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
@@ -0,0 +1,130 @@
+# load_test.py - Requests/second and latency of the notes and goals endpoints
+# Usage: python benchmarks/load_test.py --email you@example.com --password secret [--concurrency 16]
+# Run it against the dev server and against `python serve.py` to compare
+
+import argparse
+import itertools
+import json
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+
+ENDPOINTS = {
+    "notes_list": ("GET", "/api/notes/list", None),
+    "notes_sync": ("GET", "/api/notes/sync", None),
+    "goals_month": ("GET", "/api/goals", None),
+}
+
+
+def login(base_url, email, password, create):
+    """Return a session token, creating the account first if asked"""
+    if create:
+        requests.post(f"{base_url}/api/signup",
+                      json={"username": "loadtest", "email": email, "password": password}, timeout=30)
+    data = requests.post(f"{base_url}/api/login", json={"email": email, "password": password},
+                         timeout=30).json()
+    if not data.get("success"):
+        raise SystemExit(f"Login failed: {data.get('message')}")
+    return data["user"]["token"]
+
+
+def seed(base_url, headers, notes, goals):
+    """Create test notes and a daily goal series through the batch endpoints"""
+    if notes:
+        operations = [{"op": "add", "title": f"Load test note {i}", "content": "Lorem ipsum " * 50}
+                      for i in range(notes)]
+        requests.post(f"{base_url}/api/notes/batch", json={"operations": operations},
+                      headers=headers, timeout=120).raise_for_status()
+    if goals:
+        start = date.today()
+        operations = [{"op": "add", "goal_text": "Load test goal", "recurrence": {
+            "start": start.isoformat(), "end": (start + timedelta(days=30)).isoformat()}}] * goals
+        requests.post(f"{base_url}/api/goals/batch", json={"operations": operations},
+                      headers=headers, timeout=120).raise_for_status()
+
+
+def run(base_url, headers, names, concurrency, duration):
+    """Hit the endpoints round-robin from `concurrency` threads for `duration` seconds"""
+    results = {name: {"latencies": [], "errors": 0} for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        session = requests.Session()
+        session.headers.update(headers)
+        for name in itertools.islice(itertools.cycle(names), offset, None):
+            if time.monotonic() >= deadline:
+                return
+            method, path, body = ENDPOINTS[name]
+            started = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                results[name]["latencies"].append(elapsed)
+                if not ok:
+                    results[name]["errors"] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    report = {}
+    for name, result in results.items():
+        latencies = sorted(result["latencies"])
+        if not latencies:
+            continue
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        report[name] = {
+            "requests": len(latencies),
+            "errors": result["errors"],
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(quantiles[49], 2),
+            "p95_ms": round(quantiles[94], 2),
+            "p99_ms": round(quantiles[98], 2),
+        }
+    total = sum(len(result["latencies"]) for result in results.values())
+    return {"seconds": round(elapsed, 2), "total_rps": round(total / elapsed, 1), "endpoints": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the notes and goals endpoints")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--create-user", action="store_true", help="Sign up the account first")
+    parser.add_argument("--seed-notes", type=int, default=0, help="Notes to create before the run")
+    parser.add_argument("--seed-goals", type=int, default=0, help="31-day goal series to create before the run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    headers = {"Authorization": f"Bearer {login(base_url, args.email, args.password, args.create_user)}"}
+    seed(base_url, headers, args.seed_notes, args.seed_goals)
+
+    names = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    report = {"url": base_url, "concurrency": args.concurrency,
+              **run(base_url, headers, names, args.concurrency, args.duration)}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
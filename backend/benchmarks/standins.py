@@ -0,0 +1,373 @@
+# standins.py - Local stand-ins for the services the backend calls: Ollama, YouTube and MySQL
+# Used by endpoint_benchmark.py so runs need no network, GPU or database server
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fixtures import transcript_text
+
+# ===== Ollama =====
+
+def quiz_json(count, malformed_every=0, seed=0):
+    """A JSON quiz reply; every malformed_every-th question has only three options"""
+    questions = []
+    for n in range(seed * 100 + 1, seed * 100 + count + 1):
+        options = [f"Option {letter} for question {n}" for letter in "ABCD"]
+        if malformed_every and n % malformed_every == 0:
+            options = options[:3]
+        questions.append({"question": f"Which statement about part {n} of the video is correct?",
+                          "options": options, "answer": "abcd"[n % 4]})
+    return json.dumps({"questions": questions}, indent=1)
+
+
+def summary_text(tokens):
+    """Bulleted summary of roughly `tokens` words"""
+    words = transcript_text(tokens, seed=tokens).split()
+    lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    return "Key points:\n" + "\n".join(f"- {line}" for line in lines)
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name} for name in self.server.fake.models]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        fake = self.server.fake
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        fake.count(self.path)
+
+        if self.path == "/api/embed":
+            texts = request.get("input") or []
+            time.sleep(fake.first_token_latency)
+            self._send_json({"embeddings": [fake.embedding(text) for text in texts]})
+            return
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        tokens = fake.tokens_for(request.get("prompt", ""), request.get("format"))
+        if not request.get("stream", True):
+            time.sleep(fake.first_token_latency + fake.token_latency * len(tokens))
+            self._send_json({"response": "".join(tokens), "done": True})
+            return
+
+        # Newline-delimited JSON, one token per chunk, as Ollama streams it
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(fake.first_token_latency)
+        for token in tokens:
+            time.sleep(fake.token_latency)
+            self._write_chunk({"response": token, "done": False})
+        self._write_chunk({"response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class FakeOllama:
+    """Ollama HTTP API (/api/tags, /api/generate, /api/embed) answering canned text at a fixed token rate
+
+    Quiz prompts with a JSON `format` get the number of questions asked for; every other prompt gets a summary.
+    """
+
+    def __init__(self, token_latency=0.02, first_token_latency=0.1, summary_tokens=120, malformed_every=0,
+                 embedding_size=64, models=("mistral", "nomic-embed-text"), host="127.0.0.1", port=0):
+        self.token_latency = token_latency
+        self.first_token_latency = first_token_latency
+        self.embedding_size = embedding_size
+        self.models = list(models)
+        self.malformed_every = malformed_every
+        self._summary_tokens = self._split(summary_text(summary_tokens))
+        self._requests = {}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _OllamaHandler)
+        self._server.fake = self
+
+    @staticmethod
+    def _split(text):
+        return re.findall(r"\S+\s*", text)  # Word-sized tokens keeping their whitespace
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def tokens_for(self, prompt, format=None):
+        match = re.match(r"Write (\d+) \w+ multiple-choice quiz questions", prompt)
+        if format and match:
+            # Follow-up prompts list the accepted questions, so they get new ones
+            seed = zlib.crc32(prompt.encode("utf-8")) % 1000
+            return self._split(quiz_json(int(match.group(1)), self.malformed_every, seed))
+        return self._summary_tokens
+
+    def embedding(self, text):
+        """Deterministic unit-free vector derived from the text"""
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [(digest[i % len(digest)] - 127.5) / 127.5 for i in range(self.embedding_size)]
+
+    def count(self, path):
+        with self._lock:
+            self._requests[path] = self._requests.get(path, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._requests)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ===== YouTube =====
+
+class _Call:
+    """A prepared API request, run by execute() like the googleapiclient objects"""
+
+    def __init__(self, latency, func):
+        self._latency = latency
+        self._func = func
+
+    def execute(self):
+        time.sleep(self._latency)
+        return self._func()
+
+
+class _Videos:
+    """videos().list: duration, caption flag and live status of each video"""
+
+    def __init__(self, youtube):
+        self._youtube = youtube
+
+    def list(self, part=None, id=None):
+        youtube = self._youtube
+        seconds = int(youtube.duration)
+        item = {"id": id,
+                "snippet": {"title": f"Video {id}", "liveBroadcastContent": "none"},
+                "contentDetails": {"duration": f"PT{seconds // 60}M{seconds % 60}S",
+                                   "caption": "true" if youtube.has_captions(id) else "false"}}
+        return _Call(youtube.latency, lambda: {"items": [item]})
+
+
+class FakeYouTube:
+    """The captions().list/download and videos().list calls of the YouTube Data API client
+
+    Whether a video has captions is derived from its ID, so a given ID always takes the same path.
+    """
+
+    def __init__(self, transcript_words=1500, caption_ratio=1.0, latency=0.1, duration=600):
+        self.transcript_words = transcript_words
+        self.caption_ratio = caption_ratio
+        self.latency = latency
+        self.duration = duration  # Seconds reported for every video
+
+    def has_captions(self, video_id):
+        return zlib.crc32(video_id.encode("utf-8")) % 1000 < self.caption_ratio * 1000
+
+    def transcript(self, video_id):
+        return transcript_text(self.transcript_words, seed=zlib.crc32(video_id.encode("utf-8")))
+
+    def captions(self):
+        return self
+
+    def videos(self):
+        return _Videos(self)
+
+    def list(self, part=None, videoId=None):
+        items = [{"id": f"caption-{videoId}", "snippet": {"language": "en"}}] if self.has_captions(videoId) else []
+        return _Call(self.latency, lambda: {"items": items})
+
+    def download(self, id=None, tfmt="srt"):
+        return _Call(self.latency, lambda: self.srt(id[len("caption-"):]))
+
+    def srt(self, video_id):
+        """The transcript as SRT cues, one sentence per 3-second cue"""
+        cues = []
+        for number, sentence in enumerate(re.findall(r"[^.]+\.", self.transcript(video_id)), 1):
+            start, end = (number - 1) * 3, number * 3
+            cues.append(f"{number}\n{_srt_time(start)} --> {_srt_time(end)}\n{sentence.strip()}\n")
+        return "\n".join(cues)
+
+
+def _srt_time(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d},000"
+
+
+# ===== MySQL =====
+# Enough of MySQLdb's connection/cursor interface for the benchmarked endpoints, on SQLite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    goals_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL REFERENCES users(email),
+    title TEXT NOT NULL,
+    content TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    deleted_at TIMESTAMP NULL DEFAULT NULL
+);
+CREATE TABLE IF NOT EXISTS goals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL REFERENCES users(email),
+    goal_text TEXT NOT NULL,
+    goal_date DATE NOT NULL,
+    status TEXT DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS session_revocations (
+    subject TEXT PRIMARY KEY,
+    not_before REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notes_user_updated ON notes (user_email, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes (user_email, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_goals_email_date ON goals (email, goal_date);
+CREATE INDEX IF NOT EXISTS idx_session_revocations_expires ON session_revocations (expires_at);
+"""
+
+# MySQL syntax on the benchmarked paths -> SQLite
+_REWRITES = [
+    (re.compile(r"%\((\w+)\)s"), r":\1"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"%%"), "%"),
+    (re.compile(r"\bLEFT\(([^,()]+),", re.IGNORECASE), r"SUBSTR(\1, 1,"),
+    (re.compile(r"\b(?:NOW|CURRENT_TIMESTAMP)\(6?\)", re.IGNORECASE), "strftime('%Y-%m-%d %H:%M:%f', 'now')"),
+    (re.compile(r"\bFOR UPDATE\b", re.IGNORECASE), ""),
+]
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class SQLiteCursor:
+    """MySQLdb-style cursor: %s parameters, tuple rows or dict rows (DictCursor)"""
+
+    def __init__(self, cursor, dict_rows):
+        self._cursor = cursor
+        self._dict_rows = dict_rows
+
+    def execute(self, query, args=None):
+        self._cursor.execute(translate(query), args if args is not None else ())
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        self._cursor.executemany(translate(query), args)
+        return self._cursor.rowcount
+
+    def _row(self, row):
+        if row is None or not self._dict_rows:
+            return row
+        return dict(zip((column[0] for column in self._cursor.description), row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._row(row) for row in self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """MySQLdb-style connection (cursor, commit, rollback, ping) over one SQLite connection"""
+
+    def __init__(self, path):
+        # Pooled connections move between request threads, one at a time
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    def cursor(self, cursorclass=None):
+        dict_rows = cursorclass is not None and "Dict" in cursorclass.__name__
+        return SQLiteCursor(self._conn.cursor(), dict_rows)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, *args):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(path):
+    return SQLiteConnection(path)
+
+
+def create_schema(path):
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
@@ -0,0 +1,80 @@
+# transcriber_benchmark.py - Real-time factor of each speech-to-text backend
+# Usage: python benchmarks/transcriber_benchmark.py [--audio clip.wav] [--model base]
+# RTF = processing time / audio duration (below 1.0 is faster than real time)
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stt_backends import BACKENDS, get_backend  # noqa: E402
+from fixtures import SAMPLE_RATE, load_wav, synthetic_speech  # noqa: E402
+
+
+def benchmark_backend(name, audio, model_name, device, threads, repeats):
+    """Load one backend and time repeated transcriptions of the fixture"""
+    backend = get_backend(name)
+    try:
+        started = time.perf_counter()
+        model = backend.load(model_name, device, threads=threads)
+        load_seconds = time.perf_counter() - started
+    except ImportError as e:
+        return {"backend": name, "available": False, "error": str(e)}
+
+    duration = len(audio) / SAMPLE_RATE
+    timings = []
+    text = ""
+    for _ in range(repeats):
+        started = time.perf_counter()
+        text = backend.transcribe(model, audio, device)["text"]
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    return {
+        "backend": name,
+        "available": True,
+        "model": model_name,
+        "device": device,
+        "load_seconds": round(load_seconds, 3),
+        "transcribe_seconds": [round(t, 3) for t in timings],
+        "rtf": round(best / duration, 4),
+        "characters": len(text),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare speech-to-text backends by real-time factor")
+    parser.add_argument("--audio", help="16-bit PCM WAV file (default: synthetic fixture)")
+    parser.add_argument("--seconds", type=float, default=60, help="Length of the synthetic fixture")
+    parser.add_argument("--model", default=os.getenv('WHISPER_MODEL', 'base'))
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help="Comma-separated backends to compare")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    audio = load_wav(args.audio) if args.audio else synthetic_speech(args.seconds)
+    report = {
+        "fixture": args.audio or f"synthetic:{args.seconds:g}s",
+        "audio_seconds": round(len(audio) / SAMPLE_RATE, 2),
+        "threads": args.threads,
+        "results": [
+            benchmark_backend(name.strip(), audio, args.model, args.device, args.threads, args.repeats)
+            for name in args.backends.split(",") if name.strip()
+        ],
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
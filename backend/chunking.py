@@ -0,0 +1,172 @@
+# chunking.py - Map-reduce summarization for transcripts longer than one prompt
+# Splits text on sentence boundaries into token-budgeted, overlapping windows
+
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Sentence ends followed by whitespace (captions without punctuation fall back to words)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+def split_sentences(text, max_tokens):
+    """Split text into sentences, breaking any over-long sentence into word runs"""
+    units = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= max_tokens:
+            units.append(sentence)
+            continue
+
+        # No usable punctuation: cut into word windows that fit the budget
+        words, current = sentence.split(), []
+        for word in words:
+            if current and estimate_tokens(" ".join(current + [word])) > max_tokens:
+                units.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            units.append(" ".join(current))
+    return units
+
+
+def pack_units(units, max_tokens, overlap_tokens=0, separator=" "):
+    """Greedily pack text units into windows, repeating trailing units as overlap"""
+    chunks, current, size = [], [], 0
+    for unit in units:
+        unit_size = estimate_tokens(unit) + 1  # Round up for the separator
+        if current and size + unit_size > max_tokens:
+            chunks.append(separator.join(current))
+
+            # Start the next window with the tail of this one for context
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                previous_size = estimate_tokens(previous) + 1
+                if overlap_size + previous_size > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous_size
+            current, size = overlap, overlap_size
+
+        current.append(unit)
+        size += unit_size
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def chunk_text(text, max_tokens, overlap_tokens=0):
+    """Split a transcript into overlapping windows of at most max_tokens"""
+    # Keep room for the overlap so a window never exceeds the budget
+    unit_budget = max(1, max_tokens - overlap_tokens)
+    return pack_units(split_sentences(text, unit_budget), max_tokens, overlap_tokens)
+
+
+class MapReduceSummarizer:
+    """Summarizes chunks concurrently, then reduces partial summaries until they fit"""
+
+    def __init__(self, generate, map_prompt, reduce_prompt, max_tokens=2000,
+                 overlap_tokens=150, parallelism=2, cache=None, prompt_version="1"):
+        self._generate = generate            # Callable(prompt, model) -> text, raises on failure
+        self._map_prompt = map_prompt        # Callable(chunk) -> prompt
+        self._reduce_prompt = reduce_prompt  # Callable(joined partial summaries) -> prompt
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.prompt_version = prompt_version
+        self._cache = cache                  # ResultCache with a chunk_summaries table
+        # Shared by all requests so total load on the model server stays bounded
+        self._executor = ThreadPoolExecutor(max_workers=max(1, parallelism),
+                                            thread_name_prefix="chunk")
+        self._prefetched = set()             # Digests already submitted by prefetch()
+        self._prefetch_lock = threading.Lock()
+
+    def condense(self, text, model, max_tokens=None, on_progress=None):
+        """Return text that fits max_tokens: the input itself or merged chunk summaries"""
+        budget = max_tokens or self.max_tokens
+        if estimate_tokens(text) <= budget:
+            return text
+
+        # Map: summarize every window of the transcript
+        chunks = chunk_text(text, self.max_tokens, self.overlap_tokens)
+        partials = self._run_all("map", chunks, model, on_progress)
+
+        # Reduce: merge neighbouring partial summaries until they fit the budget
+        while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > budget:
+            groups = pack_units(partials, self.max_tokens, separator="\n\n")
+            if len(groups) == len(partials):
+                # Each partial is already large; merge them pairwise to make progress
+                groups = ["\n\n".join(partials[i:i + 2]) for i in range(0, len(partials), 2)]
+            partials = self._run_all("reduce", groups, model, on_progress)
+
+        return "\n\n".join(partials)
+
+    def prefetch(self, partial_text, model):
+        """Start summarizing windows of a transcript that is still being produced
+
+        Windows are cut greedily from the start, so every window before the last
+        (still growing) one is identical to what condense() will cut from the
+        final text; their summaries land in the cache before they are needed.
+        """
+        unit_budget = max(1, self.max_tokens - self.overlap_tokens)
+        units = split_sentences(partial_text, unit_budget)[:-1]  # Last sentence may be cut off
+        closed = pack_units(units, self.max_tokens, self.overlap_tokens)[:-1]
+
+        for chunk in closed:
+            digest = self._digest("map", chunk)
+            with self._prefetch_lock:
+                if digest in self._prefetched:
+                    continue
+                self._prefetched.add(digest)
+            future = self._executor.submit(self._summarize_one, "map", chunk, model)
+            # Failures are retried by condense(); just forget the digest
+            future.add_done_callback(lambda f, d=digest: self._prefetch_done(d))
+        return len(closed)
+
+    def _prefetch_done(self, digest):
+        """Allow a window to be prefetched again once its task has finished"""
+        with self._prefetch_lock:
+            self._prefetched.discard(digest)
+
+    @staticmethod
+    def _digest(kind, text):
+        """Cache key for one chunk summary"""
+        return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _run_all(self, kind, texts, model, on_progress=None):
+        """Summarize texts concurrently; finished results stay cached if one fails"""
+        done = [0]
+        lock = threading.Lock()
+
+        def run(text):
+            result = self._summarize_one(kind, text, model)
+            if on_progress:
+                with lock:
+                    done[0] += 1
+                    on_progress(kind, done[0], len(texts))
+            return result
+
+        futures = [self._executor.submit(run, text) for text in texts]
+        wait(futures)
+        return [future.result() for future in futures]  # Re-raises the first failure
+
+    def _summarize_one(self, kind, text, model):
+        """Summarize one chunk, reusing a cached result when available"""
+        digest = self._digest(kind, text)
+        if self._cache:
+            cached = self._cache.get("chunk_summaries", digest, model, self.prompt_version)
+            if cached:
+                return cached
+
+        prompt = self._map_prompt(text) if kind == "map" else self._reduce_prompt(text)
+        summary = self._generate(prompt, model).strip()
+        if self._cache and summary:
+            self._cache.put("chunk_summaries", digest, model, self.prompt_version, summary)
+        return summary
@@ -0,0 +1,202 @@
+# db_pool.py - Bounded MySQL connection pool with a flask_mysqldb-compatible facade
+# Each app context borrows one connection (mysql.connection) and returns it at teardown
+
+import threading
+import time
+from collections import deque
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import g
+
+
+class PoolTimeout(RuntimeError):
+    """No connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of at most `size` connections, health-checked on checkout"""
+
+    def __init__(self, connect, size=10, timeout=10, ping_after=30, max_lifetime=3600):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after        # Ping connections idle longer than this
+        self.max_lifetime = max_lifetime    # Reconnect before MySQL's wait_timeout closes them
+        self._idle = deque()                # (connection, created_at, returned_at)
+        self._created = {}                  # id(connection) -> created_at
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {"checkouts": 0, "waits": 0, "timeouts": 0, "opened": 0, "discarded": 0}
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created.pop(id(conn), None)
+            self._stats["discarded"] += 1
+        try:
+            conn.close()
+        except MySQLdb.Error:
+            pass
+
+    def acquire(self):
+        """Borrow a healthy connection, waiting up to timeout for a free slot"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["waits"] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        try:
+            now = time.monotonic()
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    break
+                conn, created_at, returned_at = entry
+                if now - created_at > self.max_lifetime:
+                    self._discard(conn)
+                    continue
+                if now - returned_at > self.ping_after:
+                    try:
+                        conn.ping()
+                    except MySQLdb.Error:
+                        self._discard(conn)
+                        continue
+                with self._lock:
+                    self._stats["checkouts"] += 1
+                return conn
+
+            conn = self._connect()
+            with self._lock:
+                self._created[id(conn)] = now
+                self._stats["opened"] += 1
+                self._stats["checkouts"] += 1
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection; uncommitted work is rolled back, broken connections are dropped"""
+        try:
+            try:
+                conn.rollback()
+            except MySQLdb.Error:
+                self._discard(conn)
+                return
+            with self._lock:
+                created_at = self._created.get(id(conn), time.monotonic())
+                self._idle.append((conn, created_at, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close idle connections (e.g. after fork or at shutdown)"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=self.size, idle=len(self._idle), open=len(self._created))
+
+
+class TimedCursor:
+    """Cursor proxy reporting each statement's duration to on_query(sql, seconds)"""
+
+    def __init__(self, cursor, on_query):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_on_query", on_query)
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._on_query(query, time.perf_counter() - started)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._on_query(query, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)  # e.g. max_stmt_length
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+
+class TimedConnection:
+    """Connection proxy whose cursors are TimedCursors"""
+
+    def __init__(self, conn, on_query):
+        self._conn = conn
+        self._on_query = on_query
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs), self._on_query)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class PooledMySQL:
+    """Drop-in replacement for flask_mysqldb.MySQL backed by a ConnectionPool
+
+    on_query(sql, seconds), if given, is called after every statement.
+    """
+
+    def __init__(self, app=None, on_query=None, **pool_options):
+        self._pool_options = pool_options
+        self._on_query = on_query
+        self.pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        cursorclass = config.get('MYSQL_CURSORCLASS')
+        kwargs = {
+            "host": config.get('MYSQL_HOST') or 'localhost',
+            "user": config.get('MYSQL_USER'),
+            "passwd": config.get('MYSQL_PASSWORD') or '',
+            "db": config.get('MYSQL_DB'),
+            "port": int(config.get('MYSQL_PORT') or 3306),
+            "charset": config.get('MYSQL_CHARSET') or 'utf8mb4',
+            "connect_timeout": int(config.get('MYSQL_CONNECT_TIMEOUT') or 10),
+        }
+        if cursorclass:
+            kwargs["cursorclass"] = getattr(MySQLdb.cursors, cursorclass)
+
+        self.pool = ConnectionPool(lambda: MySQLdb.connect(**kwargs), **self._pool_options)
+        app.teardown_appcontext(self._teardown)
+
+    @property
+    def connection(self):
+        """The connection borrowed by the current app context (checked out on first use)"""
+        handle = g.get('_mysql_handle')
+        if handle is None:
+            conn = g._mysql_connection = self.pool.acquire()
+            handle = g._mysql_handle = TimedConnection(conn, self._on_query) if self._on_query else conn
+        return handle
+
+    def _teardown(self, exception):
+        g.pop('_mysql_handle', None)
+        conn = g.pop('_mysql_connection', None)
+        if conn is not None:
+            self.pool.release(conn)
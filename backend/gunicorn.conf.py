@@ -0,0 +1,28 @@
+# gunicorn.conf.py - Worker layout per serving role (WIDVIZ_ROLE=all|api|media)
+# api: short I/O-bound requests (auth, notes, goals) spread over several processes
+# media: video jobs, transcription and quizzes in one process, so in-memory jobs stay
+#        visible to every poll; Whisper's CPU work runs in its own process pool
+
+import multiprocessing
+import os
+
+role = os.getenv('WIDVIZ_ROLE', 'all')
+
+bind = f"{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', 5000)}"
+worker_class = "gthread"
+preload_app = False  # Import the app in each worker so its threads and pools start post-fork
+accesslog = os.getenv('ACCESS_LOG') or None
+errorlog = "-"
+
+if role == "api":
+    workers = int(os.getenv('API_WORKERS', min(4, multiprocessing.cpu_count())))
+    threads = int(os.getenv('API_THREADS', 8))
+    timeout = 30
+    max_requests = 5000          # Recycle workers to bound memory growth
+    max_requests_jitter = 500
+else:
+    # media/all: one process; long-polls and SSE streams each hold a thread
+    workers = 1
+    threads = int(os.getenv('MEDIA_THREADS', 16))
+    timeout = 120
+    graceful_timeout = 60
@@ -0,0 +1,286 @@
+# jobs.py - Background job queue for long-running video processing
+# Jobs run on a bounded worker pool and report progress per pipeline stage
+
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Job priorities: jobs waiting for a stage slot are admitted lowest value first
+NORMAL_PRIORITY = 0
+LOW_PRIORITY = 10
+
+_CANCEL_POLL_SECONDS = 0.2  # How often a job waiting for a stage slot checks whether it was cancelled
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when every client has cancelled it"""
+
+
+class PriorityLimit:
+    """Stage concurrency limit that hands free slots to the most urgent waiter (FIFO within a priority)"""
+
+    def __init__(self, slots):
+        self._slots = slots
+        self._waiters = []                  # Heap of (priority, arrival) tickets
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, priority=NORMAL_PRIORITY, cancel_event=None):
+        """Hold one slot for the duration of the block
+
+        Raises JobCancelled, giving up the place in the queue, if cancel_event is set while waiting.
+        """
+        with self._cond:
+            ticket = (priority, next(self._arrivals))
+            heapq.heappush(self._waiters, ticket)
+            while self._slots == 0 or self._waiters[0] != ticket:
+                if cancel_event is not None and cancel_event.is_set():
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()  # The waiter behind us may now be first
+                    raise JobCancelled()
+                self._cond.wait(_CANCEL_POLL_SECONDS if cancel_event is not None else None)
+            heapq.heappop(self._waiters)
+            self._slots -= 1
+            self._cond.notify_all()  # The next waiter may fit in a remaining slot
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._slots += 1
+                self._cond.notify_all()
+
+    def waiting(self):
+        """Number of jobs queued for a slot"""
+        with self._cond:
+            return len(self._waiters)
+
+
+class Job:
+    """State of one queued pipeline run, shared by all clients that asked for it"""
+
+    def __init__(self, key, stage_names, params, stage_limits=None, stage_observer=None, trace_id=None):
+        self.id = uuid.uuid4().hex
+        self.trace_id = trace_id               # Request that started the job, for log correlation
+        self.key = key
+        self.params = params
+        self.priority = NORMAL_PRIORITY        # May be lowered by the runner before a limited stage
+        self.status = QUEUED
+        self.stages = OrderedDict(
+            (name, {"status": "pending", "progress": 0.0, "detail": None,
+                    "started_at": None, "finished_at": None})
+            for name in stage_names
+        )
+        self.result = None
+        self.error = None
+        self.partial = {}                      # Streamed output so far, e.g. summary text
+        self.created_at = time.time()
+        self.finished_at = None
+        self.clients = 1                       # Requests sharing this job
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._limits = stage_limits or {}      # Stage name -> PriorityLimit shared by all jobs
+        self._observer = stage_observer        # Callable(stage, seconds, outcome) when a stage ends
+
+    def check_cancelled(self):
+        """Abort the current stage if the job has been cancelled"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    @contextmanager
+    def stage(self, name):
+        """Run a block as a named stage, tracking timing and status"""
+        self.check_cancelled()
+        info = self.stages[name]
+        limit = self._limits.get(name)
+
+        info["status"] = "waiting" if limit else "running"
+        started = None
+        outcome = "failed"
+        try:
+            with limit.slot(self.priority, self.cancel_event) if limit else nullcontext():
+                self.check_cancelled()
+                info["status"] = "running"
+                started = info["started_at"] = time.time()
+                yield info
+            outcome = "done"
+        except JobCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            # Never left at "waiting"/"running", even when cancelled before the slot was granted
+            info["status"] = outcome
+            if started is not None:
+                info["finished_at"] = time.time()
+                if self._observer:
+                    self._observer(name, info["finished_at"] - started, "ok" if outcome == "done" else outcome)
+
+        info["progress"] = 1.0
+        self.check_cancelled()
+
+    def skip_stage(self, name, detail=None):
+        """Mark a stage that is not needed for this run"""
+        self.stages[name].update(status="skipped", detail=detail, progress=1.0)
+
+    def set_progress(self, name, fraction, detail=None):
+        """Update progress (0..1) and an optional status message for a stage"""
+        info = self.stages[name]
+        info["progress"] = max(0.0, min(1.0, fraction))
+        if detail is not None:
+            info["detail"] = detail
+
+    def append_partial(self, name, text):
+        """Append streamed output that clients can show before the job ends"""
+        with self._lock:
+            self.partial[name] = self.partial.get(name, "") + text
+
+    def set_partial(self, name, value):
+        """Replace a partial result (values are treated as immutable once set)"""
+        with self._lock:
+            self.partial[name] = value
+
+    def finish(self, status, result=None, error=None):
+        """Record the outcome and wake anyone waiting on the job"""
+        with self._lock:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self):
+        """True once the job has completed, failed or been cancelled"""
+        return self._done.is_set()
+
+    def to_dict(self, include_result=True):
+        """JSON-serializable snapshot for the status endpoints"""
+        stages = [dict(name=name, **info) for name, info in self.stages.items()]
+        done = sum(info["progress"] for info in self.stages.values())
+        data = {
+            "job_id": self.id,
+            "trace_id": self.trace_id,
+            "key": self.key,
+            "status": self.status,
+            "priority": self.priority,
+            "stages": stages,
+            "progress": round(done / max(1, len(self.stages)), 3),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result and self.status == COMPLETED:
+            data["result"] = self.result
+        elif self.status == RUNNING:
+            data["partial"] = dict(self.partial)
+        return data
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and de-duplicates in-flight work"""
+
+    def __init__(self, runner, stage_names, max_workers=4, stage_limits=None,
+                 context_factory=None, retention_seconds=3600, stage_observer=None, trace_id=None):
+        self._runner = runner                    # Callable(job, **params) -> result
+        self._stage_names = list(stage_names)
+        self._context_factory = context_factory  # e.g. Flask app.app_context
+        self._stage_observer = stage_observer    # Callable(stage, seconds, outcome)
+        self._trace_id = trace_id                # Callable returning the submitting request's trace ID
+        self._retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._stage_limits = {
+            name: PriorityLimit(limit)
+            for name, limit in (stage_limits or {}).items() if limit
+        }
+        self._jobs = {}        # Job ID -> Job
+        self._active = {}      # Dedupe key -> Job still queued or running
+        self._lock = threading.Lock()
+
+    def submit(self, key, **params):
+        """Start a job, or join the one already running for the same key"""
+        with self._lock:
+            self._purge_finished()
+            job = self._active.get(key)
+            if job and not job.cancel_event.is_set():
+                job.clients += 1
+                return job, False
+
+            job = Job(key, self._stage_names, params, self._stage_limits,
+                      self._stage_observer, self._trace_id() if self._trace_id else None)
+            self._jobs[job.id] = job
+            self._active[key] = job
+
+        # The runner sees the submitter's context variables (e.g. its trace ID)
+        self._executor.submit(contextvars.copy_context().run, self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        """Look up a job by ID"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Withdraw one client; the job stops once no client wants it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.finished:
+                return job
+            job.clients = max(0, job.clients - 1)
+            if job.clients == 0:
+                job.cancel_event.set()
+                # Let a fresh request for the same key start a new job
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+        return job
+
+    def _run(self, job):
+        """Worker entry point"""
+        if job.cancel_event.is_set():
+            job.finish(CANCELLED)
+            self._release(job)
+            return
+
+        job.status = RUNNING
+        try:
+            with self._context_factory() if self._context_factory else nullcontext():
+                result = self._runner(job, **job.params)
+            job.finish(COMPLETED, result=result)
+        except JobCancelled:
+            job.finish(CANCELLED)
+        except Exception as e:
+            job.finish(FAILED, error=str(e))
+        finally:
+            self._release(job)
+
+    def _release(self, job):
+        """Drop a finished job from the in-flight index"""
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+
+    def _purge_finished(self):
+        """Forget finished jobs after the retention period (lock held)"""
+        cutoff = time.time() - self._retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,209 @@
+# migrations.py - Versioned MySQL schema migrations for WIDViz
+# Usage: python migrations.py [upgrade [--target N] | status]
+
+import argparse
+import os
+
+import MySQLdb
+import MySQLdb.cursors
+
+_LOCK_NAME = "widviz_schema_migrations"
+
+
+def _has_column(cur, table, column):
+    cur.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cur.fetchone() is not None
+
+
+def _has_index(cur, table, name):
+    cur.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, name))
+    return cur.fetchone() is not None
+
+
+def add_column(cur, table, column, definition):
+    """Add a column unless it already exists (MySQL DDL cannot be rolled back)"""
+    if not _has_column(cur, table, column):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def add_index(cur, table, name, columns):
+    """Create an index unless it already exists"""
+    if not _has_index(cur, table, name):
+        cur.execute(f"CREATE INDEX {name} ON {table} {columns}")
+
+
+# ===== Migrations =====
+# Each migration is idempotent so databases created by older startup code can be adopted
+
+def _create_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(100) NOT NULL,
+            email VARCHAR(100) NOT NULL UNIQUE,
+            password VARCHAR(100) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS notes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_email VARCHAR(100) NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_email) REFERENCES users(email)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS goals (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            email VARCHAR(100) NOT NULL,
+            goal_text TEXT NOT NULL,
+            goal_date DATE NOT NULL,
+            status VARCHAR(20) DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (email) REFERENCES users(email)
+        )
+    """)
+
+
+def _notes_sync_columns(cur):
+    add_column(cur, "notes", "updated_at",
+               "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")
+    add_column(cur, "notes", "deleted_at", "TIMESTAMP(6) NULL DEFAULT NULL")
+    add_index(cur, "notes", "idx_notes_user_updated", "(user_email, updated_at, id)")
+
+
+def _hot_query_indexes(cur):
+    # Notes list: WHERE user_email = ? ORDER BY created_at DESC, id DESC
+    add_index(cur, "notes", "idx_notes_user_created", "(user_email, created_at, id)")
+    # Goals calendar: WHERE email = ? AND goal_date >= ? AND goal_date < ?
+    add_index(cur, "goals", "idx_goals_email_date", "(email, goal_date)")
+
+
+def _goals_version(cur):
+    # Bumped with every goal change; part of the calendar cache key in every api worker
+    add_column(cur, "users", "goals_version", "INT NOT NULL DEFAULT 0")
+
+
+def _session_revocations(cur):
+    # Logouts ("sid:<id>") and password changes ("user:<email>"), checked by every api worker
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS session_revocations (
+            subject VARCHAR(120) PRIMARY KEY,
+            not_before DOUBLE NOT NULL,
+            expires_at DOUBLE NOT NULL,
+            INDEX idx_session_revocations_expires (expires_at)
+        )
+    """)
+
+
+MIGRATIONS = [
+    (1, "Create users, notes and goals tables", _create_tables),
+    (2, "Add notes updated_at/deleted_at for delta sync", _notes_sync_columns),
+    (3, "Index notes and goals by user for list and calendar queries", _hot_query_indexes),
+    (4, "Add users.goals_version for calendar caching across workers", _goals_version),
+    (5, "Create session_revocations for logout across workers", _session_revocations),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(conn):
+    """Set of migration versions recorded in schema_migrations"""
+    cur = conn.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        _ensure_version_table(cur)
+        cur.execute("SELECT version FROM schema_migrations")
+        return {row["version"] for row in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def migrate(conn, target=None, log=print):
+    """Apply pending migrations up to target (default: latest); returns the versions applied"""
+    target = LATEST_VERSION if target is None else target
+    cur = conn.cursor(MySQLdb.cursors.DictCursor)
+    applied = []
+    try:
+        # Serialize concurrent migrators (several workers starting at once)
+        cur.execute("SELECT GET_LOCK(%s, 60) AS locked", (_LOCK_NAME,))
+        if not cur.fetchone()["locked"]:
+            raise RuntimeError("Timed out waiting for the schema migration lock")
+        try:
+            done = applied_versions(conn)
+            for version, description, apply in MIGRATIONS:
+                if version > target or version in done:
+                    continue
+                log(f"Applying migration {version}: {description}")
+                apply(cur)
+                cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                            (version, description))
+                conn.commit()
+                applied.append(version)
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
+    return applied
+
+
+def status(conn):
+    """List every migration with whether it has been applied"""
+    done = applied_versions(conn)
+    return [{"version": version, "description": description, "applied": version in done}
+            for version, description, _ in MIGRATIONS]
+
+
+def connect(database=None):
+    """Open a connection using the same environment variables as the backend"""
+    return MySQLdb.connect(
+        host=os.getenv('MYSQL_HOST', 'localhost'),
+        user=os.getenv('MYSQL_USER'),
+        passwd=os.getenv('MYSQL_PASSWORD', ''),
+        db=database or os.getenv('MYSQL_DB'),
+        charset='utf8mb4'
+    )
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Apply or inspect WIDViz schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    parser.add_argument("--target", type=int, help="Stop after this version (default: latest)")
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        if args.command == "status":
+            for row in status(conn):
+                print(f"{row['version']:>4}  {'applied' if row['applied'] else 'pending':8}  {row['description']}")
+        else:
+            applied = migrate(conn, args.target)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# model_registry.py - Process-wide registry for speech-to-text models and their worker pools
+# Loads each (model size, device) pair once and shares it between requests
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class _ModelEntry:
+    """A loaded model (or worker pool) plus the lock that serializes inference on it"""
+
+    def __init__(self, model, close=None):
+        self.model = model
+        self.close = close             # Releases the resource once evicted (worker pools)
+        self.lock = threading.Lock()   # Whisper decoding is not re-entrant
+        self.active = 0                # Callers currently holding the entry
+        self.evicted = False
+        self.last_used = time.monotonic()
+
+
+class ModelRegistry:
+    """LRU cache of loaded models keyed by (name, device)
+
+    Worker pools, whose processes each hold a copy of a model, are entries too, keyed by
+    (name, device, "pool"), so max_models and idle eviction bound their memory as well.
+    """
+
+    def __init__(self, loader, max_models=2):
+        self._loader = loader          # Callable(name, device) -> model
+        self._max_models = max(1, max_models)
+        self._entries = OrderedDict()  # (name, device[, "pool"]) -> _ModelEntry
+        self._loading = {}             # Same keys -> threading.Event
+        self._lock = threading.Lock()
+
+    def _get_entry(self, name, device, create=None, hold=False):
+        """Return the entry for a model, loading it on first use
+
+        With create, the entry is a worker pool: create() returns (pool, close).
+        With hold, the caller is counted as a holder until it calls _release.
+        """
+        key = (name, device) if create is None else (name, device, "pool")
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    self._entries.move_to_end(key)
+                    entry.last_used = time.monotonic()
+                    entry.active += hold
+                    return entry
+
+                # Another thread is already loading this model, wait for it
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    break
+            pending.wait()
+
+        # Load outside the registry lock so other models stay available
+        try:
+            entry = _ModelEntry(*create()) if create else _ModelEntry(self._loader(name, device))
+        finally:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+
+        with self._lock:
+            entry.active += hold
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            # Drop least recently used models beyond the limit
+            evicted = []
+            while len(self._entries) > self._max_models:
+                evicted.append(self._entries.popitem(last=False)[1])
+            closing = self._mark_evicted(evicted)
+        self._close(closing)
+        return entry
+
+    @staticmethod
+    def _mark_evicted(entries):
+        """Flag evicted entries (lock held); returns those that can be released now"""
+        for entry in entries:
+            entry.evicted = True
+        return [entry for entry in entries if entry.close and not entry.active]
+
+    @staticmethod
+    def _close(entries):
+        for entry in entries:
+            entry.close()
+
+    def _release(self, entry):
+        """Drop a holder; an evicted pool is released with its last holder"""
+        with self._lock:
+            entry.active -= 1
+            entry.last_used = time.monotonic()
+            closing = [entry] if entry.evicted and entry.close and not entry.active else []
+        self._close(closing)
+
+    def get(self, name, device):
+        """Return a shared model instance (caller must not run it concurrently)"""
+        return self._get_entry(name, device).model
+
+    @contextmanager
+    def acquire(self, name, device):
+        """Hold a model exclusively for the duration of a transcription"""
+        entry = self._get_entry(name, device, hold=True)
+        try:
+            with entry.lock:
+                entry.last_used = time.monotonic()
+                yield entry.model
+        finally:
+            self._release(entry)
+
+    @contextmanager
+    def acquire_pool(self, name, device, create):
+        """Hold the worker pool for a model, created by create() -> (pool, close) on first use
+
+        Concurrent callers share the pool; it is closed only after it is evicted and released.
+        """
+        entry = self._get_entry(name, device, create, hold=True)
+        try:
+            yield entry.model
+        finally:
+            self._release(entry)
+
+    def warm_up(self, names, device):
+        """Preload models so the first request does not pay the load cost"""
+        for name in names:
+            self._get_entry(name, device)
+
+    def evict_idle(self, max_idle_seconds):
+        """Unload models and pools that have not been used for a while"""
+        cutoff = time.monotonic() - max_idle_seconds
+        with self._lock:
+            idle = [key for key, entry in self._entries.items()
+                    if entry.last_used < cutoff and not entry.active]
+            closing = self._mark_evicted([self._entries.pop(key) for key in idle])
+        self._close(closing)
+        return idle
+
+    def loaded(self):
+        """List the (name, device) pairs currently in memory"""
+        with self._lock:
+            return [key for key in self._entries if len(key) == 2]
+
+    def pools(self):
+        """List the (name, device) pairs with a running worker pool"""
+        with self._lock:
+            return [key[:2] for key in self._entries if len(key) == 3]
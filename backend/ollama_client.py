@@ -0,0 +1,240 @@
+# ollama_client.py - Shared HTTP client for the local Ollama server
+# Keeps pooled keep-alive connections, caches health and fails fast while Ollama is down
+
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OllamaError(RuntimeError):
+    """Ollama returned an error or an unusable response"""
+
+
+class OllamaTimeout(OllamaError):
+    """Ollama did not answer in time"""
+
+
+class OllamaUnavailable(OllamaError):
+    """Ollama is unreachable or the circuit breaker is open"""
+
+
+class OllamaClient:
+    """Pooled Ollama client with cached health checks, retries and a circuit breaker"""
+
+    def __init__(self, base_url, pool_size=10, timeout=60, retries=2, backoff=0.5,
+                 failure_threshold=3, reset_timeout=30, health_ttl=15):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.health_ttl = health_ttl
+
+        # One keep-alive pool shared by every request thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._failures = 0            # Consecutive failed calls
+        self._open_until = 0.0        # Circuit stays open (fail fast) until this time
+        self._trial_in_flight = False # A single probe is allowed once the circuit half-opens
+        self._healthy = None          # Cached health: None = unknown
+        self._health_error = None
+        self._checked_at = 0.0
+        self._monitor = None
+        self._counts = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    # ----- Health -----
+
+    def check_health(self):
+        """Probe /api/tags and cache the result"""
+        try:
+            response = self.session.get(self.base_url + "/api/tags", timeout=5)
+            healthy = response.status_code == 200
+            error = None if healthy else "Ollama server is not running"
+        except requests.exceptions.RequestException:
+            healthy, error = False, "Could not connect to Ollama"
+
+        with self._lock:
+            self._healthy, self._health_error = healthy, error
+            self._checked_at = time.monotonic()
+            if healthy:
+                self._failures = 0
+                self._open_until = 0.0
+        return healthy
+
+    def unavailable_reason(self):
+        """Return why Ollama cannot be used right now, or None if it is usable"""
+        with self._lock:
+            if self._open_until > time.monotonic():
+                return self._health_error or "Ollama is unavailable"
+            stale = time.monotonic() - self._checked_at > self.health_ttl
+
+        if stale:
+            self.check_health()
+        with self._lock:
+            return None if self._healthy else self._health_error
+
+    def cached_health(self):
+        """Last known health without probing (for status pages that must answer instantly)"""
+        with self._lock:
+            return {
+                "healthy": self._healthy,
+                "error": self._health_error,
+                "circuit_open": self._open_until > time.monotonic(),
+                "checked_seconds_ago": round(time.monotonic() - self._checked_at, 1) if self._checked_at else None,
+            }
+
+    def stats(self):
+        """Call, retry and failure counters (rejected = failed fast by the open circuit)"""
+        with self._lock:
+            return dict(self._counts)
+
+    def start_health_monitor(self, interval=None):
+        """Refresh the cached health state in a background thread"""
+        if self._monitor:
+            return
+        interval = interval or self.health_ttl
+
+        def run():
+            while True:
+                self.check_health()
+                time.sleep(interval)
+
+        self._monitor = threading.Thread(target=run, name="ollama-health", daemon=True)
+        self._monitor.start()
+
+    # ----- Circuit breaker -----
+
+    def _before_call(self):
+        """Fail fast while the circuit is open; let one probe through when it half-opens"""
+        with self._lock:
+            if self._open_until == 0.0:
+                return
+            if time.monotonic() < self._open_until or self._trial_in_flight:
+                self._counts["rejected"] += 1
+                raise OllamaUnavailable(self._health_error or "Ollama is unavailable")
+            self._trial_in_flight = True
+
+    def _record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+            self._trial_in_flight = False
+            self._healthy, self._health_error = True, None
+
+    def _record_failure(self, message):
+        """Count a failed call and open the circuit after too many in a row"""
+        with self._lock:
+            self._failures += 1
+            self._counts["failures"] += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.reset_timeout
+                self._healthy, self._health_error = False, message
+
+    # ----- Requests -----
+
+    def _post(self, path, payload, stream=False):
+        """POST with retry and exponential backoff on connection errors and 5xx"""
+        self._before_call()
+        with self._lock:
+            self._counts["calls"] += 1
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self._counts["retries"] += 1
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            try:
+                response = self.session.post(self.base_url + path, json=payload,
+                                             stream=stream, timeout=self.timeout)
+            except requests.exceptions.Timeout:
+                last_error = OllamaTimeout("Ollama request timed out")
+                continue
+            except requests.exceptions.RequestException:
+                last_error = OllamaUnavailable("Could not connect to Ollama")
+                continue
+
+            if response.status_code >= 500:
+                last_error = OllamaError(f"Error from Ollama API: {response.text}")
+                response.close()
+                continue
+            if response.status_code != 200:
+                # Client errors (e.g. unknown model) will not succeed on retry
+                self._record_success()
+                raise OllamaError(f"Error from Ollama API: {response.text}")
+            return response
+
+        self._record_failure(str(last_error))
+        raise last_error
+
+    def generate(self, prompt, model, **options):
+        """Return a complete completion for the prompt"""
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        payload.update(options)
+        response = self._post("/api/generate", payload)
+        self._record_success()
+        return response.json().get("response", "")
+
+    def embed(self, texts, model):
+        """Return one embedding vector per input text (Ollama /api/embed)"""
+        response = self._post("/api/embed", {"model": model, "input": list(texts)})
+        self._record_success()
+        embeddings = response.json().get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            raise OllamaError(f"Ollama returned no embeddings for model '{model}'")
+        return embeddings
+
+    def stream(self, prompt, model, **options):
+        """Yield completion tokens as Ollama generates them
+
+        The call counts as a success for the circuit breaker only once the done chunk arrives.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        payload.update(options)
+        response = self._post("/api/generate", payload, stream=True)
+
+        finished = False
+        with response:
+            try:
+                # Ollama sends one JSON object per line
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise OllamaError(chunk["error"])
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        finished = True
+                        break
+                else:
+                    raise OllamaError("Ollama ended the stream before it was done")
+            except requests.exceptions.Timeout:
+                self._record_failure("Ollama stopped responding mid-stream")
+                raise OllamaTimeout("Ollama stopped responding mid-stream")
+            except requests.exceptions.RequestException:
+                self._record_failure("Lost connection to Ollama")
+                raise OllamaUnavailable("Lost connection to Ollama")
+            except OllamaError as e:
+                self._record_failure(str(e))
+                raise
+            except ValueError:
+                self._record_failure("Unreadable response from Ollama")
+                raise OllamaError("Unreadable response from Ollama")
+            finally:
+                if finished:
+                    self._record_success()
+                else:
+                    # Consumer stopped early: neither outcome, but free a half-open probe slot
+                    with self._lock:
+                        self._trial_in_flight = False
@@ -0,0 +1,259 @@
+# outbox.py - Persistent email queue delivered by a background worker
+# Messages are stored in SQLite first, so a request returns as soon as its email is queued
+
+import base64
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from email.mime.text import MIMEText
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class PermanentDeliveryError(Exception):
+    """The message can never be delivered (bad address, rejected content); do not retry"""
+
+
+# ===== Transports =====
+
+class GmailTransport:
+    """Sends through the Gmail API, reusing one authorized service object"""
+
+    def __init__(self, credentials_file, token_file, scopes):
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self.scopes = scopes
+        self._credentials = None
+        self._service = None
+        self._lock = threading.Lock()
+
+    def _save_credentials(self, credentials):
+        with open(self.token_file, 'w') as token:
+            token.write(credentials.to_json())
+
+    def _authorize(self):
+        """Load, refresh or (first run only) interactively obtain OAuth credentials"""
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        credentials = self._credentials
+        if credentials is None and os.path.exists(self.token_file):
+            credentials = Credentials.from_authorized_user_file(self.token_file)
+        if credentials and credentials.expired and credentials.refresh_token:
+            credentials.refresh(Request())
+            self._save_credentials(credentials)
+        if not credentials or not credentials.valid:
+            flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, self.scopes)
+            credentials = flow.run_local_server(port=0)
+            self._save_credentials(credentials)
+        return credentials
+
+    def _get_service(self):
+        """Build the Gmail service once; rebuild only when the credentials change"""
+        from googleapiclient.discovery import build
+
+        with self._lock:
+            credentials = self._authorize()
+            if self._service is None or credentials is not self._credentials:
+                self._credentials = credentials
+                self._service = build('gmail', 'v1', credentials=credentials, cache_discovery=False)
+            return self._service
+
+    def send(self, to_email, subject, content):
+        from googleapiclient.errors import HttpError
+
+        message = MIMEText(content)
+        message['to'] = to_email
+        message['subject'] = subject
+        body = {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')}
+        try:
+            self._get_service().users().messages().send(userId="me", body=body).execute()
+        except HttpError as e:
+            if e.resp.status == 400:
+                raise PermanentDeliveryError(str(e))
+            raise
+
+
+class SmtpTransport:
+    """Plain SMTP delivery (also works against a local stand-in such as `python -m aiosmtpd -n`)"""
+
+    def __init__(self, host, port=25, username=None, password=None, starttls=False,
+                 sender="widviz@localhost", timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.timeout = timeout
+
+    def send(self, to_email, subject, content):
+        message = MIMEText(content)
+        message['from'] = self.sender
+        message['to'] = to_email
+        message['subject'] = subject
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+                smtp.send_message(message)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+            raise PermanentDeliveryError(str(e))
+
+
+# ===== Queue =====
+
+class Outbox:
+    """SQLite-backed email queue with retry and exponential backoff"""
+
+    def __init__(self, path, transport, max_attempts=5, backoff=30, max_backoff=3600,
+                 lease_seconds=300, logger=None):
+        self.path = path
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds   # A claimed message is retried if its sender dies
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # isolation_level=None: transactions are explicit so claims can use BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                to_email TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)"
+        )
+
+    def _log(self, message):
+        if self.logger:
+            self.logger(message)
+
+    def enqueue(self, to_email, subject, body):
+        """Persist a message for delivery and wake the worker; returns the message id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (to_email, subject, body, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (to_email, subject, body, PENDING, now, now)
+            )
+        self._wake.set()
+        return cursor.lastrowid
+
+    def _claim(self):
+        """Take one due message, leasing it so other workers skip it"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, to_email, subject, body, attempts FROM outbox "
+                    "WHERE status IN (?, ?) AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT 1",
+                    (PENDING, SENDING, now)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ? "
+                        "WHERE id = ?",
+                        (SENDING, now + self.lease_seconds, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _finish(self, message_id, status, next_attempt_at=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, next_attempt_at = COALESCE(?, next_attempt_at), "
+                "last_error = ?, sent_at = ? WHERE id = ?",
+                (status, next_attempt_at, error, time.time() if status == SENT else None, message_id)
+            )
+
+    def deliver_due(self):
+        """Send every message that is due now; returns how many were attempted"""
+        attempted = 0
+        while True:
+            row = self._claim()
+            if not row:
+                return attempted
+            message_id, to_email, subject, body, attempts = row
+            attempts += 1
+            attempted += 1
+            try:
+                self.transport.send(to_email, subject, body)
+            except PermanentDeliveryError as e:
+                self._finish(message_id, FAILED, error=str(e)[:1000])
+                self._log(f"Email {message_id} to {to_email} rejected: {e}")
+            except Exception as e:
+                if attempts >= self.max_attempts:
+                    self._finish(message_id, FAILED, error=str(e)[:1000])
+                    self._log(f"Email {message_id} to {to_email} failed after {attempts} attempts: {e}")
+                else:
+                    delay = min(self.max_backoff, self.backoff * (2 ** (attempts - 1)))
+                    self._finish(message_id, PENDING, time.time() + delay, str(e)[:1000])
+                    self._log(f"Email {message_id} to {to_email} failed (attempt {attempts}), retrying in {delay}s: {e}")
+            else:
+                self._finish(message_id, SENT)
+
+    def _next_due_in(self):
+        """Seconds until the next queued message is due (None when the queue is empty)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN (?, ?)", (PENDING, SENDING)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def start_worker(self, idle_poll=60):
+        """Deliver queued messages in a background thread (safe to call repeatedly)"""
+        with self._lock:
+            if self._worker:
+                return
+            self._worker = threading.Thread(target=self._run, args=(idle_poll,),
+                                            name="outbox", daemon=True)
+            self._worker.start()
+
+    def _run(self, idle_poll):
+        while True:
+            try:
+                self.deliver_due()
+                wait = self._next_due_in()
+            except Exception as e:
+                self._log(f"Outbox worker error: {e}")
+                wait = None
+            # Sleep until the next retry is due, a new message arrives, or the idle poll
+            self._wake.wait(idle_poll if wait is None else min(wait, idle_poll))
+            self._wake.clear()
+
+    def stats(self):
+        """Message counts by status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return dict(rows)
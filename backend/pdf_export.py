@@ -0,0 +1,175 @@
+# pdf_export.py - Note PDF rendering with a content-addressed file cache
+# Lines are wrapped with real font metrics; a rendered file is reused until the note changes
+
+import glob
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import zipfile
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+RENDER_VERSION = "1"  # Bump when the layout changes so cached PDFs are re-rendered
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 50
+TITLE_FONT, TITLE_SIZE, TITLE_LEADING = "Helvetica-Bold", 14, 20
+BODY_FONT, BODY_SIZE, BODY_LEADING = "Helvetica", 12, 15
+
+
+def pdf_filename(title, extension="pdf"):
+    """Download name derived from a note title"""
+    name = re.sub(r'[^\w-]+', '_', title).strip('_') or 'note'
+    return f"{name}.{extension}"
+
+
+def _fit(word, font, size, max_width):
+    """Length of the longest prefix of word that fits max_width (at least one character)"""
+    low, high = 1, len(word)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if stringWidth(word[:middle], font, size) <= max_width:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def wrap_text(text, font, size, max_width):
+    """Split text into lines no wider than max_width points, keeping paragraph breaks"""
+    space = stringWidth(" ", font, size)
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line, line_width = "", 0.0
+        for word in paragraph.split(" "):
+            word_width = stringWidth(word, font, size)
+            if line and line_width + space + word_width <= max_width:
+                line, line_width = f"{line} {word}", line_width + space + word_width
+                continue
+            if line:
+                lines.append(line)
+            # Words wider than a whole line are broken across lines
+            while word_width > max_width:
+                cut = _fit(word, font, size, max_width)
+                lines.append(word[:cut])
+                word = word[cut:]
+                word_width = stringWidth(word, font, size)
+            line, line_width = word, word_width
+        lines.append(line)
+    return lines
+
+
+def draw_note(pdf, title, content):
+    """Draw one note starting on a fresh page; the caller saves the canvas"""
+    max_width = PAGE_WIDTH - 2 * MARGIN
+    y = PAGE_HEIGHT - MARGIN
+
+    pdf.setFont(TITLE_FONT, TITLE_SIZE)
+    for line in wrap_text(title, TITLE_FONT, TITLE_SIZE, max_width):
+        pdf.drawString(MARGIN, y, line)
+        y -= TITLE_LEADING
+
+    pdf.setFont(BODY_FONT, BODY_SIZE)
+    for line in wrap_text(content, BODY_FONT, BODY_SIZE, max_width):
+        if y <= MARGIN:  # New page when space runs out
+            pdf.showPage()
+            pdf.setFont(BODY_FONT, BODY_SIZE)
+            y = PAGE_HEIGHT - MARGIN
+        pdf.drawString(MARGIN, y, line)
+        y -= BODY_LEADING
+    pdf.showPage()
+
+
+def render_note_pdf(target, title, content):
+    """Render a single note to a path or binary file object"""
+    pdf = canvas.Canvas(target, pagesize=letter)
+    pdf.setTitle(title)
+    draw_note(pdf, title, content)
+    pdf.save()
+
+
+def render_notes_pdf(target, notes):
+    """Render notes from an iterator of (title, content) into one PDF, one note at a time"""
+    pdf = canvas.Canvas(target, pagesize=letter)
+    count = 0
+    for title, content in notes:
+        draw_note(pdf, title or "Untitled Note", content or "No content")
+        count += 1
+    if not count:
+        pdf.drawString(MARGIN, PAGE_HEIGHT - MARGIN, "No notes")
+        pdf.showPage()
+    pdf.save()
+
+
+class PdfCache:
+    """Rendered note PDFs on disk, keyed by note id and a hash of what was rendered"""
+
+    def __init__(self, directory, max_files=500):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, note_id, title, content):
+        digest = hashlib.sha256(
+            "\0".join((RENDER_VERSION, title, content)).encode("utf-8")
+        ).hexdigest()[:24]
+        return os.path.join(self.directory, f"note_{int(note_id)}_{digest}.pdf")
+
+    def get_or_render(self, note_id, title, content):
+        """Path of the rendered PDF, rendering only when the note changed"""
+        path = self._path(note_id, title, content)
+        try:
+            os.utime(path)  # Recency for pruning
+            return path
+        except FileNotFoundError:
+            pass
+
+        # Render beside the target and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                render_note_pdf(f, title, content)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._remove_stale(note_id, keep=path)
+        self._prune()
+        return path
+
+    def _remove_stale(self, note_id, keep):
+        """Drop renders of older versions of the same note"""
+        for old in glob.glob(os.path.join(self.directory, f"note_{int(note_id)}_*.pdf")):
+            if old != keep:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def _prune(self):
+        """Keep at most max_files renders, removing the least recently used"""
+        with self._lock:
+            files = glob.glob(os.path.join(self.directory, "note_*.pdf"))
+            if len(files) <= self.max_files:
+                return
+            files.sort(key=lambda name: os.path.getmtime(name) if os.path.exists(name) else 0)
+            for old in files[:len(files) - self.max_files]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def write_zip(self, target, notes):
+        """Zip one PDF per note from an iterator of (id, title, content) rows"""
+        with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as archive:
+            for note_id, title, content in notes:
+                title, content = title or "Untitled Note", content or "No content"
+                path = self.get_or_render(note_id, title, content)
+                archive.write(path, arcname=f"{note_id}_{pdf_filename(title)}")
@@ -0,0 +1,189 @@
+# quiz.py - Quiz generation with schema-constrained JSON output from Ollama
+# Questions are validated one by one; only the missing ones are requested again
+
+import json
+import re
+import threading
+
+DIFFICULTIES = {
+    "easy": "Ask about facts stated directly in the transcript.",
+    "medium": "Ask about the main ideas and how they relate.",
+    "hard": "Ask questions that need inference or combining several parts of the transcript.",
+}
+LETTERS = "abcd"
+
+# Passed as Ollama's `format`, which constrains decoding to this shape
+QUIZ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "options": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+                    "answer": {"type": "string", "enum": list(LETTERS)},
+                },
+                "required": ["question", "options", "answer"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+_OPTION_PREFIX = re.compile(r"^\s*(?:[a-dA-D1-4][).:]|\([a-dA-D]\))\s*")  # "a) ", "B. ", "(c) ", "4: "
+
+
+def build_quiz_prompt(content, count, difficulty, avoid=()):
+    """Prompt for `count` questions as JSON; `avoid` lists questions already accepted"""
+    avoid_text = ""
+    if avoid:
+        avoid_text = "Do not repeat or rephrase these questions:\n" + "\n".join(f"- {q}" for q in avoid) + "\n"
+    return f"""Write {count} {difficulty} multiple-choice quiz questions based on the transcript below.
+{DIFFICULTIES[difficulty]}
+Each question has exactly four options and one correct answer, given as the letter a, b, c or d.
+{avoid_text}Respond with JSON: {{"questions": [{{"question": "...", "options": ["...", "...", "...", "..."], "answer": "a"}}]}}
+
+Transcript content:
+{content}"""
+
+
+def validate_question(item):
+    """Normalize one generated question, or return None if it is unusable
+
+    The result has the shape the renderer expects: options "a) ..." to "d) ..." and the answer letter.
+    """
+    if not isinstance(item, dict):
+        return None
+    question, options, answer = item.get("question"), item.get("options"), item.get("answer")
+    if not isinstance(question, str) or not question.strip() or not isinstance(options, list) or len(options) != 4:
+        return None
+    if not all(isinstance(option, str) for option in options):
+        return None
+    options = [_OPTION_PREFIX.sub("", option).strip() for option in options]
+    if not all(options) or len({option.lower() for option in options}) != 4:
+        return None
+
+    # Models sometimes answer with the option text or "b)" instead of the bare letter
+    if isinstance(answer, int) and not isinstance(answer, bool):
+        answer = LETTERS[answer - 1] if 1 <= answer <= 4 else None
+    elif isinstance(answer, str):
+        text = answer.strip()
+        lowered = [option.lower() for option in options]
+        if text.lower() in lowered:
+            answer = LETTERS[lowered.index(text.lower())]
+        else:
+            match = re.match(r"^\(?([a-dA-D])(?:[).:]|$)", text)
+            answer = match.group(1).lower() if match else None
+    else:
+        answer = None
+    if answer is None:
+        return None
+
+    question = question.strip()
+    if not question.endswith("?"):
+        question += "?"
+    return {"question": question,
+            "options": [f"{letter}) {option}" for letter, option in zip(LETTERS, options)],
+            "answer": answer}
+
+
+class QuizStreamParser:
+    """Pull question objects out of streamed JSON as soon as each one closes
+
+    Works on {"questions": [...]} or a bare array, and keeps the complete questions of a truncated reply.
+    """
+
+    def __init__(self):
+        self.rejected = 0
+        self._stack = []        # Open containers: "{" or "["
+        self._in_string = False
+        self._escaped = False
+        self._current = None    # Characters of the array item being read
+        self._item_depth = 0    # Stack depth the current item closes back to
+
+    def feed(self, text):
+        """Add streamed text; return the valid questions it completed"""
+        questions = []
+        for char in text:
+            if self._current is not None:
+                self._current.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._current is None and self._stack and self._stack[-1] == "[":
+                    self._current = [char]
+                    self._item_depth = len(self._stack)
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if self._current is not None and len(self._stack) == self._item_depth:
+                    question = self._finish("".join(self._current))
+                    self._current = None
+                    if question:
+                        questions.append(question)
+        return questions
+
+    def _finish(self, text):
+        try:
+            question = validate_question(json.loads(text))
+        except ValueError:
+            question = None
+        if question is None:
+            self.rejected += 1
+        return question
+
+
+class QuizGenerator:
+    """Streams validated questions, re-requesting only as many as were rejected or missing"""
+
+    def __init__(self, stream, max_attempts=3):
+        self._stream = stream            # Callable(prompt, model, **options) -> token iterator
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "retries": 0, "accepted": 0, "rejected": 0}
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self._counts[name] += amount
+
+    def iter_questions(self, content, model, count, difficulty):
+        """Yield up to `count` distinct valid questions as they arrive"""
+        accepted, seen = [], set()
+        for attempt in range(self.max_attempts):
+            missing = count - len(accepted)
+            if missing <= 0:
+                return
+            self._count(requests=1, retries=1 if attempt else 0)
+
+            parser = QuizStreamParser()
+            prompt = build_quiz_prompt(content, missing, difficulty, [q["question"] for q in accepted])
+            for token in self._stream(prompt, model, format=QUIZ_SCHEMA):
+                for question in parser.feed(token):
+                    key = question["question"].lower()
+                    if key in seen or len(accepted) >= count:
+                        continue
+                    seen.add(key)
+                    accepted.append(question)
+                    self._count(accepted=1)
+                    yield question
+            self._count(rejected=parser.rejected)
+
+    def generate(self, content, model, count, difficulty):
+        return list(self.iter_questions(content, model, count, difficulty))
+
+    def stats(self):
+        """Prompts sent (retries = follow-ups for missing questions) and questions accepted/rejected"""
+        with self._lock:
+            return dict(self._counts)
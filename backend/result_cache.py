@@ -0,0 +1,222 @@
+# result_cache.py - Persistent cache for video transcripts, summaries, chunk summaries, quizzes and audio fingerprints
+# Stored in a local SQLite file so repeat requests skip the whole pipeline
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Table name -> key columns (the cached value is always stored in "value")
+_TABLES = {
+    "transcripts": ("video_id", "source", "model"),
+    "summaries": ("video_id", "source", "model", "prompt_version"),
+    "chunk_summaries": ("digest", "model", "prompt_version"),
+    "quiz_contexts": ("digest", "model", "max_tokens", "prompt_version"),
+    "quizzes": ("digest", "model", "count", "difficulty", "prompt_version"),
+    "fingerprints": ("seconds", "video_id"),  # Audio length in whole seconds, for near-length lookups
+}
+
+
+class ResultCache:
+    """SQLite-backed key/value cache with TTL and total size limit
+
+    Expired rows are swept at most every sweep_seconds; between sweeps the byte total is
+    tracked in memory and re-read from the file on each sweep, since several processes write it.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_bytes=256 * 1024 * 1024, sweep_seconds=60):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sweep_seconds = sweep_seconds
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._next_sweep = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn:
+            for table, keys in _TABLES.items():
+                self._create_table(table, keys)
+            self._total_bytes = self._stored_bytes()
+
+    def _create_table(self, table, keys):
+        """Create a cache table with the given key columns"""
+        key_columns = ", ".join(f"{key} TEXT NOT NULL" for key in keys)
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key_columns},
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY ({", ".join(keys)})
+            )
+        """)
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table} (accessed_at)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table} (created_at)"
+        )
+
+    def _stored_bytes(self):
+        """Total size of every cached value in the file"""
+        return sum(
+            self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+            for table in _TABLES
+        )
+
+    def get(self, table, *key):
+        """Return a cached value, or None when missing or expired"""
+        keys = _TABLES[table]
+        where = " AND ".join(f"{name} = ?" for name in keys)
+        now = time.time()
+
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT value, size, created_at FROM {table} WHERE {where}", key
+            ).fetchone()
+            if not row:
+                return None
+
+            value, size, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {table} WHERE {where}", key)
+                self._total_bytes -= size
+                return None
+
+            # Track recency for size-bounded eviction
+            self._conn.execute(
+                f"UPDATE {table} SET accessed_at = ? WHERE {where}", (now, *key)
+            )
+        return value
+
+    def put(self, table, *key_and_value):
+        """Store a value, evicting least recently used rows if over budget"""
+        keys = _TABLES[table]
+        *key, value = key_and_value
+        if len(key) != len(keys):
+            raise ValueError(f"{table} expects key {keys}")
+
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        columns = ", ".join(keys)
+        placeholders = ", ".join("?" for _ in keys)
+        where = " AND ".join(f"{name} = ?" for name in keys)
+        with self._lock, self._conn:
+            replaced = self._conn.execute(f"SELECT size FROM {table} WHERE {where}", key).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {table} ({columns}, value, size, created_at, accessed_at) "
+                f"VALUES ({placeholders}, ?, ?, ?, ?)",
+                (*key, value, size, now, now)
+            )
+            self._total_bytes += size - (replaced[0] if replaced else 0)
+            self._enforce_limits(now)
+
+    def _enforce_limits(self, now):
+        """Drop expired rows (at most every sweep_seconds), then the oldest rows until under max_bytes"""
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_seconds
+            if self.ttl_seconds:
+                for table in _TABLES:
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE created_at < ?", (now - self.ttl_seconds,)
+                    )
+            self._total_bytes = self._stored_bytes()
+
+        if not self.max_bytes or self._total_bytes <= self.max_bytes:
+            return
+
+        # Other processes may have evicted rows too; count again before deleting anything
+        total = self._stored_bytes()
+        if total <= self.max_bytes:
+            self._total_bytes = total
+            return
+
+        union = " UNION ALL ".join(
+            f"SELECT '{table}', rowid, size, accessed_at FROM {table}" for table in _TABLES
+        )
+        for table, rowid, size, _ in self._conn.execute(
+                f"SELECT * FROM ({union}) ORDER BY accessed_at").fetchall():
+            self._conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._total_bytes = total
+
+    # ----- Convenience wrappers -----
+
+    def get_transcript(self, video_id, source, model):
+        """Cached transcript for a video, source and transcription model"""
+        return self.get("transcripts", video_id, source, model)
+
+    def put_transcript(self, video_id, source, model, text):
+        """Store a transcript"""
+        self.put("transcripts", video_id, source, model, text)
+
+    def iter_transcripts(self, page_size=50):
+        """Yield (video_id, transcript) for every cached transcript, a page at a time"""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, video_id, value FROM transcripts WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, video_id, value in rows:
+                yield video_id, value
+            last = rows[-1][0]
+
+    def get_summary(self, video_id, source, model, prompt_version):
+        """Cached summary for a transcript source, LLM model and prompt version"""
+        return self.get("summaries", video_id, source, model, prompt_version)
+
+    def put_summary(self, video_id, source, model, prompt_version, summary):
+        """Store a summary"""
+        self.put("summaries", video_id, source, model, prompt_version, summary)
+
+    def get_quiz_context(self, digest, model, max_tokens, prompt_version):
+        """Transcript condensed to a quiz prompt budget (shared by every question count and difficulty)"""
+        return self.get("quiz_contexts", digest, model, str(max_tokens), prompt_version)
+
+    def put_quiz_context(self, digest, model, max_tokens, prompt_version, context):
+        """Store a condensed quiz context"""
+        self.put("quiz_contexts", digest, model, str(max_tokens), prompt_version, context)
+
+    def get_quiz(self, digest, model, count, difficulty, prompt_version):
+        """Cached quiz questions for a transcript digest, or None"""
+        value = self.get("quizzes", digest, model, str(count), difficulty, prompt_version)
+        return json.loads(value) if value else None
+
+    def put_quiz(self, digest, model, count, difficulty, prompt_version, questions):
+        """Store a complete quiz"""
+        self.put("quizzes", digest, model, str(count), difficulty, prompt_version, json.dumps(questions))
+
+    def put_fingerprint(self, video_id, seconds, source, model, fingerprint):
+        """Store the audio fingerprint (bytes) of a video transcribed by source/model"""
+        value = json.dumps({"source": source, "model": model,
+                            "fingerprint": base64.b64encode(fingerprint).decode("ascii")})
+        self.put("fingerprints", str(int(seconds)), video_id, value)
+
+    def find_fingerprints(self, seconds, tolerance=2):
+        """Yield (video_id, source, model, fingerprint bytes) for audio within tolerance seconds of this length"""
+        # Lengths are listed rather than compared numerically, so the primary key index is used
+        lengths = [str(length) for length in range(int(seconds) - tolerance, int(seconds) + tolerance + 1)]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT video_id, value FROM fingerprints WHERE seconds IN ({', '.join('?' for _ in lengths)}) "
+                "AND created_at >= ?",
+                (*lengths, time.time() - self.ttl_seconds if self.ttl_seconds else 0)
+            ).fetchall()
+        for video_id, value in rows:
+            record = json.loads(value)
+            yield video_id, record["source"], record["model"], base64.b64decode(record["fingerprint"])
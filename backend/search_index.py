@@ -0,0 +1,416 @@
+# search_index.py - Keyword and semantic search over notes and video transcripts
+# SQLite holds the documents and an FTS5 index; embeddings live in a memory-mapped .npy matrix
+
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+PUBLIC = ""             # Owner of documents every user can find (video transcripts)
+EMBED_CHARS = 4000      # Title plus the start of the body is embedded; keyword search covers the rest
+SNIPPET_CHARS = 160     # Preview length for hits found only by meaning
+RRF_K = 60              # Reciprocal rank fusion damping (higher = flatter blend of the two rankings)
+
+
+def content_digest(title, body):
+    """Fingerprint of what was indexed, to skip unchanged documents"""
+    return hashlib.sha1(f"{title}\0{body}".encode("utf-8")).hexdigest()
+
+
+def fts_query(text):
+    """FTS5 query matching any word of free text (quoted, so input is never parsed as syntax)"""
+    words = re.findall(r"\w+", text.lower())
+    return " OR ".join(f'"{word}"' for word in words)
+
+
+class SearchIndex:
+    """Incrementally maintained keyword + embedding index
+
+    Documents are identified by (kind, ref) and owned by a user email or PUBLIC.
+    The keyword index is updated synchronously; embeddings are computed by a
+    background worker, so a new document is findable by meaning shortly after
+    it is findable by its words. Writers serialize on SQLite's write lock, which
+    also guards the vector file, so several processes can share one directory.
+    """
+
+    def __init__(self, directory, embed=None, model=None, batch_size=16,
+                 initial_capacity=1024, min_similarity=0.3, logger=None):
+        self.directory = directory
+        self.embed = embed            # list of texts -> list of vectors (None = keyword search only)
+        self.model = model or ""
+        self.batch_size = batch_size
+        self.initial_capacity = initial_capacity
+        self.min_similarity = min_similarity  # Semantic hits below this cosine are dropped
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._matrix = None           # Memory-mapped vectors of the current generation
+        self._generation = None
+        self._query_vectors = TTLCache(maxsize=1000, ttl=3600)
+
+        os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: transactions are explicit so writes can use BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(os.path.join(directory, "search.sqlite3"), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                slot INTEGER,
+                pending INTEGER NOT NULL DEFAULT 1,
+                UNIQUE (kind, ref)
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_owner ON documents (owner, kind);
+            CREATE INDEX IF NOT EXISTS idx_documents_pending ON documents (pending);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                title, body, content='documents', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+
+        # Vectors from a different embedding model are not comparable with new queries
+        with self._transaction():
+            if self._meta("model") != self.model:
+                self._reset_vectors(0)
+        self._remove_stale_files()
+
+    def _log(self, message):
+        if self.logger:
+            self.logger(message)
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the thread lock and SQLite's write lock (shared with other processes)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def get_marker(self, name):
+        """Caller-defined bookkeeping value (e.g. a sync position), or None"""
+        with self._lock:
+            return self._meta(f"marker:{name}")
+
+    def set_marker(self, name, value):
+        with self._transaction():
+            self._set_meta(f"marker:{name}", value)
+
+    # ----- Documents -----
+
+    def upsert(self, kind, ref, owner, title, body):
+        """Add or replace a document; returns False when nothing changed"""
+        title, body, ref = title or "", body or "", str(ref)
+        digest = content_digest(title, body)
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT id, title, body, digest, owner FROM documents WHERE kind = ? AND ref = ?",
+                (kind, ref)
+            ).fetchone()
+            if row and row[3] == digest and row[4] == owner:
+                return False
+            if row:
+                doc_id = row[0]
+                # External-content FTS: the old text must be removed explicitly
+                self._conn.execute(
+                    "INSERT INTO documents_fts (documents_fts, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+                    row[:3]
+                )
+                self._conn.execute(
+                    "UPDATE documents SET owner = ?, title = ?, body = ?, digest = ?, pending = 1 WHERE id = ?",
+                    (owner, title, body, digest, doc_id)
+                )
+            else:
+                doc_id = self._conn.execute(
+                    "INSERT INTO documents (kind, ref, owner, title, body, digest) VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, ref, owner, title, body, digest)
+                ).lastrowid
+            self._conn.execute("INSERT INTO documents_fts (rowid, title, body) VALUES (?, ?, ?)",
+                               (doc_id, title, body))
+        self._wake.set()
+        return True
+
+    def remove(self, kind, ref):
+        """Drop a document; its vector slot is reused by the next new document"""
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT id, title, body, slot FROM documents WHERE kind = ? AND ref = ?", (kind, str(ref))
+            ).fetchone()
+            if not row:
+                return False
+            self._conn.execute(
+                "INSERT INTO documents_fts (documents_fts, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+                row[:3]
+            )
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+            if row[3] is not None:
+                self._conn.execute("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", (row[3],))
+        return True
+
+    # ----- Vector matrix -----
+
+    def _vector_path(self, generation):
+        return os.path.join(self.directory, f"vectors-{generation}.npy")
+
+    def _current_matrix(self):
+        """Vectors of the current generation, reopened after another process grew the file
+
+        The caller holds self._lock.
+        """
+        generation = int(self._meta("generation", 0))
+        if generation != self._generation:
+            path = self._vector_path(generation)
+            self._matrix = np.load(path, mmap_mode="r+") if os.path.exists(path) else None
+            self._generation = generation
+        return self._matrix
+
+    def _reset_vectors(self, dims):
+        """Forget every vector (new embedding model or dimension); all documents are re-embedded"""
+        self._conn.execute("UPDATE documents SET slot = NULL, pending = 1")
+        self._conn.execute("DELETE FROM free_slots")
+        self._set_meta("generation", int(self._meta("generation", 0)) + 1)
+        self._set_meta("dims", dims)
+        self._set_meta("capacity", 0)
+        self._set_meta("next_slot", 0)
+        self._set_meta("model", self.model)
+
+    def _grow(self, capacity):
+        """Copy the vectors into a larger file under a new generation number"""
+        old = self._current_matrix()
+        generation = self._generation + 1
+        matrix = np.lib.format.open_memmap(self._vector_path(generation), mode="w+", dtype=np.float32,
+                                           shape=(capacity, int(self._meta("dims"))))
+        if old is not None:
+            matrix[:len(old)] = old
+        matrix.flush()
+        self._set_meta("generation", generation)
+        self._set_meta("capacity", capacity)
+        self._matrix, self._generation = matrix, generation
+
+    def _allocate_slot(self):
+        """Reserve a matrix row, reusing a freed one when possible"""
+        row = self._conn.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+        if row:
+            self._conn.execute("DELETE FROM free_slots WHERE slot = ?", row)
+            return row[0]
+        slot = int(self._meta("next_slot", 0))
+        self._set_meta("next_slot", slot + 1)
+        capacity = int(self._meta("capacity", 0))
+        if slot >= capacity:
+            self._grow(max(self.initial_capacity, capacity * 2))
+        return slot
+
+    def _store_vectors(self, batch, vectors):
+        """Write embeddings for (doc_id, digest) pairs still current"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)  # Unit rows: a dot product is the cosine
+
+        with self._transaction():
+            if int(self._meta("dims", 0)) != vectors.shape[1]:
+                self._reset_vectors(vectors.shape[1])
+            for (doc_id, digest), vector in zip(batch, vectors):
+                row = self._conn.execute("SELECT slot, digest FROM documents WHERE id = ?",
+                                         (doc_id,)).fetchone()
+                if not row or row[1] != digest:
+                    continue  # Deleted or edited while being embedded
+                slot = row[0] if row[0] is not None else self._allocate_slot()
+                self._current_matrix()[slot] = vector
+                self._conn.execute("UPDATE documents SET slot = ?, pending = 0 WHERE id = ?", (slot, doc_id))
+            if self._current_matrix() is not None:
+                self._current_matrix().flush()
+        self._remove_stale_files()
+
+    def _remove_stale_files(self):
+        """Delete vector files of earlier generations (after the switch has committed)"""
+        with self._lock:
+            current = self._vector_path(int(self._meta("generation", 0)))
+        for path in glob.glob(os.path.join(self.directory, "vectors-*.npy")):
+            if path != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Still mapped (Windows); removed on a later pass
+
+    # ----- Embedding worker -----
+
+    def embed_pending(self):
+        """Embed documents whose text changed since their vector was computed; returns how many"""
+        if self.embed is None:
+            return 0
+        done = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, digest, title, body FROM documents WHERE pending = 1 LIMIT ?",
+                    (self.batch_size,)
+                ).fetchall()
+            if not rows:
+                return done
+            vectors = self.embed([f"{title}\n{body}"[:EMBED_CHARS] for _, _, title, body in rows])
+            self._store_vectors([(doc_id, digest) for doc_id, digest, _, _ in rows], vectors)
+            done += len(rows)
+
+    def start_worker(self, idle_poll=30):
+        """Embed new and changed documents in a background thread (safe to call repeatedly)"""
+        with self._lock:
+            if self._worker or self.embed is None:
+                return
+            self._worker = threading.Thread(target=self._run, args=(idle_poll,),
+                                            name="search-embeddings", daemon=True)
+            self._worker.start()
+
+    def _run(self, idle_poll):
+        while True:
+            self._wake.clear()
+            try:
+                self.embed_pending()
+            except Exception as e:
+                self._log(f"Search embedding failed (will retry): {e}")
+            # Sleep until a document changes or the idle poll retries a failed batch
+            self._wake.wait(idle_poll)
+
+    # ----- Queries -----
+
+    def _kind_filter(self, kinds):
+        if not kinds:
+            return "", []
+        return f"AND d.kind IN ({', '.join('?' for _ in kinds)})", list(kinds)
+
+    def keyword_search(self, owner, query, limit=10, kinds=None):
+        """[(doc_id, snippet)] ranked by BM25, titles weighted above bodies"""
+        match = fts_query(query)
+        if not match:
+            return []
+        kind_filter, params = self._kind_filter(kinds)
+        with self._lock:
+            return self._conn.execute(f"""
+                SELECT d.id, snippet(documents_fts, -1, '', '', '…', 16)
+                FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE documents_fts MATCH ? AND d.owner IN (?, ?) {kind_filter}
+                ORDER BY bm25(documents_fts, 5.0, 1.0)
+                LIMIT ?
+            """, [match, owner, PUBLIC] + params + [limit]).fetchall()
+
+    def query_vector(self, query):
+        """Unit embedding of a query (cached; repeated searches skip the model)"""
+        key = " ".join(query.lower().split())
+        vector = self._query_vectors.get(key)
+        if vector is None:
+            vector = np.asarray(self.embed([query])[0], dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm else vector
+            self._query_vectors.set(key, vector)
+        return vector
+
+    def semantic_search(self, owner, query, limit=10, kinds=None):
+        """[(doc_id, cosine)] for the documents closest in meaning to the query"""
+        if self.embed is None:
+            return []
+        vector = self.query_vector(query)
+        kind_filter, params = self._kind_filter(kinds)
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT d.id, d.slot FROM documents d
+                WHERE d.owner IN (?, ?) AND d.slot IS NOT NULL {kind_filter}
+            """, [owner, PUBLIC] + params).fetchall()
+            matrix = self._current_matrix()
+        if not rows or matrix is None or matrix.shape[1] != len(vector):
+            return []
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        slots = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        scores = matrix[slots] @ vector  # One matrix-vector product over the user's documents
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= self.min_similarity]
+
+    def search(self, owner, query, limit=10, mode="hybrid", kinds=None):
+        """Top documents for a query; returns (hits, mode actually used)
+
+        hybrid blends the keyword and semantic rankings with reciprocal rank fusion.
+        When embeddings are unavailable the search falls back to keywords.
+        """
+        keyword, semantic = [], []
+        if mode in ("hybrid", "semantic"):
+            try:
+                semantic = self.semantic_search(owner, query, limit, kinds)
+            except Exception as e:
+                self._log(f"Semantic search unavailable, using keywords: {e}")
+                mode = "keyword"
+        if mode in ("hybrid", "keyword"):
+            keyword = self.keyword_search(owner, query, limit, kinds)
+
+        scores, snippets, matched = {}, {}, {}
+        for source, ranking in (("keyword", keyword), ("semantic", semantic)):
+            for rank, (doc_id, detail) in enumerate(ranking):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                matched.setdefault(doc_id, []).append(source)
+                if source == "keyword":
+                    snippets[doc_id] = detail
+        top = sorted(scores, key=scores.get, reverse=True)[:limit]
+        if not top:
+            return [], mode
+
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT id, kind, ref, title, substr(body, 1, ?) FROM documents
+                WHERE id IN ({', '.join('?' for _ in top)})
+            """, [SNIPPET_CHARS] + top).fetchall()
+        documents = {row[0]: row[1:] for row in rows}
+
+        hits = []
+        for doc_id in top:
+            if doc_id not in documents:
+                continue  # Removed since the ranking was read
+            kind, ref, title, preview = documents[doc_id]
+            hits.append({
+                "kind": kind,
+                "ref": ref,
+                "title": title,
+                "snippet": snippets.get(doc_id) or preview,
+                "score": round(scores[doc_id], 5),
+                "matched": matched[doc_id],
+            })
+        return hits, mode
+
+    def stats(self):
+        """Document and embedding counts"""
+        with self._lock:
+            documents, pending = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pending), 0) FROM documents"
+            ).fetchone()
+            return {
+                "documents": documents,
+                "pending_embeddings": pending,
+                "model": self.model,
+                "dims": int(self._meta("dims", 0)),
+                "capacity": int(self._meta("capacity", 0)),
+                "query_cache": self._query_vectors.stats(),
+            }
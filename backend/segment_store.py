@@ -0,0 +1,245 @@
+# segment_store.py - Timed transcript segments (and optional word timings) in one compact file per video
+# Times and text offsets are memory-mapped columns; a time-range read touches only its slice of the text
+
+import glob
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+
+import numpy as np
+
+MAGIC = b"WVSEG1\n"
+_ALIGN = 64  # Column start alignment in bytes
+
+# Offset columns (*_text, seg_words) have one entry more than rows: entry i+1 ends item i
+_COLUMNS = {
+    "seg_start": "<f4",
+    "seg_end": "<f4",
+    "seg_text": "<u4",   # Byte offsets of segment text in the blob
+    "seg_words": "<u4",  # Index of each segment's first word
+    "word_start": "<f4",
+    "word_end": "<f4",
+    "word_text": "<u4",  # Byte offsets of word text in the blob (after all segment text)
+}
+
+_SRT_TIMING = re.compile(r"(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})")
+
+
+def _seconds(hours, minutes, seconds, millis):
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def parse_srt(text):
+    """SRT captions as [{"start", "end", "text"}] in cue order"""
+    segments = []
+    for block in re.split(r"\r?\n\s*\r?\n", text.strip()):
+        lines = block.strip().splitlines()
+        for index, line in enumerate(lines):
+            match = _SRT_TIMING.search(line)
+            if not match:
+                continue
+            caption = " ".join(part.strip() for part in lines[index + 1:] if part.strip())
+            if caption:
+                times = match.groups()
+                segments.append({"start": _seconds(*times[:4]), "end": _seconds(*times[4:]), "text": caption})
+            break
+    return segments
+
+
+def encode_segments(segments):
+    """Column arrays and the UTF-8 text blob for segments sorted by start time"""
+    segments = sorted(segments, key=lambda seg: seg["start"])
+    blob = bytearray()
+    columns = {name: [] for name in _COLUMNS}
+    columns["seg_text"].append(0)
+    columns["seg_words"].append(0)
+    word_texts = []
+
+    for seg in segments:
+        columns["seg_start"].append(seg["start"])
+        columns["seg_end"].append(seg["end"])
+        blob += seg["text"].encode("utf-8")
+        columns["seg_text"].append(len(blob))
+        words = seg.get("words") or []
+        for word in words:
+            columns["word_start"].append(word["start"])
+            columns["word_end"].append(word["end"])
+            word_texts.append(word["text"].encode("utf-8"))
+        columns["seg_words"].append(columns["seg_words"][-1] + len(words))
+
+    columns["word_text"].append(len(blob))
+    for text in word_texts:
+        blob += text
+        columns["word_text"].append(len(blob))
+
+    if len(blob) > 0xFFFFFFFF:
+        raise ValueError("Transcript text is too large for 32-bit offsets")
+    return {name: np.asarray(values, dtype=_COLUMNS[name]) for name, values in columns.items()}, bytes(blob)
+
+
+class SegmentFile:
+    """Read side of one segment file; columns are memory-mapped on first use"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a segment file: {path}")
+            (length,) = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(length))
+        self._columns = {}
+
+    @property
+    def source(self):
+        return self.header["source"]
+
+    @property
+    def duration(self):
+        return self.header["duration"]
+
+    def __len__(self):
+        return self.header["segments"]
+
+    def column(self, name):
+        array = self._columns.get(name)
+        if array is None:
+            offset, count = self.header["columns"][name]
+            if count == 0:
+                array = np.zeros(0, dtype=_COLUMNS[name])
+            else:
+                array = np.memmap(self.path, dtype=_COLUMNS[name], mode="r", offset=offset, shape=(count,))
+            self._columns[name] = array
+        return array
+
+    def _read_texts(self, f, offsets):
+        """Decode consecutive blob items delimited by an offsets slice, with one read"""
+        if len(offsets) < 2:
+            return []
+        base = int(offsets[0])
+        f.seek(self.header["blob"][0] + base)
+        data = f.read(int(offsets[-1]) - base)
+        return [data[int(a) - base:int(b) - base].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+
+    def slice(self, start=None, end=None, limit=None, words=False, index=None):
+        """Segments overlapping [start, end) seconds, at most `limit` of them
+
+        Returns (segments, next_index). Passing next_index back as `index` continues from the
+        following segment, so paging never repeats or skips one; None means nothing is left.
+        """
+        count = len(self)
+        starts, ends = self.column("seg_start"), self.column("seg_end")
+        first, last = 0, count
+        if index is not None:
+            first = min(max(0, index), count)
+        elif start is not None and count:
+            first = max(0, int(np.searchsorted(starts, start, side="right")) - 1)
+            if ends[first] <= start:
+                first += 1
+        if end is not None:
+            last = int(np.searchsorted(starts, end, side="left"))
+        last = max(first, last)
+        if limit is not None and last - first > limit:
+            last = first + limit
+        next_index = None
+        if last < count and (end is None or starts[last] < end):
+            next_index = last
+        if first >= last:
+            return [], next_index
+
+        with open(self.path, "rb") as f:
+            texts = self._read_texts(f, self.column("seg_text")[first:last + 1])
+            segments = [{"start": round(float(s), 2), "end": round(float(e), 2), "text": text}
+                        for s, e, text in zip(starts[first:last], ends[first:last], texts)]
+            if words and self.header["words"]:
+                word_index = self.column("seg_words")[first:last + 1]
+                low, high = int(word_index[0]), int(word_index[-1])
+                word_texts = self._read_texts(f, self.column("word_text")[low:high + 1])
+                word_starts, word_ends = self.column("word_start"), self.column("word_end")
+                for i, segment in enumerate(segments):
+                    a, b = int(word_index[i]), int(word_index[i + 1])
+                    segment["words"] = [{"start": round(float(word_starts[j]), 2),
+                                         "end": round(float(word_ends[j]), 2),
+                                         "text": word_texts[j - low]} for j in range(a, b)]
+        return segments, next_index
+
+
+class SegmentStore:
+    """One segment file per (video, transcript source) under a directory"""
+
+    def __init__(self, directory, max_files=5000):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, video_id, source):
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", f"{video_id}.{source}") + ".seg")
+
+    def save(self, video_id, source, segments):
+        """Write (or replace) the segments of a transcript; returns the file path"""
+        columns, blob = encode_segments(segments)
+        header = {
+            "video_id": video_id,
+            "source": source,
+            "segments": len(columns["seg_start"]),
+            "words": len(columns["word_start"]),
+            "duration": round(float(columns["seg_end"].max()), 2) if len(columns["seg_end"]) else 0.0,
+            "columns": {},
+            "blob": None,
+        }
+
+        # Column offsets depend on the header length, which depends on the offsets; two passes settle it
+        for _ in range(2):
+            position = len(MAGIC) + 4 + len(json.dumps(header).encode("utf-8")) + 32
+            for name, array in columns.items():
+                position = -(-position // _ALIGN) * _ALIGN
+                header["columns"][name] = [position, len(array)]
+                position += array.nbytes
+            header["blob"] = [position, len(blob)]
+        encoded = json.dumps(header).encode("utf-8")
+
+        # Write beside the target and rename, so readers never see a partial file
+        path = self._path(video_id, source)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+                for name, array in columns.items():
+                    f.write(b"\0" * (header["columns"][name][0] - f.tell()))
+                    f.write(array.tobytes())
+                f.write(b"\0" * (header["blob"][0] - f.tell()))
+                f.write(blob)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._prune()
+        return path
+
+    def open(self, video_id, source):
+        """The SegmentFile for a transcript, or None if none was stored"""
+        path = self._path(video_id, source)
+        try:
+            segment_file = SegmentFile(path)
+            os.utime(path)  # Recency for pruning
+            return segment_file
+        except FileNotFoundError:
+            return None
+
+    def _prune(self):
+        """Keep at most max_files transcripts, removing the least recently used"""
+        with self._lock:
+            files = glob.glob(os.path.join(self.directory, "*.seg"))
+            if len(files) <= self.max_files:
+                return
+            files.sort(key=lambda name: os.path.getmtime(name) if os.path.exists(name) else 0)
+            for old in files[:len(files) - self.max_files]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
@@ -0,0 +1,57 @@
+# serve.py - Production launcher: gunicorn where available, waitress on Windows
+# Usage: python serve.py [--role all|api|media] [--host 127.0.0.1] [--port 5000] [--migrate]
+
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the WIDViz backend with a production server")
+    parser.add_argument("--role", choices=["all", "api", "media"], default=os.getenv('WIDVIZ_ROLE', 'all'),
+                        help="all: everything in one process; api/media: split behind a proxy")
+    parser.add_argument("--host", default=os.getenv('HOST', '127.0.0.1'))
+    parser.add_argument("--port", type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument("--migrate", action="store_true", help="Apply pending schema migrations first")
+    args = parser.parse_args()
+
+    # Sibling modules and relative credential paths resolve from the backend directory
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.update(WIDVIZ_ROLE=args.role, HOST=args.host, PORT=str(args.port))
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.migrate:
+        from migrations import connect, migrate
+        conn = connect()
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+
+    try:
+        from gunicorn.app.wsgiapp import run  # Not importable on Windows (needs fcntl)
+    except ImportError:
+        run = None
+
+    if run:
+        sys.argv = ["gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"), "wsgi:app"]
+        run()
+        return
+
+    try:
+        from waitress import serve
+    except ImportError:
+        sys.exit("No production server found: pip install gunicorn (Linux/macOS) or waitress (Windows)")
+
+    from wsgi import app
+    threads = int(os.getenv('API_THREADS' if args.role == 'api' else 'MEDIA_THREADS', 16))
+    serve(app, host=args.host, port=args.port, threads=threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# sessions.py - HMAC-signed session tokens with an in-memory session cache
+# Tokens carry the user and expiry; revocations are shared between workers through a MySQL table
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+from ttl_cache import TTLCache
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class RevocationTable:
+    """Logouts and password changes in the session_revocations table, visible to every worker
+
+    Each row says sessions of a subject ("sid:<id>" or "user:<email>") issued before not_before
+    are invalid; it is kept until every such session would have expired anyway.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection  # Callable returning a MySQLdb-style connection
+
+    def not_before(self, session):
+        """Latest not_before recorded for the session or its user, 0 if none"""
+        cur = self._connection().cursor()
+        try:
+            cur.execute("SELECT MAX(not_before) FROM session_revocations WHERE subject IN (%s, %s)",
+                        (f"sid:{session['sid']}", f"user:{session['email']}"))
+            row = cur.fetchone()
+        finally:
+            cur.close()
+        return (row[0] if row else None) or 0
+
+    def record(self, subject, not_before, expires_at):
+        """Store a revocation and purge rows whose sessions have all expired"""
+        conn = self._connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM session_revocations WHERE expires_at < %s", (time.time(),))
+            cur.execute("REPLACE INTO session_revocations (subject, not_before, expires_at) VALUES (%s, %s, %s)",
+                        (subject, not_before, expires_at))
+            conn.commit()
+        finally:
+            cur.close()
+
+
+class SessionStore:
+    """Issues and verifies signed session tokens
+
+    A verified token is kept in an LRU cache for verify_ttl seconds, so repeat requests skip
+    decoding and the shared revocation lookup. Revocations apply at once in the worker that
+    records them and within verify_ttl in the others.
+    """
+
+    def __init__(self, secret, ttl=7 * 24 * 3600, max_sessions=10000, revocations=None, verify_ttl=30):
+        self._secret = secret.encode("utf-8") if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self._shared = revocations  # RevocationTable, or None for a single process
+        self._verified = TTLCache(maxsize=max_sessions, ttl=min(ttl, verify_ttl))  # token -> session
+        self._revoked = TTLCache(maxsize=max_sessions, ttl=ttl)     # session id -> True
+        self._not_before = TTLCache(maxsize=max_sessions, ttl=ttl)  # email -> earlier sessions are invalid
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self._secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, email, username):
+        """Create a session and return its token"""
+        now = time.time()
+        session = {
+            "sid": secrets.token_urlsafe(12),
+            "email": email,
+            "username": username,
+            "iat": round(now, 3),
+            "exp": int(now + self.ttl),
+        }
+        payload = _b64encode(json.dumps(session, separators=(",", ":")).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}"
+
+    def _decode(self, token):
+        """Check the signature and return the session payload, or None"""
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            session = json.loads(_b64decode(payload))
+        except ValueError:
+            return None
+        return session if {"sid", "email", "iat", "exp"} <= session.keys() else None
+
+    def verify(self, token):
+        """Return the session for a valid, unexpired, unrevoked token, else None"""
+        if not token:
+            return None
+        session = self._verified.get(token)
+        if session is None:
+            try:
+                session = self._decode(token)
+            except (UnicodeError, ValueError):
+                session = None
+            if session is None:
+                return None
+            if self._shared and session["iat"] < self._shared.not_before(session):
+                return None
+            self._verified.set(token, session)
+
+        if session["exp"] < time.time() or self._revoked.get(session["sid"]):
+            return None
+        if session["iat"] < self._not_before.get(session["email"], 0):
+            return None
+        return session
+
+    def revoke(self, token):
+        """End one session (logout)"""
+        session = self.verify(token)
+        if session:
+            self._revoked.set(session["sid"], True, ttl=max(1, session["exp"] - time.time()))
+            self._verified.invalidate(token)
+            if self._shared:
+                self._shared.record(f"sid:{session['sid']}", time.time(), session["exp"])
+
+    def revoke_user(self, email):
+        """End every session a user holds (password change)"""
+        now = time.time()
+        self._not_before.set(email, now)
+        if self._shared:
+            self._shared.record(f"user:{email}", now, now + self.ttl)
+
+    def stats(self):
+        """Cache counters for the verified-token cache"""
+        return self._verified.stats()
@@ -0,0 +1,53 @@
+# startup_profile.py - Import-time profile of the backend process
+# Heavy dependencies are imported on first use through timed_import, so their cost shows up here
+
+import importlib
+import sys
+import threading
+import time
+
+_started = time.perf_counter()
+_lock = threading.Lock()
+_milestones = []   # (label, seconds since the profile started)
+_imports = {}      # module name -> {"seconds", "at", "thread"}
+
+
+def mark(label):
+    """Record a startup milestone (e.g. "imports", "ready")"""
+    with _lock:
+        _milestones.append((label, round(time.perf_counter() - _started, 4)))
+
+
+def timed_import(name):
+    """Import a module by name on first use and record how long it took"""
+    module = sys.modules.get(name)
+    # A module another thread is still executing is in sys.modules already; import_module waits for it
+    if module is not None and not getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return module
+
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        _imports.setdefault(name, {
+            "seconds": round(time.perf_counter() - started, 4),
+            "at": round(started - _started, 4),
+            "thread": threading.current_thread().name,
+        })
+    return module
+
+
+def imported(name):
+    """Whether a module is already loaded (without importing it)"""
+    return name in sys.modules
+
+
+def report():
+    """Milestones and lazy imports so far, slowest imports first"""
+    with _lock:
+        lazy = sorted(_imports.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        return {
+            "uptime_seconds": round(time.perf_counter() - _started, 3),
+            "milestones": dict(_milestones),
+            "lazy_imports": dict(lazy),
+            "loaded_modules": len(sys.modules),
+        }
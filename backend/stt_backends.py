@@ -0,0 +1,92 @@
+# stt_backends.py - Speech-to-text backends behind one transcriber interface
+# "whisper" is openai-whisper on PyTorch; "faster-whisper" is CTranslate2 with int8 weights
+
+import os
+
+
+class SpeechBackend:
+    """Interface every speech-to-text backend implements"""
+
+    name = None
+
+    def load(self, model_name, device, threads=None):
+        """Load and return a model object for this backend"""
+        raise NotImplementedError
+
+    def transcribe(self, model, audio, device, language=None, word_timestamps=False):
+        """Transcribe a 16 kHz float32 array
+
+        Returns {"text": str, "segments": [{"start", "end", "text"}]} with
+        times in seconds relative to the start of the array. With word_timestamps
+        each segment also has "words": [{"start", "end", "text"}].
+        """
+        raise NotImplementedError
+
+
+class WhisperBackend(SpeechBackend):
+    """Reference openai-whisper implementation"""
+
+    name = "whisper"
+
+    def load(self, model_name, device, threads=None):
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        return whisper.load_model(model_name, device=device)
+
+    def transcribe(self, model, audio, device, language=None, word_timestamps=False):
+        result = model.transcribe(audio, fp16=(device == "cuda"), language=language,
+                                  word_timestamps=word_timestamps)
+        segments = []
+        for seg in result.get("segments", []):
+            segment = {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+            if word_timestamps:
+                segment["words"] = [{"start": word["start"], "end": word["end"], "text": word["word"]}
+                                    for word in seg.get("words", [])]
+            segments.append(segment)
+        return {"text": result.get("text", ""), "segments": segments}
+
+
+class FasterWhisperBackend(SpeechBackend):
+    """CTranslate2 implementation; int8 quantization makes CPU inference several times faster"""
+
+    name = "faster-whisper"
+
+    def __init__(self, compute_type=None):
+        self.compute_type = compute_type or os.getenv('FASTER_WHISPER_COMPUTE_TYPE')
+
+    def load(self, model_name, device, threads=None):
+        from faster_whisper import WhisperModel
+
+        compute_type = self.compute_type or ("float16" if device == "cuda" else "int8")
+        return WhisperModel(model_name, device=device, compute_type=compute_type,
+                            cpu_threads=threads or 0)
+
+    def transcribe(self, model, audio, device, language=None, word_timestamps=False):
+        # Segments are produced lazily; consuming the generator runs the decode
+        segments, _ = model.transcribe(audio, language=language, beam_size=5,
+                                       word_timestamps=word_timestamps)
+        result = []
+        for seg in segments:
+            segment = {"start": seg.start, "end": seg.end, "text": seg.text}
+            if word_timestamps:
+                segment["words"] = [{"start": word.start, "end": word.end, "text": word.word}
+                                    for word in seg.words or []]
+            result.append(segment)
+        return {"text": "".join(seg["text"] for seg in result), "segments": result}
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def get_backend(name):
+    """Instantiate a backend by its configuration name"""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown transcriber backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,206 @@
+# transcription.py - Chunked, parallel speech-to-text with partial results
+# Audio is split on silence and segments are transcribed across a process pool (CPU)
+# or one after another on a shared model (GPU), publishing text as segments finish
+
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from audio_ingest import to_float32
+from stt_backends import get_backend
+
+SAMPLE_RATE = 16000
+_FRAME = SAMPLE_RATE // 50   # 20 ms analysis frames
+_ENERGY_BLOCK = 3000         # Frames (60 s) converted at a time by split_on_silence
+
+# Per-process backend and model used by pool workers (loaded once by the initializer)
+_worker_backend = None
+_worker_model = None
+_worker_language = None
+_worker_word_timestamps = False
+
+
+class TranscriptionCancelled(Exception):
+    """Raised when a transcription is cancelled between segments"""
+
+
+def split_on_silence(audio, target_seconds=30, max_seconds=45):
+    """Return (start, end) sample ranges cut at the quietest point near each target length"""
+    total = len(audio)
+    max_len = int(max_seconds * SAMPLE_RATE)
+    if total <= max_len:
+        return [(0, total)]
+
+    # RMS energy per 20 ms frame, a block at a time so int16 input is never converted whole
+    frames = total // _FRAME
+    energy = np.empty(frames, dtype=np.float32)
+    for first in range(0, frames, _ENERGY_BLOCK):
+        last = min(frames, first + _ENERGY_BLOCK)
+        block = to_float32(audio[first * _FRAME:last * _FRAME]).reshape(last - first, _FRAME)
+        energy[first:last] = np.sqrt(np.mean(np.square(block), axis=1))
+
+    ranges, start = [], 0
+    min_len = int(target_seconds * SAMPLE_RATE * 0.5)
+    while total - start > max_len:
+        # Look for the quietest frame between half the target and the hard maximum
+        first = (start + min_len) // _FRAME
+        last = min(frames, (start + max_len) // _FRAME)
+        window = energy[first:last]
+        # Prefer cuts close to the target when several frames are equally quiet
+        target = (start + int(target_seconds * SAMPLE_RATE)) // _FRAME - first
+        distance = np.abs(np.arange(len(window)) - target) / max(1, len(window))
+        cut = (first + int(np.argmin(window + distance * window.mean() * 0.1))) * _FRAME
+        ranges.append((start, cut))
+        start = cut
+    ranges.append((start, total))
+    return ranges
+
+
+def _init_worker(backend_name, model_name, threads, language, word_timestamps=False):
+    """Load the model once in each pool process"""
+    global _worker_backend, _worker_model, _worker_language, _worker_word_timestamps
+    _worker_backend = get_backend(backend_name)
+    # Split the cores between workers to avoid oversubscription
+    _worker_model = _worker_backend.load(model_name, "cpu", threads=threads)
+    _worker_language = language
+    _worker_word_timestamps = word_timestamps
+
+
+def _transcribe_in_worker(audio):
+    """Pool task: transcribe one segment with the process-local model"""
+    return _worker_backend.transcribe(_worker_model, audio, "cpu", language=_worker_language,
+                                      word_timestamps=_worker_word_timestamps)
+
+
+def _segment_result(result, offset):
+    """Convert a backend result for one chunk into absolute-time segments"""
+    offset_seconds = offset / SAMPLE_RATE
+    segments = []
+    for seg in result["segments"]:
+        segment = {"start": round(offset_seconds + seg["start"], 2),
+                   "end": round(offset_seconds + seg["end"], 2),
+                   "text": seg["text"]}
+        if "words" in seg:
+            segment["words"] = [{"start": round(offset_seconds + word["start"], 2),
+                                 "end": round(offset_seconds + word["end"], 2),
+                                 "text": word["text"]}
+                                for word in seg["words"]]
+        segments.append(segment)
+    return {"text": result["text"], "segments": segments}
+
+
+class ChunkedTranscriber:
+    """Transcribes long audio in silence-delimited segments, in parallel where possible"""
+
+    def __init__(self, registry, backend, model_name, device, processes=0, language=None,
+                 segment_seconds=30, max_segment_seconds=45, word_timestamps=False):
+        self._registry = registry        # ModelRegistry used for in-process transcription
+        self.backend = backend           # SpeechBackend that loads and runs the model
+        self.model_name = model_name
+        self.device = device
+        self.processes = processes if device == "cpu" else 0  # GPU runs in-process
+        self.language = language
+        self.word_timestamps = word_timestamps  # Per-word times in each segment (slower decode)
+        self.segment_seconds = segment_seconds
+        self.max_segment_seconds = max_segment_seconds
+
+    def _create_pool(self):
+        """Start a worker pool (each worker loads the model once); returns (pool, close)"""
+        threads = max(1, (os.cpu_count() or 1) // self.processes)
+        # Spawn rather than fork: the pool is created lazily from a request thread of a process that
+        # already holds locks, a loaded model and CUDA/OpenMP state a forked child cannot use safely
+        pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.backend.name, self.model_name, threads, self.language,
+                      self.word_timestamps)
+        )
+        return pool, lambda: pool.shutdown(wait=False, cancel_futures=True)
+
+    def _transcribe_local(self, audio):
+        """Transcribe one segment on the shared in-process model"""
+        with self._registry.acquire(self.model_name, self.device) as model:
+            return self.backend.transcribe(model, audio, self.device, language=self.language,
+                                           word_timestamps=self.word_timestamps)
+
+    def transcribe(self, audio, on_segment=None, cancel_event=None):
+        """Transcribe 16 kHz float32 or int16 samples; on_segment(index, total, piece) fires per segment
+
+        Segments are converted to float32 one at a time, so a spooled int16 memmap stays on disk.
+        """
+        ranges = split_on_silence(audio, self.segment_seconds, self.max_segment_seconds)
+        pieces = [None] * len(ranges)
+
+        def publish(index, result):
+            pieces[index] = _segment_result(result, ranges[index][0])
+            if on_segment:
+                on_segment(index, len(ranges), pieces[index])
+
+        if self.processes and len(ranges) > 1:
+            # The registry owns the pool, so WHISPER_MAX_MODELS and idle eviction cover its workers
+            with self._registry.acquire_pool(self.model_name, self.device, self._create_pool) as pool:
+                todo = iter(enumerate(ranges))
+                futures, pending = {}, set()
+                try:
+                    while True:
+                        # A few converted segments are queued at a time, never the whole audio
+                        for index, (start, end) in itertools.islice(todo, 2 * self.processes - len(pending)):
+                            future = pool.submit(_transcribe_in_worker, to_float32(audio[start:end]))
+                            futures[future] = index
+                            pending.add(future)
+                        if not pending:
+                            break
+                        done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                        if cancel_event is not None and cancel_event.is_set():
+                            raise TranscriptionCancelled()
+                        for future in done:
+                            publish(futures.pop(future), future.result())
+                finally:
+                    for future in pending:
+                        future.cancel()  # Drop queued segments after a failure or cancel
+        else:
+            for index, (start, end) in enumerate(ranges):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TranscriptionCancelled()
+                publish(index, self._transcribe_local(to_float32(audio[start:end])))
+
+        return {
+            "text": "".join(piece["text"] for piece in pieces),
+            "segments": [seg for piece in pieces for seg in piece["segments"]],
+        }
+
+
+class OrderedSegments:
+    """Collects out-of-order segment results and exposes the contiguous finished prefix"""
+
+    def __init__(self):
+        self._pieces = {}
+        self._next = 0
+        self._prefix = []
+        self._lock = threading.Lock()
+
+    def add(self, index, piece):
+        """Store a piece; return True if the contiguous prefix grew"""
+        with self._lock:
+            self._pieces[index] = piece
+            grew = False
+            while self._next in self._pieces:
+                self._prefix.append(self._pieces.pop(self._next))
+                self._next += 1
+                grew = True
+            return grew
+
+    def prefix_text(self):
+        """Text of all segments finished so far without gaps"""
+        with self._lock:
+            return "".join(piece["text"] for piece in self._prefix)
+
+    def prefix_segments(self):
+        """Timestamped segments of the finished prefix"""
+        with self._lock:
+            return [seg for piece in self._prefix for seg in piece["segments"]]
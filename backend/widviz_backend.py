@@ -1,6 +1,7 @@
 # widviz_backend.py - Backend server for WIDViz application (Witness Information & Data Visualization)
 # This file provides API endpoints for user management, notes, goals, video summarization, and quizzes
 
+from startup_profile import mark, timed_import, imported, report as import_profile  # Lazy heavy imports, startup timing
 import subprocess  # For running system commands (like yt-dlp)
 import traceback   # For detailed error logging
 import os          # For accessing environment variables and file operations
@@ -11,38 +12,199 @@ import random      # For generating random numbers (OTP)
 import base64      # For encoding PDFs to base64
 import bcrypt      # For password hashing and verification
 import calendar    # For calendar operations (goals feature)
+import re          # For parsing URLs, captions and tool output
+import hashlib     # ETags for cached responses
+import logging     # Trace IDs in log lines
 import MySQLdb.cursors  # MySQL cursor types
-import requests    # For making HTTP requests (to Ollama API)
 from datetime import date, datetime, timedelta  # Date/time handling
 from flask import Flask, request, render_template, redirect, url_for, session, flash, jsonify, Response  # Flask web framework
 from flask_cors import CORS  # Cross-Origin Resource Sharing support
-from flask_mysqldb import MySQL  # MySQL integration for Flask
-from googleapiclient.discovery import build  # YouTube API client
+from db_pool import PooledMySQL, PoolTimeout  # Pooled MySQL connections for Flask
 from collections import defaultdict  # Dictionary with default values
-from io import BytesIO  # In-memory binary streams
-from reportlab.pdfgen import canvas  # PDF generation
-from reportlab.lib.pagesizes import letter  # Standard page size for PDFs
-from flask import current_app  # Access to current Flask application
-from email.mime.text import MIMEText
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-# Audio processing imports
-import whisper     # OpenAI's speech-to-text library
-import torch       # PyTorch for deep learning
+from functools import lru_cache, wraps  # Memoized calendar skeletons, route decorators
+from concurrent.futures import ThreadPoolExecutor  # Bounded bcrypt pool
+from flask import current_app, stream_with_context, g, send_file  # Current app, streamed responses, request state, file downloads
+from flask.logging import default_handler  # Flask's log handler (trace ID format)
+# Audio processing imports (torch, whisper, numpy, reportlab and the Google clients load on first use)
+import threading   # Background model warm-up and eviction
+from model_registry import ModelRegistry  # Shared Whisper model cache
+from result_cache import ResultCache  # Persistent transcript/summary cache
+from jobs import JobManager, JobCancelled, COMPLETED, LOW_PRIORITY  # Background summarization jobs
+from admission import AdmissionPolicy, AdmissionRejected, video_info  # Metadata checks before transcription
+from chunking import MapReduceSummarizer, estimate_tokens  # Chunked summaries of long transcripts
+from ollama_client import OllamaClient, OllamaTimeout  # Pooled Ollama HTTP client
+from quiz import QuizGenerator, DIFFICULTIES  # JSON quiz generation and validation
+from stt_backends import get_backend, BACKENDS  # Selectable speech-to-text implementations
+from ttl_cache import TTLCache  # In-memory LRU+TTL cache with single-flight loads
+from metrics import Registry, TraceIdFilter, timed, new_trace_id, current_trace_id, set_trace_id, reset_trace_id  # /metrics and trace IDs
+from sessions import RevocationTable, SessionStore  # Signed session tokens
+from outbox import Outbox, GmailTransport, SmtpTransport  # Background email delivery
+import shutil      # Removing per-job temp directories
+import tempfile    # Unique per-job temp paths
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
 load_dotenv()
+mark("imports")
 
 OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'mistral')
+SUMMARY_PROMPT_VERSION = "2"  # Bump when the summary prompt changes to invalidate cached summaries
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 2000))  # Transcript window per prompt
+SUMMARY_CHUNK_OVERLAP = int(os.getenv('SUMMARY_CHUNK_OVERLAP', 150))  # Tokens repeated between windows
+QUIZ_CONTEXT_TOKENS = int(os.getenv('QUIZ_CONTEXT_TOKENS', 1750))  # Transcript budget in quiz prompts
+OLLAMA_PARALLELISM = int(os.getenv('OLLAMA_PARALLELISM', 2))  # Concurrent chunk requests to Ollama
+
+# Shared keep-alive client with cached health checks and a circuit breaker
+ollama = OllamaClient(
+    OLLAMA_URL,
+    pool_size=int(os.getenv('OLLAMA_POOL_SIZE', 10)),
+    timeout=int(os.getenv('OLLAMA_TIMEOUT', 60)),
+    retries=int(os.getenv('OLLAMA_RETRIES', 2)),
+    backoff=float(os.getenv('OLLAMA_BACKOFF', 0.5)),
+    failure_threshold=int(os.getenv('OLLAMA_FAILURE_THRESHOLD', 3)),
+    reset_timeout=int(os.getenv('OLLAMA_RESET_SECONDS', 30))
+)
+
+@lru_cache(maxsize=1)
+def get_device():
+    """Device for Whisper: GPU if available (imports torch on first call)"""
+    try:
+        torch = timed_import("torch")
+    except ImportError:  # faster-whisper does not need torch
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+# ===== Whisper Model Registry =====
+TRANSCRIBER_BACKEND = os.getenv('TRANSCRIBER_BACKEND', 'whisper')  # whisper | faster-whisper
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')  # Base model (faster)
+WHISPER_MAX_MODELS = int(os.getenv('WHISPER_MAX_MODELS', 2))  # Models and worker pools kept in memory
+WHISPER_IDLE_SECONDS = int(os.getenv('WHISPER_IDLE_SECONDS', 1800))  # Unload after idle (0 = never)
+WHISPER_WARMUP = os.getenv('WHISPER_WARMUP', '').split(',')  # Models preloaded at startup
+
+# Long audio is split on silence and transcribed by a pool of worker processes (CPU only)
+TRANSCRIBE_PROCESSES = int(os.getenv('TRANSCRIBE_PROCESSES', min(4, max(1, (os.cpu_count() or 2) // 2))))
+WHISPER_LANGUAGE = os.getenv('WHISPER_LANGUAGE') or None  # None = detect per segment
+WHISPER_WORD_TIMESTAMPS = os.getenv('WHISPER_WORD_TIMESTAMPS', 'false').lower() == 'true'  # Per-word times (slower)
+
+# ===== Audio Ingest =====
+# stream: PCM piped into memory, spool: PCM in a memory-mapped temp file, file: legacy WAV download
+AUDIO_INGEST_MODE = os.getenv('AUDIO_INGEST_MODE', 'stream')
+AUDIO_SPOOL_DIR = os.getenv('AUDIO_SPOOL_DIR', tempfile.gettempdir())
+MAX_AUDIO_MINUTES = int(os.getenv('MAX_AUDIO_MINUTES', 180))
+
+# Admission: video metadata is checked before any audio is downloaded (0 disables a budget)
+ADMISSION_LOW_PRIORITY_MINUTES = int(os.getenv('ADMISSION_LOW_PRIORITY_MINUTES', 60))  # Longer videos wait behind shorter ones
+ADMISSION_SMALL_MODEL_MINUTES = int(os.getenv('ADMISSION_SMALL_MODEL_MINUTES', 0))  # Longer videos use WHISPER_SMALL_MODEL
+WHISPER_SMALL_MODEL = os.getenv('WHISPER_SMALL_MODEL', 'tiny')
+TRANSCRIPT_MODELS = list(dict.fromkeys([WHISPER_MODEL, WHISPER_SMALL_MODEL]))  # Cached transcripts, preferred first
+VIDEO_INFO_TTL = int(os.getenv('VIDEO_INFO_TTL', 3600))  # Seconds video metadata stays cached
+FINGERPRINT_DEDUPE = os.getenv('FINGERPRINT_DEDUPE', 'true').lower() == 'true'  # Reuse transcripts of re-uploaded audio
+FINGERPRINT_MATCH_THRESHOLD = float(os.getenv('FINGERPRINT_MATCH_THRESHOLD', 0.3))  # Max bit error rate (unrelated ~0.5)
+
+stt_backend = get_backend(TRANSCRIBER_BACKEND)
+whisper_models = ModelRegistry(
+    lambda name, dev: stt_backend.load(name, dev),
+    max_models=WHISPER_MAX_MODELS
+)
+
+@lru_cache(maxsize=None)
+def get_transcriber(model=WHISPER_MODEL):
+    """Parallel transcriber for a Whisper model (its worker pool lives in whisper_models); imports numpy and torch"""
+    transcription = timed_import("transcription")
+    return transcription.ChunkedTranscriber(
+        whisper_models, stt_backend, model, get_device(),
+        processes=TRANSCRIBE_PROCESSES,
+        language=WHISPER_LANGUAGE,
+        word_timestamps=WHISPER_WORD_TIMESTAMPS
+    )
+
+def start_whisper_maintenance():
+    """Warm up configured models and periodically unload idle ones"""
+    def run():
+        warm = [name.strip() for name in WHISPER_WARMUP if name.strip()]
+        if warm:
+            try:
+                whisper_models.warm_up(warm, get_device())
+                app.logger.info(f"Whisper models warmed up: {warm}")
+            except Exception as e:
+                app.logger.error(f"Whisper warm-up failed: {str(e)}")
+
+        while WHISPER_IDLE_SECONDS > 0:
+            time.sleep(min(WHISPER_IDLE_SECONDS, 60))
+            evicted = whisper_models.evict_idle(WHISPER_IDLE_SECONDS)
+            if evicted:
+                app.logger.info(f"Unloaded idle Whisper models and worker pools: {evicted}")
 
-# Set device configuration for Whisper (use GPU if available)
-device = "cuda" if torch.cuda.is_available() else "cpu"
+    threading.Thread(target=run, name="whisper-maintenance", daemon=True).start()
 
 # Initialize Flask application
 app = Flask(__name__)
-CORS(app)  # Enable Cross-Origin Resource Sharing for all routes
+CORS(app, expose_headers=["ETag", "Content-Disposition", "X-Request-ID"])  # Enable Cross-Origin Resource Sharing for all routes (headers readable by the renderer)
+
+# ===== Metrics & Tracing =====
+# Per-process; scrape every worker (or run a single process) when serving with several workers
+
+registry = Registry()
+http_request_seconds = registry.histogram(
+    "widviz_http_request_seconds", "Flask request latency (until the response starts)", ("route", "method", "status"))
+db_query_seconds = registry.histogram(
+    "widviz_db_query_seconds", "MySQL statement latency", ("statement",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+stage_seconds = registry.histogram(
+    "widviz_stage_seconds", "Video and quiz pipeline step latency", ("stage", "outcome"))
+job_stage_seconds = registry.histogram(
+    "widviz_job_stage_seconds", "Summary job stage latency (after waiting for a stage slot)", ("stage", "outcome"))
+result_cache_lookups = registry.counter(
+    "widviz_result_cache_lookups_total", "Transcript/summary cache lookups", ("table", "outcome"))
+audio_bytes = registry.counter(
+    "widviz_audio_bytes_total", "Audio ingested (16 kHz PCM when streamed, WAV size in file mode)", ("mode",))
+audio_seconds = registry.counter(
+    "widviz_audio_seconds_transcribed_total", "Seconds of audio transcribed", ("backend",))
+
+# Request IDs are accepted from X-Request-ID, returned in the response and added to log lines
+default_handler.addFilter(TraceIdFilter())
+default_handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s in %(module)s [%(trace_id)s]: %(message)s"))
+
+@app.before_request
+def start_request_metrics():
+    """Start the request timer and bind a trace ID"""
+    g.request_started = time.perf_counter()
+    g.trace_token = set_trace_id(new_trace_id(request.headers.get('X-Request-ID')))
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the request's latency and echo its trace ID"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The URL rule (e.g. /api/notes/get) keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_request_seconds.observe(time.perf_counter() - started, route=route,
+                                     method=request.method, status=response.status_code)
+    response.headers['X-Request-ID'] = current_trace_id() or ''
+    return response
+
+@app.teardown_request
+def clear_trace_id(exception):
+    token = g.pop('trace_token', None)
+    if token is not None:
+        reset_trace_id(token)
+
+@lru_cache(maxsize=1024)
+def statement_label(sql):
+    """Low-cardinality label for a SQL statement: its verb and first table (e.g. SELECT notes)"""
+    verb = re.match(r"\s*(\w+)", sql)
+    table = re.search(r"\b(?:FROM|INTO|UPDATE)\s+`?(\w+)", sql, re.IGNORECASE)
+    label = verb.group(1).upper() if verb else "?"
+    return f"{label} {table.group(1)}" if table else label
+
+def record_query(sql, seconds):
+    db_query_seconds.observe(seconds, statement=statement_label(sql))
+
+@app.route('/metrics', methods=['GET'])
+def metrics_api():
+    """Prometheus text exposition of this process's metrics"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # ===== Database Configuration =====
 # Get MySQL credentials from environment variables
@@ -55,8 +217,20 @@ app.config['MYSQL_CURSORCLASS'] = os.getenv('MYSQL_CURSORCLASS')
 # Secret key for session management
 app.secret_key = os.getenv('SECRET_KEY')
 
-# Initialize MySQL connection
-mysql = MySQL(app)
+# Bounded MySQL pool; each request borrows one connection via mysql.connection
+mysql = PooledMySQL(
+    app,
+    on_query=record_query,  # Statement timings for /metrics
+    size=int(os.getenv('DB_POOL_SIZE', 10)),
+    timeout=int(os.getenv('DB_POOL_TIMEOUT', 10)),
+    ping_after=int(os.getenv('DB_POOL_PING_AFTER', 30)),
+    max_lifetime=int(os.getenv('DB_POOL_MAX_LIFETIME', 3600))
+)
+
+@app.errorhandler(PoolTimeout)
+def database_busy(error):
+    """All pooled connections are in use"""
+    return jsonify({"success": False, "message": "Server is busy, please try again."}), 503
 
 # ===== Gmail Initiation ===== #
 
@@ -64,9 +238,97 @@ SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 CREDENTIALS_FILE = 'credentials.json'  # Use the correct credentials file
 TOKEN_FILE = 'token.json'  # Path to store the OAuth token
 
+# ===== Transcript & Summary Cache ===== #
+result_cache = ResultCache(
+    os.getenv('CACHE_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'widviz_cache.sqlite3')),
+    ttl_seconds=int(os.getenv('CACHE_TTL_SECONDS', 7 * 24 * 3600)),
+    max_bytes=int(os.getenv('CACHE_MAX_MB', 256)) * 1024 * 1024
+)
+
 # ===== YouTube API Setup ===== #
 API_KEY = os.getenv('YOUTUBE_API_KEY')
-youtube = build("youtube", "v3", developerKey=API_KEY, static_discovery=False)
+
+@lru_cache(maxsize=1)
+def get_youtube():
+    """YouTube Data API client, built on first use from the discovery document bundled with the library"""
+    discovery = timed_import("googleapiclient.discovery")
+    return discovery.build("youtube", "v3", developerKey=API_KEY,
+                           static_discovery=True, cache_discovery=False)
+
+# ===== Sessions & Password Hashing =====
+
+SESSION_SECRET_FILE = os.getenv('SESSION_SECRET_FILE', os.path.join(app.instance_path, 'session_secret'))
+
+def load_or_create_secret(path):
+    """Read the persisted session key, generating it on first start
+
+    The key is written to a temporary file and hard-linked into place, so workers starting
+    together all end up with the one key that won.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+            f.write(os.urandom(32).hex().encode('ascii'))
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
+SESSION_SECRET = os.getenv('SESSION_SECRET') or app.secret_key
+if not SESSION_SECRET:
+    # Shared by every worker on this host and kept across restarts
+    SESSION_SECRET = load_or_create_secret(SESSION_SECRET_FILE)
+    app.logger.warning(f"SESSION_SECRET/SECRET_KEY not set; using the generated key in {SESSION_SECRET_FILE}")
+
+sessions = SessionStore(
+    SESSION_SECRET,
+    ttl=int(os.getenv('SESSION_TTL_HOURS', 24 * 7)) * 3600,
+    max_sessions=int(os.getenv('SESSION_CACHE_SIZE', 10000)),
+    # Logouts and password changes reach other workers through MySQL within this many seconds
+    revocations=RevocationTable(lambda: mysql.connection),
+    verify_ttl=int(os.getenv('SESSION_VERIFY_TTL', 30))
+)
+
+# bcrypt is deliberately slow; a small pool keeps login storms from starving other requests
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', 2))
+bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+bcrypt_slots = threading.BoundedSemaphore(BCRYPT_WORKERS * int(os.getenv('BCRYPT_QUEUE_PER_WORKER', 8)))
+
+class AuthBusy(Exception):
+    """Too many password hashes are already queued"""
+
+def run_bcrypt(fn, *args):
+    """Run a bcrypt call on the bounded pool and wait for its result"""
+    if not bcrypt_slots.acquire(timeout=5):
+        raise AuthBusy()
+    try:
+        return bcrypt_pool.submit(fn, *args).result()
+    finally:
+        bcrypt_slots.release()
+
+def auth_busy_response():
+    return jsonify({"success": False, "message": "Server is busy, please try again."}), 503
+
+def request_token():
+    """Session token from the Authorization header (never the URL, which ends up in logs and history)"""
+    header = request.headers.get('Authorization', '')
+    return header[7:] if header.startswith('Bearer ') else None
+
+def require_session(view):
+    """Reject requests without a valid session; the session is available as g.user"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user = sessions.verify(request_token())
+        if not user:
+            return jsonify({"success": False, "message": "Please log in again."}), 401
+        g.user = user
+        return view(*args, **kwargs)
+    return wrapper
 
 # ===== Authentication Endpoints =====
 
@@ -83,7 +345,7 @@ def login():
 
     # Check database for user
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT * FROM users WHERE email = %s", [email])
+    cur.execute("SELECT username, password FROM users WHERE email = %s", [email])
     user = cur.fetchone()
     cur.close()
 
@@ -92,7 +354,11 @@ def login():
         return jsonify({"success": False, "message": "No account found with this email."})
 
     # Verify password
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    try:
+        valid = run_bcrypt(bcrypt.checkpw, password.encode('utf-8'), user['password'].encode('utf-8'))
+    except AuthBusy:
+        return auth_busy_response()
+    if not valid:
         return jsonify({"success": False, "message": "Incorrect password."})
 
     # Successful login response
@@ -101,10 +367,17 @@ def login():
         "message": "Login successful!",
         "user": {
             "email": email,
-            "username": user['username']
+            "username": user['username'],
+            "token": sessions.issue(email, user['username'])
         }
     })
 
+@app.route('/api/logout', methods=['POST'])
+def logout():
+    """End the current session"""
+    sessions.revoke(request_token())
+    return jsonify({"success": True, "message": "Logged out."})
+
 @app.route('/api/signup', methods=['POST'])
 def signup():
     """Create new user accounts"""
@@ -119,7 +392,7 @@ def signup():
 
     # Check for existing user
     cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM users WHERE email = %s", [email])
+    cur.execute("SELECT 1 FROM users WHERE email = %s", [email])
     existing_user = cur.fetchone()
     cur.close()
 
@@ -128,7 +401,10 @@ def signup():
         return jsonify({"success": False, "message": "Account already exists."})
 
     # Create password hash and insert new user
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    try:
+        hashed_password = run_bcrypt(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    except AuthBusy:
+        return auth_busy_response()
     cur = mysql.connection.cursor()
     cur.execute("INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
                 (username, email, hashed_password))
@@ -155,7 +431,7 @@ def forgot_password():
     if user:
         # Generate 6-digit OTP (in real app, send via email)
         otp = random.randint(100000, 999999)
-        send_email(email, 'Password Reset OTP', f'Your OTP is {otp}.')
+        send_email(email, 'Password Reset OTP', f'Your OTP is {otp}.')  # Queued; delivered in the background
         return jsonify({
             "success": True, 
             "message": "OTP generated.",
@@ -189,48 +465,402 @@ def reset_password():
         return jsonify({"success": False, "message": "Password is required."})
 
     # Hash and update password
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    try:
+        hashed_password = run_bcrypt(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    except AuthBusy:
+        return auth_busy_response()
     cur = mysql.connection.cursor()
     cur.execute("UPDATE users SET password = %s WHERE email = %s",
                 (hashed_password, email))
     mysql.connection.commit()
     cur.close()
+    sessions.revoke_user(email)  # Sessions opened with the old password end here
 
     return jsonify({"success": True, "message": "Password reset successful."})
 
+# ===== Batch Mutation Helpers =====
+
+BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', 1000))  # Operations per batch request
+BATCH_MAX_ROWS = int(os.getenv('BATCH_MAX_ROWS', 5000))  # Rows inserted per batch after expansion
+
+def batch_failure(index, message):
+    """Per-item result for an operation that was not applied"""
+    return {"index": index, "success": False, "message": message}
+
+def insert_rows(cur, sql, rows):
+    """INSERT each row inside the caller's transaction; returns the new ids in row order"""
+    # One statement per row: AUTO_INCREMENT ids of a multi-row INSERT are not guaranteed consecutive
+    # (statement splitting, auto_increment_increment, interleaved lock mode)
+    ids = []
+    for row in rows:
+        cur.execute(sql, row)
+        ids.append(cur.lastrowid)
+    return ids
+
+def lock_owned_ids(cur, table, owner_column, owner, ids, condition=""):
+    """Ids from the batch that exist and belong to the user, locked until commit"""
+    if not ids:
+        return set()
+    ids = sorted(set(ids))
+    placeholders = ", ".join(["%s"] * len(ids))
+    cur.execute(f"SELECT id FROM {table} WHERE {owner_column} = %s AND id IN ({placeholders}) {condition} FOR UPDATE",
+                [owner] + ids)
+    return {row['id'] for row in cur.fetchall()}
+
+def apply_by_id(cur, sql, items, found, results, missing_message):
+    """executemany an UPDATE/DELETE for (index, id, params) items whose id was found"""
+    hits = [params for _, item_id, params in items if item_id in found]
+    if hits:
+        cur.executemany(sql, hits)
+    for index, item_id, _ in items:
+        results[index] = ({"index": index, "success": True, "id": item_id} if item_id in found
+                          else batch_failure(index, missing_message))
+
+def parse_batch_request():
+    """Return (operations, error_response) for a batch endpoint"""
+    operations = (request.json or {}).get('operations')
+    if not isinstance(operations, list):
+        return None, jsonify({"success": False, "message": "A list of operations is required."})
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return None, jsonify({"success": False,
+                              "message": f"At most {BATCH_MAX_OPERATIONS} operations per batch."})
+    return operations, None
+
+def run_batch(apply, results, on_commit=None):
+    """Run apply(cur) in one transaction and return the per-item results"""
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        apply(cur)
+        mysql.connection.commit()
+    except MySQLdb.Error as e:
+        mysql.connection.rollback()
+        app.logger.error(f"Batch failed: {e}")
+        return jsonify({"success": False, "message": "Batch failed; no changes were applied."})
+    finally:
+        cur.close()
+    
+    if on_commit:
+        on_commit()
+    return jsonify({"success": all(result["success"] for result in results),
+                    "applied": sum(1 for result in results if result["success"]),
+                    "results": results})
+
+# ===== Search =====
+
+SEARCH_DIR = os.getenv('SEARCH_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'widviz_search'))
+OLLAMA_EMBED_MODEL = os.getenv('OLLAMA_EMBED_MODEL', 'nomic-embed-text')  # Empty = keyword search only
+SEARCH_MAX_RESULTS = 50
+_NOTE_SYNC_PAGE = 500  # Notes read per catch-up query
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def get_search_index():
+    """Search index, opened on first use (imports numpy) together with its embedding worker"""
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            index = timed_import("search_index").SearchIndex(
+                SEARCH_DIR,
+                embed=(lambda texts: ollama.embed(texts, OLLAMA_EMBED_MODEL)) if OLLAMA_EMBED_MODEL else None,
+                model=OLLAMA_EMBED_MODEL,
+                min_similarity=float(os.getenv('SEARCH_MIN_SIMILARITY', 0.3)),
+                logger=app.logger.warning
+            )
+            index.start_worker()
+            # Transcripts cached before search existed are indexed once, in the background
+            if index.get_marker("transcripts_indexed") is None:
+                threading.Thread(target=index_cached_transcripts, args=(index,),
+                                 name="search-backfill", daemon=True).start()
+            _search_index = index
+        return _search_index
+
+def index_cached_transcripts(index):
+    """Add every transcript in the result cache to the search index"""
+    try:
+        for video_id, transcript in result_cache.iter_transcripts():
+            index_transcript(video_id, transcript, index)
+        index.set_marker("transcripts_indexed", time.time())
+    except Exception as e:
+        app.logger.error(f"Transcript indexing failed: {str(e)}")
+
+def index_transcript(video_id, transcript, index=None):
+    """Make a transcript searchable by every user (cached transcripts are shared)"""
+    try:
+        index = index or get_search_index()
+        index.upsert("transcript", video_id, timed_import("search_index").PUBLIC,
+                     f"YouTube video {video_id}", transcript)
+    except Exception as e:
+        app.logger.error(f"Search indexing failed for video {video_id}: {str(e)}")
+
+def index_notes(email, upserts=(), deletes=()):
+    """Reflect note changes in the search index: upserts are (id, title, content)
+
+    Skipped until the index is open; the catch-up in sync_note_index covers it then.
+    Search problems never fail a note request.
+    """
+    if _search_index is None:
+        return
+    try:
+        for note_id, title, content in upserts:
+            _search_index.upsert("note", note_id, email, title, content)
+        for note_id in deletes:
+            _search_index.remove("note", note_id)
+    except Exception as e:
+        app.logger.error(f"Search indexing failed: {str(e)}")
+
+def sync_note_index(email):
+    """Index note changes this process has not seen (other workers, notes older than the index)"""
+    index = get_search_index()
+    marker = f"notes:{email}"
+    position = index.get_marker(marker)
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        while True:
+            # Same (updated_at, id) keyset as /api/notes/sync, tombstones included
+            conditions, params = "", [email]
+            if position:
+                updated_at, note_id = decode_position(position)
+                conditions = "AND (updated_at > %s OR (updated_at = %s AND id > %s))"
+                params += [updated_at, updated_at, note_id]
+            cur.execute(f"""
+                SELECT id, title, content, updated_at, deleted_at FROM notes
+                WHERE user_email = %s {conditions}
+                ORDER BY updated_at, id
+                LIMIT %s
+            """, params + [_NOTE_SYNC_PAGE])
+            rows = cur.fetchall()
+            for row in rows:
+                if row['deleted_at']:
+                    index.remove("note", row['id'])
+                else:
+                    index.upsert("note", row['id'], email, row['title'], row['content'])
+            if rows:
+                position = encode_position(rows[-1]['updated_at'], rows[-1]['id'])
+                index.set_marker(marker, position)
+            if len(rows) < _NOTE_SYNC_PAGE:
+                return
+    finally:
+        cur.close()
+
+@app.route('/api/search', methods=['GET'])
+@require_session
+def search_api():
+    """Search the user's notes and cached video transcripts
+
+    ?q= query, &mode=hybrid|keyword|semantic, &kinds=note,transcript, &limit=
+    """
+    query = (request.args.get('q') or '').strip()
+    mode = request.args.get('mode', 'hybrid')
+    kinds = [kind for kind in request.args.get('kinds', '').split(',') if kind]
+    
+    if not query:
+        return jsonify({"success": False, "message": "Search query is required."})
+    if mode not in ('hybrid', 'keyword', 'semantic'):
+        return jsonify({"success": False, "message": "Mode must be hybrid, keyword or semantic."})
+    if any(kind not in ('note', 'transcript') for kind in kinds):
+        return jsonify({"success": False, "message": "Kinds must be note and/or transcript."})
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), SEARCH_MAX_RESULTS))
+    except ValueError:
+        limit = 10
+    
+    started = time.perf_counter()
+    email = g.user['email']
+    sync_note_index(email)
+    hits, used_mode = get_search_index().search(email, query, limit, mode, kinds)
+    
+    return jsonify({"success": True, "results": hits, "mode": used_mode,
+                    "took_ms": round((time.perf_counter() - started) * 1000, 1)})
+
 # ===== Notes Endpoints =====
 
+NOTES_PAGE_SIZE = int(os.getenv('NOTES_PAGE_SIZE', 50))  # Default notes per list/sync page
+NOTES_PAGE_MAX = 200        # Upper bound on a client-requested page size
+NOTE_PREVIEW_CHARS = 120    # Characters of content returned in list/sync previews
+_SYNC_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+def page_limit():
+    """Read the ?limit= page size, clamped to a sane range"""
+    try:
+        limit = int(request.args.get('limit', NOTES_PAGE_SIZE))
+    except ValueError:
+        limit = NOTES_PAGE_SIZE
+    return max(1, min(limit, NOTES_PAGE_MAX))
+
+def encode_position(timestamp, row_id):
+    """Opaque keyset position (timestamp, id) for cursors and sync tokens"""
+    raw = f"{timestamp.strftime(_SYNC_FORMAT)}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_position(token):
+    """Inverse of encode_position; a bare timestamp is accepted as (timestamp, 0)"""
+    try:
+        raw = base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8')
+        timestamp, row_id = raw.split('|')
+        return datetime.strptime(timestamp, _SYNC_FORMAT), int(row_id)
+    except (ValueError, UnicodeError):
+        pass
+    for fmt in (_SYNC_FORMAT, '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(token, fmt), 0
+        except ValueError:
+            continue
+    raise ValueError("Invalid cursor.")
+
+def serialize_note(note):
+    """Convert datetime columns to strings for JSON serialization"""
+    for column in ('created_at', 'updated_at', 'deleted_at'):
+        if note.get(column):
+            note[column] = note[column].strftime('%Y-%m-%d %H:%M:%S')
+    return note
+
+def current_sync_token(cur, email):
+    """Sync token pointing at the user's most recent change (None if they have no notes)"""
+    cur.execute("""
+        SELECT id, updated_at FROM notes WHERE user_email = %s
+        ORDER BY updated_at DESC, id DESC LIMIT 1
+    """, (email,))
+    row = cur.fetchone()
+    return encode_position(row['updated_at'], row['id']) if row else None
+
 @app.route('/api/notes', methods=['GET'])
+@require_session
 def get_notes():
-    """Retrieve all notes for a user"""
-    email = request.args.get('email')
-    
-    if not email:
-        return jsonify({"success": False, "message": "Email is required."})
+    """Retrieve all notes for a user (full content; prefer /api/notes/list and /api/notes/sync)"""
+    email = g.user['email']
     
     # Fetch notes from database
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT id, title, content, created_at FROM notes WHERE user_email = %s", (email,))
+    cur.execute("""
+        SELECT id, title, content, created_at FROM notes
+        WHERE user_email = %s AND deleted_at IS NULL
+        ORDER BY created_at DESC, id DESC
+    """, (email,))
     user_notes = cur.fetchall()
     cur.close()
     
-    # Convert datetime to string for JSON serialization
-    for note in user_notes:
-        if 'created_at' in note and note['created_at']:
-            note['created_at'] = note['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    return jsonify({"success": True, "notes": [serialize_note(note) for note in user_notes]})
+
+@app.route('/api/notes/list', methods=['GET'])
+@require_session
+def list_notes():
+    """Page through a user's notes, newest first, as titles and previews"""
+    email = g.user['email']
+    cursor = request.args.get('cursor')
+    limit = page_limit()
+    
+    # Keyset pagination: continue strictly after the last (created_at, id) seen
+    conditions, params = "", [NOTE_PREVIEW_CHARS, email]
+    if cursor:
+        try:
+            created_at, note_id = decode_position(cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)})
+        conditions = "AND (created_at < %s OR (created_at = %s AND id < %s))"
+        params += [created_at, created_at, note_id]
+    
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    # Taken before the page is read so changes made meanwhile still show up in the next sync
+    sync_token = None if cursor else current_sync_token(cur, email)
+    cur.execute(f"""
+        SELECT id, title, LEFT(content, %s) AS preview, created_at, updated_at
+        FROM notes
+        WHERE user_email = %s AND deleted_at IS NULL {conditions}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = cur.fetchall()
+    cur.close()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_position(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+    
+    response = {"success": True, "notes": [serialize_note(row) for row in rows],
+                "next_cursor": next_cursor}
+    if not cursor:
+        response["sync_token"] = sync_token
+    return jsonify(response)
+
+@app.route('/api/notes/get', methods=['GET'])
+@require_session
+def get_note():
+    """Fetch a single note including its full content"""
+    note_id = request.args.get('id')
+    email = g.user['email']
+    
+    if not note_id:
+        return jsonify({"success": False, "message": "Note ID is required."})
+    
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    cur.execute("""
+        SELECT id, title, content, created_at, updated_at FROM notes
+        WHERE id = %s AND user_email = %s AND deleted_at IS NULL
+    """, (note_id, email))
+    note = cur.fetchone()
+    cur.close()
+    
+    if not note:
+        return jsonify({"success": False, "message": "Note not found."})
+    
+    return jsonify({"success": True, "note": serialize_note(note)})
+
+@app.route('/api/notes/sync', methods=['GET'])
+@require_session
+def sync_notes():
+    """Return notes created, updated or deleted after the ?since= sync token"""
+    email = g.user['email']
+    since = request.args.get('since')
+    limit = page_limit()
+    
+    # Changes are ordered by (updated_at, id) so a page boundary never splits a tie
+    conditions, params = "", [NOTE_PREVIEW_CHARS, email]
+    if since:
+        try:
+            updated_at, note_id = decode_position(since)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)})
+        conditions = "AND (updated_at > %s OR (updated_at = %s AND id > %s))"
+        params += [updated_at, updated_at, note_id]
+    
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    cur.execute(f"""
+        SELECT id, title, LEFT(content, %s) AS preview, created_at, updated_at, deleted_at
+        FROM notes
+        WHERE user_email = %s {conditions}
+        ORDER BY updated_at, id
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = cur.fetchall()
+    cur.close()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    sync_token = encode_position(rows[-1]['updated_at'], rows[-1]['id']) if rows else since
+    
+    changes, deleted = [], []
+    for row in rows:
+        if row['deleted_at']:
+            deleted.append(row['id'])
+        else:
+            del row['deleted_at']
+            changes.append(serialize_note(row))
     
-    return jsonify({"success": True, "notes": user_notes})
+    return jsonify({"success": True, "changes": changes, "deleted": deleted,
+                    "sync_token": sync_token, "has_more": has_more})
 
 @app.route('/api/notes/add', methods=['POST'])
+@require_session
 def add_note():
     """Create a new note"""
     data = request.json
-    email = data.get('email')
+    email = g.user['email']
     title = data.get('title')
     content = data.get('content')
     
-    if not email or not title:
-        return jsonify({"success": False, "message": "Email and title are required."})
+    if not title:
+        return jsonify({"success": False, "message": "Title is required."})
     
     # Insert new note
     cur = mysql.connection.cursor()
@@ -239,10 +869,12 @@ def add_note():
     mysql.connection.commit()
     note_id = cur.lastrowid
     cur.close()
+    index_notes(email, upserts=[(note_id, title, content)])
     
     return jsonify({"success": True, "message": "Note added successfully.", "id": note_id})
 
 @app.route('/api/notes/edit', methods=['POST'])
+@require_session
 def edit_note():
     """Update an existing note"""
     data = request.json
@@ -253,16 +885,20 @@ def edit_note():
     if not note_id or not title:
         return jsonify({"success": False, "message": "Note ID and title are required."})
     
-    # Update note in database
+    # Update note in database (updated_at advances automatically)
     cur = mysql.connection.cursor()
-    cur.execute("UPDATE notes SET title = %s, content = %s WHERE id = %s", 
-                (title, content, note_id))
+    cur.execute("UPDATE notes SET title = %s, content = %s WHERE id = %s AND user_email = %s AND deleted_at IS NULL", 
+                (title, content, note_id, g.user['email']))
     mysql.connection.commit()
+    changed = cur.rowcount
     cur.close()
+    if changed:
+        index_notes(g.user['email'], upserts=[(note_id, title, content)])
     
     return jsonify({"success": True, "message": "Note updated successfully."})
 
 @app.route('/api/notes/delete', methods=['POST'])
+@require_session
 def delete_note():
     """Delete a note"""
     data = request.json
@@ -271,151 +907,272 @@ def delete_note():
     if not note_id:
         return jsonify({"success": False, "message": "Note ID is required."})
     
-    # Delete note from database
+    # Leave a tombstone so delta sync can report the deletion; the body is dropped
     cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM notes WHERE id = %s", (note_id,))
+    cur.execute("""
+        UPDATE notes SET deleted_at = CURRENT_TIMESTAMP(6), content = NULL
+        WHERE id = %s AND user_email = %s AND deleted_at IS NULL
+    """, (note_id, g.user['email']))
     mysql.connection.commit()
+    deleted = cur.rowcount
     cur.close()
+    if deleted:
+        index_notes(g.user['email'], deletes=[note_id])
     
     return jsonify({"success": True, "message": "Note deleted successfully."})
 
-@app.route('/api/notes/export_pdf', methods=['GET'])
-def export_pdf():
-    """Export a note as PDF"""
-    note_id = request.args.get('id')
-    email = request.args.get('email')
+@app.route('/api/notes/batch', methods=['POST'])
+@require_session
+def batch_notes():
+    """Apply many note operations (add/edit/delete) in one transaction"""
+    email = g.user['email']
+    operations, error = parse_batch_request()
+    if error:
+        return error
     
-    if not note_id or not email:
-        return jsonify({"success": False, "message": "Note ID and email are required."})
+    results = [None] * len(operations)
+    inserts, edits, deletes = [], [], []
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind == 'add':
+            if not op.get('title'):
+                results[index] = batch_failure(index, "Title is required.")
+            else:
+                inserts.append((index, (email, op['title'], op.get('content'))))
+        elif kind in ('edit', 'delete'):
+            try:
+                note_id = int(op.get('id'))
+            except (TypeError, ValueError):
+                results[index] = batch_failure(index, "Note ID is required.")
+                continue
+            if kind == 'delete':
+                deletes.append((index, note_id, (note_id,)))
+            elif not op.get('title'):
+                results[index] = batch_failure(index, "Title is required.")
+            else:
+                edits.append((index, note_id, (op['title'], op.get('content'), note_id)))
+        else:
+            results[index] = batch_failure(index, f"Unknown operation '{kind}'.")
+    
+    def apply(cur):
+        ids = insert_rows(cur, "INSERT INTO notes (user_email, title, content) VALUES (%s, %s, %s)",
+                          [row for _, row in inserts])
+        for (index, _), note_id in zip(inserts, ids):
+            results[index] = {"index": index, "success": True, "id": note_id}
+        
+        found = lock_owned_ids(cur, 'notes', 'user_email', email,
+                               [note_id for _, note_id, _ in edits + deletes], "AND deleted_at IS NULL")
+        apply_by_id(cur, "UPDATE notes SET title = %s, content = %s WHERE id = %s",
+                    edits, found, results, "Note not found.")
+        apply_by_id(cur, """
+            UPDATE notes SET deleted_at = CURRENT_TIMESTAMP(6), content = NULL
+            WHERE id = %s AND deleted_at IS NULL
+        """, deletes, found, results, "Note not found.")
+    
+    def reindex():
+        applied = lambda index: results[index]["success"]
+        upserts = [(results[index]["id"], row[1], row[2]) for index, row in inserts if applied(index)]
+        upserts += [(note_id, params[0], params[1]) for index, note_id, params in edits if applied(index)]
+        index_notes(email, upserts, [note_id for index, note_id, _ in deletes if applied(index)])
     
-    # Fetch note from database
+    return run_batch(apply, results, on_commit=reindex)
+
+# Rendered PDFs are reused until the note's title or content changes
+@lru_cache(maxsize=1)
+def get_pdf_cache():
+    """PDF cache, created on first use (imports reportlab)"""
+    return timed_import("pdf_export").PdfCache(
+        os.getenv('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'widviz_pdf_cache')),
+        max_files=int(os.getenv('PDF_CACHE_MAX_FILES', 500))
+    )
+
+def render_owned_note(note_id, email):
+    """Return (title, cached PDF path) for a user's note, or None if it does not exist"""
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT title, content FROM notes WHERE id = %s AND user_email = %s", 
+    cur.execute("SELECT id, title, content FROM notes WHERE id = %s AND user_email = %s AND deleted_at IS NULL", 
                 (note_id, email))
     note = cur.fetchone()
     cur.close()
     
     if not note:
-        return jsonify({"success": False, "message": "Note not found."})
+        return None
     
-    # Prepare note content
     title = note["title"] or "Untitled Note"
-    content = note["content"] or "No content"
-    
-    # Create PDF in memory
-    pdf_buffer = BytesIO()
-    p = canvas.Canvas(pdf_buffer, pagesize=letter)
-    width, height = letter
-    
-    # PDF layout configuration
-    y_position = height - 50
-    left_margin = 50
-    
-    # Add title
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(left_margin, y_position, title)
-    y_position -= 20
-    
-    # Add wrapped content
-    p.setFont("Helvetica", 12)
-    from textwrap import wrap
-    wrapped_content = wrap(content, width=80)
-    
-    # Handle multi-page content
-    for line in wrapped_content:
-        if y_position <= 50:  # New page when space runs out
-            p.showPage()
-            p.setFont("Helvetica", 12)
-            y_position = height - 50
-        
-        p.drawString(left_margin, y_position, line)
-        y_position -= 15
+    return title, get_pdf_cache().get_or_render(note["id"], title, note["content"] or "No content")
+
+@app.route('/api/notes/download_pdf', methods=['GET'])
+@require_session
+def download_pdf():
+    """Download a note as a PDF file"""
+    note_id = request.args.get('id')
     
-    p.save()
-    pdf_buffer.seek(0)
+    if not note_id:
+        return jsonify({"success": False, "message": "Note ID is required."})
+    
+    rendered = render_owned_note(note_id, g.user['email'])
+    if not rendered:
+        return jsonify({"success": False, "message": "Note not found."}), 404
+    
+    # Served straight from the cache file in chunks (with ETag/Range support)
+    title, path = rendered
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=timed_import("pdf_export").pdf_filename(title), conditional=True, max_age=0)
+
+@app.route('/api/notes/export_pdf', methods=['GET'])
+@require_session
+def export_pdf():
+    """Export a note as base64 PDF in JSON (kept for older clients; prefer /api/notes/download_pdf)"""
+    note_id = request.args.get('id')
     
-    # Encode PDF for API response
-    pdf_base64 = base64.b64encode(pdf_buffer.getvalue()).decode('utf-8')
+    if not note_id:
+        return jsonify({"success": False, "message": "Note ID is required."})
+    
+    rendered = render_owned_note(note_id, g.user['email'])
+    if not rendered:
+        return jsonify({"success": False, "message": "Note not found."})
+    
+    title, path = rendered
+    with open(path, 'rb') as f:
+        pdf_base64 = base64.b64encode(f.read()).decode('utf-8')
     
     return jsonify({
         "success": True, 
         "pdf": pdf_base64,
-        "filename": f"{title.replace(' ', '_')}.pdf"
+        "filename": timed_import("pdf_export").pdf_filename(title)
     })
 
-# ===== Goals Endpoints =====
-
-@app.route('/api/goals', methods=['GET'])
-def get_goals():
-    """Get goals and calendar data for a month"""
-    email = request.args.get('email')
-    month = request.args.get('month', datetime.today().month, type=int)
-    year = request.args.get('year', datetime.today().year, type=int)
+@app.route('/api/notes/export_all', methods=['GET'])
+@require_session
+def export_all_notes():
+    """Download all of a user's notes as one PDF (?format=pdf) or a ZIP of PDFs (?format=zip)"""
+    export_format = request.args.get('format', 'zip')
+    if export_format not in ('pdf', 'zip'):
+        return jsonify({"success": False, "message": "Format must be pdf or zip."})
     
-    if not email:
-        return jsonify({"success": False, "message": "Email is required."})
+    # Unbuffered cursor: rows arrive one at a time instead of the whole result set
+    cur = mysql.connection.cursor(MySQLdb.cursors.SSCursor)
+    cur.execute("""
+        SELECT id, title, content FROM notes
+        WHERE user_email = %s AND deleted_at IS NULL
+        ORDER BY created_at, id
+    """, (g.user['email'],))
+    
+    # Spool to disk past a few MB; the response is then streamed from the file
+    output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        if export_format == 'pdf':
+            timed_import("pdf_export").render_notes_pdf(output, ((title, content) for _, title, content in cur))
+        else:
+            get_pdf_cache().write_zip(output, cur)
+    finally:
+        cur.close()
+    output.seek(0)
     
-    # Fetch goals for the month
+    return send_file(output, mimetype='application/pdf' if export_format == 'pdf' else 'application/zip',
+                     as_attachment=True, download_name=f"widviz_notes.{export_format}", max_age=0)
+
+# ===== Goals Endpoints =====
+
+CALENDAR_CACHE_TTL = int(os.getenv('CALENDAR_CACHE_TTL', 300))  # Seconds a rendered month stays cached
+
+# Rendered month responses keyed by (email, goals_version, year, month, today).
+# users.goals_version lives in MySQL so a change made through one worker invalidates every worker's copy.
+calendar_cache = TTLCache(maxsize=int(os.getenv('CALENDAR_CACHE_SIZE', 1024)), ttl=CALENDAR_CACHE_TTL)
+
+def bump_goals_version(cur, email):
+    """Mark a user's cached months stale in all workers; call inside the mutation's transaction"""
+    cur.execute("UPDATE users SET goals_version = goals_version + 1 WHERE email = %s", (email,))
+
+def invalidate_calendar(email):
+    """Free this worker's cached months for a user after a committed goal mutation"""
+    calendar_cache.invalidate_where(lambda key: key[0] == email)
+
+@lru_cache(maxsize=256)
+def month_skeleton(year, month):
+    """Weeks of (day number, ISO date, in current month) for a Monday-first month grid"""
+    cal = calendar.Calendar(firstweekday=0)
+    return tuple(
+        tuple((day.day, day.isoformat(), day.month == month) for day in week)
+        for week in cal.monthdatescalendar(year, month)
+    )
+
+def render_calendar(email, year, month, today):
+    """Fetch a month of goals and render the calendar response; returns (body, etag)"""
+    # Fetch goals for the month as a date range so idx_goals_email_date is used
+    month_start = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     cur.execute("""
-        SELECT id, goal_text, DATE(goal_date) as goal_date, status 
+        SELECT id, goal_text, goal_date, status 
         FROM goals 
-        WHERE email = %s AND MONTH(goal_date) = %s AND YEAR(goal_date) = %s
-    """, (email, month, year))
-    
+        WHERE email = %s AND goal_date >= %s AND goal_date < %s
+        ORDER BY goal_date, id
+    """, (email, month_start, next_month))
     goals = cur.fetchall()
     cur.close()
     
-    # Format dates for JSON
+    # Bucket goals by day in one pass
+    goals_by_day = defaultdict(list)
     for goal in goals:
-        if goal.get('goal_date'):
-            goal['goal_date'] = goal['goal_date'].strftime('%Y-%m-%d')
-    
-    # Generate calendar structure
-    cal = calendar.Calendar(firstweekday=0)
-    month_days = list(cal.itermonthdates(year, month))
-    today = date.today()
-    calendar_weeks = []
-    week_data = []
-    
-    # Organize days into weeks with goal data
-    for day in month_days:
-        if len(week_data) == 7:
-            calendar_weeks.append(week_data)
-            week_data = []
-        
-        day_str = day.strftime('%Y-%m-%d')
-        day_goals = [g for g in goals if g['goal_date'] == day_str]
-        
-        week_data.append({
-            'date': day.day,
-            'full_date': day_str,
-            'today': day == today,
-            'in_current_month': day.month == month,
-            'goals': day_goals
-        })
+        goal['goal_date'] = goal['goal_date'].isoformat()
+        goals_by_day[goal['goal_date']].append(goal)
     
-    if week_data:
-        calendar_weeks.append(week_data)
+    calendar_weeks = [
+        [{
+            'date': day_number,
+            'full_date': full_date,
+            'today': full_date == today,
+            'in_current_month': in_month,
+            'goals': goals_by_day.get(full_date, [])
+        } for day_number, full_date, in_month in week]
+        for week in month_skeleton(year, month)
+    ]
     
-    return jsonify({
+    body = json.dumps({
         "success": True,
         "calendar_weeks": calendar_weeks,
         "current_month": month,
         "current_year": year,
         "current_month_name": calendar.month_name[month]
     })
+    return body, hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+@app.route('/api/goals', methods=['GET'])
+@require_session
+def get_goals():
+    """Get goals and calendar data for a month"""
+    email = g.user['email']
+    month = request.args.get('month', datetime.today().month, type=int)
+    year = request.args.get('year', datetime.today().year, type=int)
+    
+    if not 1 <= month <= 12 or not 1 <= year <= 9998:
+        return jsonify({"success": False, "message": "Invalid month or year."})
+    
+    # Today's marker is part of the key so cached months roll over at midnight
+    today = date.today().isoformat()
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT goals_version FROM users WHERE email = %s", (email,))
+    row = cur.fetchone()
+    cur.close()
+    key = (email, row[0] if row else 0, year, month, today)
+    body, etag = calendar_cache.get_or_load(key, lambda: render_calendar(email, year, month, today))
+    
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @app.route('/api/goals/add', methods=['POST'])
+@require_session
 def add_goal():
     """Add a new goal"""
     data = request.json
-    email = data.get('email')
+    email = g.user['email']
     goal_text = data.get('goal_text')
     goal_date = data.get('goal_date')
     
-    if not email or not goal_text or not goal_date:
-        return jsonify({"success": False, "message": "Email, goal text, and date are required."})
+    if not goal_text or not goal_date:
+        return jsonify({"success": False, "message": "Goal text and date are required."})
     
     # Validate date (can't add goals for past dates)
     goal_date_obj = datetime.strptime(goal_date, '%Y-%m-%d').date()
@@ -428,13 +1185,16 @@ def add_goal():
     cur = mysql.connection.cursor()
     cur.execute("INSERT INTO goals (email, goal_text, goal_date, status) VALUES (%s, %s, %s, 'pending')", 
                 (email, goal_text, goal_date))
-    mysql.connection.commit()
     goal_id = cur.lastrowid
+    bump_goals_version(cur, email)
+    mysql.connection.commit()
     cur.close()
+    invalidate_calendar(email)
     
     return jsonify({"success": True, "message": "Goal added successfully.", "id": goal_id})
 
 @app.route('/api/goals/complete', methods=['POST'])
+@require_session
 def complete_goal():
     """Mark a goal as completed"""
     data = request.json
@@ -445,13 +1205,16 @@ def complete_goal():
     
     # Update goal status
     cur = mysql.connection.cursor()
-    cur.execute("UPDATE goals SET status = 'completed' WHERE id = %s", (goal_id,))
+    cur.execute("UPDATE goals SET status = 'completed' WHERE id = %s AND email = %s", (goal_id, g.user['email']))
+    bump_goals_version(cur, g.user['email'])
     mysql.connection.commit()
     cur.close()
+    invalidate_calendar(g.user['email'])
     
     return jsonify({"success": True, "message": "Goal marked as completed."})
 
 @app.route('/api/goals/delete', methods=['POST'])
+@require_session
 def delete_goal():
     """Delete a goal"""
     data = request.json
@@ -462,66 +1225,179 @@ def delete_goal():
     
     # Delete goal from database
     cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM goals WHERE id = %s", (goal_id,))
+    cur.execute("DELETE FROM goals WHERE id = %s AND email = %s", (goal_id, g.user['email']))
+    bump_goals_version(cur, g.user['email'])
     mysql.connection.commit()
     cur.close()
+    invalidate_calendar(g.user['email'])
     
     return jsonify({"success": True, "message": "Goal deleted successfully."})
 
-# ===== Reset Password-OTP =====
-
-def save_credentials(credentials):
-    """Save credentials to a file."""
-    with open(TOKEN_FILE, 'w') as token:
-        token.write(credentials.to_json())
-
-
-def load_credentials():
-    """Load credentials from a file."""
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'r') as token:
-            credentials_data = json.load(token)
-            credentials = Credentials.from_authorized_user_info(credentials_data)
-            if credentials and credentials.valid:
-                return credentials
-            elif credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-                save_credentials(credentials)
-                return credentials
-    return None
-
+def parse_goal_date(value):
+    """Parse a YYYY-MM-DD string from a batch operation"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError("Dates must be YYYY-MM-DD.")
+
+def expand_goal_dates(op, today):
+    """Dates a goal add covers: its goal_date, or each matching weekday of its recurrence"""
+    recurrence = op.get('recurrence')
+    if not recurrence:
+        goal_date = parse_goal_date(op.get('goal_date'))
+        if goal_date < today:
+            raise ValueError("You cannot add goals for past dates!")
+        return [goal_date]
+    
+    if not isinstance(recurrence, dict):
+        raise ValueError("Recurrence must be an object with start, end and weekdays.")
+    start = parse_goal_date(recurrence.get('start'))
+    end = parse_goal_date(recurrence.get('end'))
+    weekdays = recurrence.get('weekdays', list(range(7)))  # 0 = Monday ... 6 = Sunday
+    if (not isinstance(weekdays, list) or not weekdays
+            or not all(isinstance(day, int) and not isinstance(day, bool) and 0 <= day <= 6 for day in weekdays)):
+        raise ValueError("Recurrence weekdays must be a list of numbers from 0 (Monday) to 6 (Sunday).")
+    weekdays = set(weekdays)
+    if start < today:
+        raise ValueError("You cannot add goals for past dates!")
+    if end < start or (end - start).days > 366:
+        raise ValueError("Recurrence must end after it starts and span at most a year.")
+    
+    days = (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    return [day for day in days if day.weekday() in weekdays]
+
+@app.route('/api/goals/batch', methods=['POST'])
+@require_session
+def batch_goals():
+    """Apply many goal operations (add/complete/delete) in one transaction
+
+    An add may carry a recurrence {"start", "end", "weekdays"} instead of a
+    goal_date; it is expanded here into one goal per matching day.
+    """
+    email = g.user['email']
+    operations, error = parse_batch_request()
+    if error:
+        return error
+    
+    results = [None] * len(operations)
+    inserts = []  # (index, [rows])
+    completes, deletes = [], []
+    today = date.today()
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind == 'add':
+            if not op.get('goal_text'):
+                results[index] = batch_failure(index, "Goal text is required.")
+                continue
+            try:
+                dates = expand_goal_dates(op, today)
+            except (ValueError, TypeError) as e:
+                results[index] = batch_failure(index, str(e))
+                continue
+            inserts.append((index, [(email, op['goal_text'], day) for day in dates]))
+        elif kind in ('complete', 'delete'):
+            try:
+                goal_id = int(op.get('id'))
+            except (TypeError, ValueError):
+                results[index] = batch_failure(index, "Goal ID is required.")
+                continue
+            (completes if kind == 'complete' else deletes).append((index, goal_id, (goal_id,)))
+        else:
+            results[index] = batch_failure(index, f"Unknown operation '{kind}'.")
+    
+    rows = [row for _, group in inserts for row in group]
+    if len(rows) > BATCH_MAX_ROWS:
+        return jsonify({"success": False, "message": f"Batch expands to {len(rows)} goals (max {BATCH_MAX_ROWS})."})
+    
+    def apply(cur):
+        ids = iter(insert_rows(cur, "INSERT INTO goals (email, goal_text, goal_date, status) VALUES (%s, %s, %s, 'pending')",
+                               rows))
+        for index, group in inserts:
+            results[index] = {"index": index, "success": True, "ids": [next(ids) for _ in group]}
+        
+        found = lock_owned_ids(cur, 'goals', 'email', email,
+                               [goal_id for _, goal_id, _ in completes + deletes])
+        apply_by_id(cur, "UPDATE goals SET status = 'completed' WHERE id = %s",
+                    completes, found, results, "Goal not found.")
+        apply_by_id(cur, "DELETE FROM goals WHERE id = %s", deletes, found, results, "Goal not found.")
+        bump_goals_version(cur, email)
+    
+    return run_batch(apply, results, on_commit=lambda: invalidate_calendar(email))
 
-def gmail_service():
-    """Authenticate and return Gmail API service instance."""
-    credentials = load_credentials()
+# ===== Reset Password-OTP =====
 
-    if not credentials:
-        # If credentials are missing or expired, start the OAuth flow.
-        flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
-        credentials = flow.run_local_server(port=0)
-        save_credentials(credentials)
+EMAIL_TRANSPORT = os.getenv('EMAIL_TRANSPORT', 'gmail')  # gmail | smtp
+
+def build_email_transport():
+    """Gmail API by default; SMTP for other providers or a local test server"""
+    if EMAIL_TRANSPORT == 'smtp':
+        return SmtpTransport(
+            os.getenv('SMTP_HOST', 'localhost'),
+            port=int(os.getenv('SMTP_PORT', 25)),
+            username=os.getenv('SMTP_USER') or None,
+            password=os.getenv('SMTP_PASSWORD'),
+            starttls=os.getenv('SMTP_STARTTLS', 'false').lower() == 'true',
+            sender=os.getenv('EMAIL_SENDER', 'widviz@localhost')
+        )
+    return GmailTransport(CREDENTIALS_FILE, TOKEN_FILE, SCOPES)
 
-    service = build('gmail', 'v1', credentials=credentials)
-    return service
+# Emails are persisted here and delivered by a background worker with retries
+outbox = Outbox(
+    os.getenv('OUTBOX_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'widviz_outbox.sqlite3')),
+    build_email_transport(),
+    max_attempts=int(os.getenv('EMAIL_MAX_ATTEMPTS', 5)),
+    backoff=int(os.getenv('EMAIL_RETRY_SECONDS', 30)),
+    logger=app.logger.warning
+)
 
 
 def send_email(to_email, subject, content):
-    """Send an email using Gmail API."""
-    try:
-        service = gmail_service()
-        message = MIMEText(content)
-        message['to'] = to_email
-        message['subject'] = subject
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
-        body = {'raw': raw_message}
-        service.users().messages().send(userId="me", body=body).execute()
-        print(f"Email sent to {to_email}")
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    """Queue an email for background delivery and return its outbox id"""
+    outbox.start_worker()
+    return outbox.enqueue(to_email, subject, content)
 
 
 # ===== YouTube and Video Processing Endpoints =====
 
+# Popular queries repeat across users; each upstream search costs 100 quota units
+search_cache = TTLCache(
+    maxsize=int(os.getenv('SEARCH_CACHE_SIZE', 512)),
+    ttl=int(os.getenv('SEARCH_CACHE_TTL', 1800))
+)
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive cache key for a search query"""
+    return " ".join(query.lower().split())
+
+def search_youtube(query, max_results):
+    """Call the YouTube Data API and format the results"""
+    # YouTube Data API request
+    search_request = get_youtube().search().list(
+        q=query,
+        part="snippet",
+        maxResults=max_results,
+        type="video"
+    )
+    search_response = search_request.execute()
+    
+    # Format results
+    videos = []
+    for item in search_response['items']:
+        video_id = item.get('id', {}).get('videoId')
+        if not video_id:
+            app.logger.warning(f"Missing videoId in item: {item}")
+            continue  # skip this item
+
+        videos.append({
+            "video_id": video_id,
+            "title": item['snippet']['title'],
+            "description": item['snippet']['description'],
+            "channel_title": item['snippet']['channelTitle'],
+            "url": f"https://www.youtube.com/watch?v={video_id}",
+            "thumbnail": item['snippet']['thumbnails']['medium']['url']
+        })
+    return videos
+
 @app.route('/api/search_videos', methods=['POST'])
 def search_videos_api():
     """Search YouTube videos by query"""
@@ -529,42 +1405,27 @@ def search_videos_api():
     query = data.get('query')
     max_results = data.get('max_results', 10)
     
-    if not query:
+    if not query or not normalize_query(query):
         return jsonify({"success": False, "message": "Query is required."})
     
     try:
-        # YouTube Data API request
-        search_request = youtube.search().list(
-            q=query,
-            part="snippet",
-            maxResults=max_results,
-            type="video"
-        )
-        search_response = search_request.execute()
-        
-        # Format results
-        videos = []
-        for item in search_response['items']:
-            video_id = item.get('id', {}).get('videoId')
-            if not video_id:
-                app.logger.warning(f"Missing videoId in item: {item}")
-                continue  # skip this item
-
-            videos.append({
-                "video_id": video_id,
-                "title": item['snippet']['title'],
-                "description": item['snippet']['description'],
-                "channel_title": item['snippet']['channelTitle'],
-                "url": f"https://www.youtube.com/watch?v={video_id}",
-                "thumbnail": item['snippet']['thumbnails']['medium']['url']
-            })
-
+        # Identical concurrent queries share one upstream call
+        max_results = max(1, min(50, int(max_results)))
+        key = (normalize_query(query), max_results)
+        videos = search_cache.get_or_load(key, lambda: search_youtube(key[0], max_results))
         
         return jsonify({"success": True, "videos": videos})
     except Exception as e:
         app.logger.error(f"YouTube API error: {str(e)}")
         return jsonify({"success": False, "message": f"Error searching videos: {str(e)}"})
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats_api():
+    """Hit/miss counters for the in-memory caches"""
+    return jsonify({"success": True, "caches": {"search": search_cache.stats(),
+                                                "calendar": calendar_cache.stats(),
+                                                "video_info": video_info_cache.stats()}})
+
 def extract_video_id(url):
     """Extract YouTube video ID from various URL formats"""
     # Handle direct video ID
@@ -585,24 +1446,22 @@ def extract_video_id(url):
     
     return None
 
-def download_video(video_id):
-    """Download YouTube audio using yt-dlp"""
+@timed(stage_seconds, stage="download")
+def download_video(video_id, cancel_event=None, on_progress=None):
+    """Download YouTube audio as a WAV file using yt-dlp (AUDIO_INGEST_MODE=file)"""
+    # Unique directory per call so concurrent requests for one video never collide
+    work_dir = tempfile.mkdtemp(prefix=f"widviz_{video_id}_")
+    output_file = os.path.join(work_dir, "audio.wav")
     try:
-        output_file = f"temp_{video_id}.wav"
-        
-        # Verify yt-dlp installation
-        try:
-            subprocess.run(["yt-dlp", "--version"], check=True, 
-                          capture_output=True, text=True)
-        except (subprocess.SubprocessError, FileNotFoundError) as e:
-            current_app.logger.error(f"yt-dlp check failed: {str(e)}")
-            raise RuntimeError("yt-dlp not installed. Install with: pip install yt-dlp")
-
-        # Download audio as WAV
-        result = subprocess.run(
+        # Tool availability is checked once per process
+        tools = timed_import("audio_ingest").require_tools("yt-dlp")
+
+        # Download audio as WAV (progress is printed one line per update)
+        process = subprocess.Popen(
             [
-                "yt-dlp",
+                tools["yt-dlp"],
                 "--no-warnings",
+                "--newline",
                 "-x",  # Extract audio
                 "--audio-format", "wav",
                 "--audio-quality", "0",  # Best quality
@@ -610,14 +1469,42 @@ def download_video(video_id):
                 "--max-filesize", "100M",  # Size limit
                 f"https://www.youtube.com/watch?v={video_id}"
             ],
-            capture_output=True,
-            text=True,
-            timeout=300  # 5-minute timeout
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
         )
 
+        # Drain output in the background so we can poll for cancel/timeout
+        stderr_lines = []
+        def read_stdout():
+            for line in process.stdout:
+                match = re.search(r'\[download\]\s+([\d.]+)%', line)
+                if match and on_progress:
+                    on_progress(float(match.group(1)) / 100)
+        def read_stderr():
+            stderr_lines.extend(process.stderr)
+        readers = [threading.Thread(target=read_stdout, daemon=True),
+                   threading.Thread(target=read_stderr, daemon=True)]
+        for reader in readers:
+            reader.start()
+
+        deadline = time.monotonic() + 300  # 5-minute timeout
+        while process.poll() is None:
+            if cancel_event is not None and cancel_event.is_set():
+                process.kill()
+                process.wait()
+                raise JobCancelled()
+            if time.monotonic() > deadline:
+                process.kill()
+                process.wait()
+                raise subprocess.TimeoutExpired(process.args, 300)
+            time.sleep(0.2)
+        for reader in readers:
+            reader.join(timeout=5)
+
         # Handle download errors
-        if result.returncode != 0:
-            error_msg = f"Download failed: {result.stderr[:500]}"
+        if process.returncode != 0:
+            error_msg = f"Download failed: {''.join(stderr_lines)[:500]}"
             current_app.logger.error(error_msg)
             raise RuntimeError(error_msg)
             
@@ -626,19 +1513,63 @@ def download_video(video_id):
             
         return output_file
         
+    except JobCancelled:
+        cleanup_audio(output_file)
+        raise
     except subprocess.TimeoutExpired as e:
+        cleanup_audio(output_file)
         current_app.logger.error(f"Timeout: {str(e)}")
         raise RuntimeError("Download took too long (max 5 minutes)")
     except Exception as e:
+        cleanup_audio(output_file)
         current_app.logger.error(f"Download error: {str(e)}")
         raise RuntimeError(f"Download failed: {str(e)}")
 
-def transcribe_with_whisper(file_path):
-    """Transcribe audio using OpenAI's Whisper"""
+def fetch_audio(video_id, cancel_event=None, on_progress=None):
+    """Return audio for Whisper: a 16 kHz PCM array, or a WAV path in file mode"""
+    if AUDIO_INGEST_MODE == "file":
+        path = download_video(video_id, cancel_event, on_progress)
+        audio_bytes.inc(os.path.getsize(path), mode="file")
+        return path
+
+    ingest = timed_import("audio_ingest")
     try:
-        model = whisper.load_model("base", device="cuda")  # Base model (faster)
-        result = model.transcribe(file_path)
-        return result["text"]
+        with stage_seconds.time(stage="download"):
+            audio = ingest.stream_audio(
+                video_id,
+                cancel_event=cancel_event,
+                on_progress=on_progress,
+                max_seconds=MAX_AUDIO_MINUTES * 60,
+                spool_dir=AUDIO_SPOOL_DIR if AUDIO_INGEST_MODE == "spool" else None
+            )
+        audio_bytes.inc(audio.nbytes, mode=AUDIO_INGEST_MODE)
+        return audio
+    except ingest.IngestCancelled:
+        raise JobCancelled()
+    except Exception as e:
+        current_app.logger.error(f"Download error: {str(e)}")
+        raise
+
+def cleanup_audio(audio):
+    """Remove the temp directory behind a downloaded WAV file"""
+    if isinstance(audio, str):
+        shutil.rmtree(os.path.dirname(audio), ignore_errors=True)
+
+
+@timed(stage_seconds, stage="transcribe")
+def transcribe_with_whisper(audio, on_segment=None, cancel_event=None, model=WHISPER_MODEL):
+    """Transcribe audio (file path or 16 kHz float32 array); returns {"text", "segments"}"""
+    transcription = timed_import("transcription")
+    try:
+        if isinstance(audio, str):
+            audio = timed_import("audio_ingest").decode_file(audio)  # Decode the WAV file to 16 kHz PCM
+
+        # Segments are transcribed in parallel and reported as they finish
+        result = get_transcriber(model).transcribe(audio, on_segment=on_segment, cancel_event=cancel_event)
+        audio_seconds.inc(len(audio) / transcription.SAMPLE_RATE, backend=stt_backend.name)
+        return result
+    except transcription.TranscriptionCancelled:
+        raise JobCancelled()
     except Exception as e:
         current_app.logger.error(f"Whisper error: {str(e)}")
         import traceback 
@@ -646,11 +1577,12 @@ def transcribe_with_whisper(file_path):
         raise RuntimeError(f"Transcription failed: {repr(e)}")
 
 
+@timed(stage_seconds, stage="captions")
 def get_transcript_from_youtube(video_id):
-    """Get captions directly from YouTube if available"""
+    """Get captions directly from YouTube if available; returns (transcript, timed segments) or None"""
     try:
         # Get available captions
-        captions_response = youtube.captions().list(
+        captions_response = get_youtube().captions().list(
             part="snippet",
             videoId=video_id
         ).execute()
@@ -662,235 +1594,688 @@ def get_transcript_from_youtube(video_id):
         caption_id = captions_response['items'][0]['id']
         
         # Download captions in SRT format
-        caption = youtube.captions().download(
+        caption = get_youtube().captions().download(
             id=caption_id,
             tfmt="srt"
         ).execute()
         
-        # Extract text from SRT format
-        import re
-        text_only = re.sub(r'\d+\n\d{2}:\d{2}:\d{2},\d{3} --> \d{2}:\d{2}:\d{2},\d{3}\n', '', caption)
-        text_only = re.sub(r'^\d+$', '', text_only, flags=re.MULTILINE)
-        transcript = ' '.join(text_only.split('\n')).strip()
+        # Keep the cue timings; the transcript is the cue text joined
+        segments = timed_import("segment_store").parse_srt(caption)
+        transcript = ' '.join(segment['text'] for segment in segments)
         
-        return transcript
+        return (transcript, segments) if transcript else None
     except Exception as e:
         app.logger.error(f"Error getting transcript from YouTube: {str(e)}")
         return None
 
-def summarize_with_ollama(text, model="mistral"):
-    """Generate summary using Ollama's Mistral model"""
-    try:
-        # Verify Ollama is running
-        try:
-            response = requests.get(OLLAMA_URL + "/api/tags", timeout=5)
-            if response.status_code != 200:
-                return "Error: Ollama server is not running"
-        except requests.exceptions.RequestException:
-            return "Error: Could not connect to Ollama"
-
-        # Prepare prompt with text truncation
-        prompt = f"""
+def build_summary_prompt(text):
+    """Prompt for summarizing a transcript (bump SUMMARY_PROMPT_VERSION on change)"""
+    return f"""
         You are an expert video summarizer. Summarize concisely:
-        {text[:9000]}  
+        {text}
         """
-            #text input limit
+
+def build_chunk_prompt(text):
+    """Prompt for summarizing one window of a long transcript"""
+    return f"""
+        You are an expert video summarizer. This is one part of a longer video transcript.
+        Summarize it concisely, keeping every key fact, name and number:
+        {text}
+        """
+
+def build_reduce_prompt(text):
+    """Prompt for merging partial summaries of consecutive transcript parts"""
+    return f"""
+        You are an expert video summarizer. These are summaries of consecutive parts of one video.
+        Merge them into a single concise summary without losing key facts:
+        {text}
+        """
+
+def format_summary_html(summary):
+    """Format raw model output for HTML display"""
+    summary = summary.replace("\n", "<br>")  # Line breaks
+    summary = summary.replace("- ", "• ")    # Bullet points
+    return summary
+
+# Long transcripts are summarized window by window instead of being truncated
+summary_chunker = MapReduceSummarizer(
+    ollama.generate,
+    map_prompt=build_chunk_prompt,
+    reduce_prompt=build_reduce_prompt,
+    max_tokens=SUMMARY_CHUNK_TOKENS,
+    overlap_tokens=SUMMARY_CHUNK_OVERLAP,
+    parallelism=OLLAMA_PARALLELISM,
+    cache=result_cache,
+    prompt_version=SUMMARY_PROMPT_VERSION
+)
+
+@timed(stage_seconds, stage="summarize")
+def summarize_with_ollama(text, model=OLLAMA_MODEL, on_token=None, on_progress=None):
+    """Generate summary using Ollama's Mistral model"""
+    try:
+        # Fail fast if Ollama is known to be down (health is cached)
+        error = ollama.unavailable_reason()
+        if error:
+            return f"Error: {error}"
+
+        # Condense long transcripts with map-reduce so the whole video is covered
+        prompt = build_summary_prompt(summary_chunker.condense(text, model, on_progress=on_progress))
+
+        # Stream tokens to the caller while the summary is produced
+        if on_token:
+            parts = []
+            for token in ollama.stream(prompt, model):
+                parts.append(token)
+                on_token(token)
+            return format_summary_html("".join(parts).strip())
+
         # Request summary from Ollama
-        response = requests.post(
-            OLLAMA_URL + "/api/generate",
-            json={"model": model, "prompt": prompt, "stream": False},
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            summary = result.get("response", "").strip()
-            
-            # Format for HTML display
-            summary = summary.replace("\n", "<br>")  # Line breaks
-            summary = summary.replace("- ", "• ")    # Bullet points
-            return summary
-            
-        return "Error: Failed to generate summary"
+        summary = ollama.generate(prompt, model).strip()
+        return format_summary_html(summary)
 
     except Exception as e:
         return f"Error: {str(e)}"
-    
-@app.route('/api/summarize_video', methods=['POST'])
-def summarize_video_api():
-    """Generate summary and transcript for a YouTube video"""
-    data = request.json
+
+def sse_event(event, data):
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Stream an SSE generator without proxy buffering"""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def lookup_cached_transcript(video_id):
+    """Return (transcript, source) for a previously processed video, or None"""
+    # Transcripts from any speech-to-text backend are interchangeable
+    candidates = [("youtube", "captions")] + [(name, model) for model in TRANSCRIPT_MODELS for name in BACKENDS]
+    for source, model in candidates:
+        transcript = result_cache.get_transcript(video_id, source, model)
+        if transcript:
+            result_cache_lookups.inc(table="transcripts", outcome="hit")
+            return transcript, f"{source}:{model}"
+    result_cache_lookups.inc(table="transcripts", outcome="miss")
+    return None
+
+def get_video_summary(video_id, transcript, source, on_token=None, on_progress=None):
+    """Return a cached summary or generate and cache a new one"""
+    summary = result_cache.get_summary(video_id, source, OLLAMA_MODEL, SUMMARY_PROMPT_VERSION)
+    result_cache_lookups.inc(table="summaries", outcome="hit" if summary else "miss")
+    if summary:
+        return summary
+
+    summary = summarize_with_ollama(transcript, model=OLLAMA_MODEL, on_token=on_token,
+                                    on_progress=on_progress)
+    if not summary.startswith("Error"):  # Never cache failures
+        result_cache.put_summary(video_id, source, OLLAMA_MODEL, SUMMARY_PROMPT_VERSION, summary)
+    return summary
+
+# ===== Admission Control =====
+# Videos that need Whisper are checked against their metadata before any audio is downloaded
+video_info_cache = TTLCache(maxsize=int(os.getenv('VIDEO_INFO_CACHE_SIZE', 2048)), ttl=VIDEO_INFO_TTL)
+admission_policy = AdmissionPolicy(
+    max_minutes=MAX_AUDIO_MINUTES,
+    low_priority_minutes=ADMISSION_LOW_PRIORITY_MINUTES,
+    small_model_minutes=ADMISSION_SMALL_MODEL_MINUTES,
+    small_model=WHISPER_SMALL_MODEL
+)
+admission_outcomes = registry.counter(
+    "widviz_admission_total", "Videos needing transcription by admission outcome", ("outcome",))
+
+@timed(stage_seconds, stage="metadata")
+def fetch_video_info(video_id):
+    """Duration, caption flag and live status from the YouTube Data API (None if the video is not found)"""
+    response = get_youtube().videos().list(part="snippet,contentDetails", id=video_id).execute()
+    items = response.get('items')
+    return video_info(items[0]) if items else None
+
+def get_video_info(video_id):
+    """Cached video metadata, or None when it is unavailable"""
+    try:
+        # Concurrent jobs for one video share a single API call
+        return video_info_cache.get_or_load(video_id, lambda: fetch_video_info(video_id))
+    except Exception as e:
+        app.logger.error(f"Error getting metadata for video {video_id}: {str(e)}")
+        return None
+
+def admit_video(info):
+    """Apply the admission budgets; returns the policy decision or raises AdmissionRejected"""
+    try:
+        decision = admission_policy.decide(info)
+    except AdmissionRejected:
+        admission_outcomes.inc(outcome="rejected")
+        raise
+    if info is None or decision["reason"] == "no metadata":
+        outcome = "no_metadata"
+    elif decision["model"]:
+        outcome = "small_model"
+    elif decision["low_priority"]:
+        outcome = "low_priority"
+    else:
+        outcome = "admitted"
+    admission_outcomes.inc(outcome=outcome)
+    return decision
+
+def find_duplicate_audio(audio):
+    """Fingerprint downloaded audio and find an earlier video with the same audio and a cached transcript
+
+    Returns (fingerprint, match); match is (video_id, source, model, transcript) or None.
+    """
+    ingest = timed_import("audio_ingest")
+    with stage_seconds.time(stage="fingerprint"):
+        fingerprint = ingest.fingerprint(audio)
+        if not len(fingerprint):
+            return fingerprint, None
+
+        best = None
+        for other_id, source, model, data in result_cache.find_fingerprints(len(audio) / ingest.SAMPLE_RATE):
+            if model not in TRANSCRIPT_MODELS:
+                continue
+            distance = ingest.fingerprint_distance(fingerprint, data)
+            if distance <= FINGERPRINT_MATCH_THRESHOLD and (best is None or distance < best[0]):
+                best = (distance, other_id, source, model)
+
+    if best:
+        _, other_id, source, model = best
+        transcript = result_cache.get_transcript(other_id, source, model)
+        if transcript:
+            admission_outcomes.inc(outcome="duplicate_audio")
+            return fingerprint, (other_id, source, model, transcript)
+    return fingerprint, None
+
+# ===== Timed Transcripts =====
+# Segment times (and word times with WHISPER_WORD_TIMESTAMPS) are kept per video and transcript source
+TRANSCRIPT_PAGE_SIZE = 200   # Default segments per /api/transcripts page
+TRANSCRIPT_PAGE_MAX = 1000
+
+@lru_cache(maxsize=1)
+def get_segment_store():
+    """Segment files, opened on first use (imports numpy)"""
+    return timed_import("segment_store").SegmentStore(
+        os.getenv('SEGMENTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'widviz_segments')),
+        max_files=int(os.getenv('SEGMENTS_MAX_FILES', 5000))
+    )
+
+def save_segments(video_id, source, segments):
+    """Store a transcript's timed segments (storage problems never fail the pipeline)"""
+    try:
+        get_segment_store().save(video_id, source, segments)
+    except Exception as e:
+        app.logger.error(f"Saving segments failed for video {video_id}: {str(e)}")
+
+def copy_segments(from_video, source, to_video):
+    """Store another video's timed segments for a video with the same audio"""
+    try:
+        segment_file = get_segment_store().open(from_video, source)
+        if segment_file:
+            get_segment_store().save(to_video, source, segment_file.slice(words=True)[0])
+    except Exception as e:
+        app.logger.error(f"Copying segments failed for video {to_video}: {str(e)}")
+
+def open_segments(video_id):
+    """Segment file of the preferred transcript source for a video, or None"""
+    for source in ["youtube:captions"] + [f"{name}:{model}" for model in TRANSCRIPT_MODELS for name in BACKENDS]:
+        segment_file = get_segment_store().open(video_id, source)
+        if segment_file:
+            return segment_file
+    return None
+
+@app.route('/api/transcripts/<video_id>', methods=['GET'])
+def get_transcript_segments(video_id):
+    """Timed transcript segments between ?start= and ?end= seconds, a page at a time (?words=1 adds word times)
+
+    Later pages are requested with ?index= set to the previous page's next_index (and the same end).
+    """
+    video_id = extract_video_id(video_id)
+    if not video_id:
+        return jsonify({"success": False, "message": "Invalid YouTube video ID or URL."})
+    try:
+        start, end = (float(request.args[name]) if request.args.get(name) else None for name in ('start', 'end'))
+        limit = max(1, min(int(request.args.get('limit', TRANSCRIPT_PAGE_SIZE)), TRANSCRIPT_PAGE_MAX))
+        index = int(request.args['index']) if request.args.get('index') else None
+    except ValueError:
+        return jsonify({"success": False, "message": "start, end, limit and index must be numbers."})
+
+    segment_file = open_segments(video_id)
+    if not segment_file:
+        return jsonify({"success": False, "message": "No timed transcript for this video."}), 404
+
+    # Only the requested range of the text is read from disk
+    segments, next_index = segment_file.slice(start, end, limit, words=request.args.get('words') == '1', index=index)
+    return jsonify({
+        "success": True,
+        "video_id": video_id,
+        "source": segment_file.source,
+        "duration": segment_file.duration,
+        "total_segments": len(segment_file),
+        "segments": segments,
+        "next_index": next_index
+    })
+
+def run_summary_pipeline(job, video_id):
+    """Job runner: captions -> admission -> download -> transcribe -> summarize"""
+    # Reuse any transcript we already produced, else try official captions
+    info = None
+    with job.stage("captions") as stage:
+        cached = lookup_cached_transcript(video_id)
+        if cached:
+            transcript, source = cached
+            stage["detail"] = "cached"
+        else:
+            transcript, source = None, "youtube:captions"
+            info = get_video_info(video_id)
+            captions = get_transcript_from_youtube(video_id) if info is None or info["captions"] else None
+            if captions:
+                transcript, segments = captions
+                result_cache.put_transcript(video_id, "youtube", "captions", transcript)
+                save_segments(video_id, source, segments)
+            elif info and not info["captions"]:
+                stage["detail"] = "no captions"
+
+    if transcript:
+        job.skip_stage("admission", "captions available")
+        job.skip_stage("download", "captions available")
+        job.skip_stage("transcribe", "captions available")
+    else:
+        # Fallback to Whisper transcription if no captions, within the length and priority budgets
+        with job.stage("admission") as stage:
+            decision = admit_video(info)
+            model = decision["model"] or WHISPER_MODEL
+            if decision["low_priority"]:
+                job.priority = LOW_PRIORITY
+            stage["detail"] = f"{decision['reason']}, {model}" + (", low priority" if decision["low_priority"] else "")
+
+        current_app.logger.info(f"No YouTube transcript for {video_id}, using Whisper ({model})...")
+        with job.stage("download"):
+            audio = fetch_audio(
+                video_id,
+                cancel_event=job.cancel_event,
+                on_progress=lambda fraction: job.set_progress("download", fraction)
+            )
+            # Re-uploads of audio we already transcribed reuse that transcript (streamed audio only)
+            fingerprint, duplicate = None, None
+            if FINGERPRINT_DEDUPE and not isinstance(audio, str):
+                fingerprint, duplicate = find_duplicate_audio(audio)
+
+        if duplicate:
+            other_id, backend_name, model, transcript = duplicate
+            job.skip_stage("transcribe", f"same audio as {other_id}")
+            source = f"{backend_name}:{model}"
+            result_cache.put_transcript(video_id, backend_name, model, transcript)
+            copy_segments(other_id, source, video_id)
+        else:
+            # Publish the finished prefix of the transcript while later segments are running
+            finished = timed_import("transcription").OrderedSegments()
+            done = [0]
+            def on_segment(index, total, piece):
+                done[0] += 1
+                job.set_progress("transcribe", done[0] / total, f"segment {done[0]}/{total}")
+                if finished.add(index, piece):
+                    text = finished.prefix_text()
+                    job.set_partial("transcript", text)
+                    job.set_partial("segments", finished.prefix_segments())
+                    # Start summarizing completed windows before transcription ends
+                    if ollama.unavailable_reason() is None:
+                        summary_chunker.prefetch(text, OLLAMA_MODEL)
+
+            try:
+                with job.stage("transcribe"):
+                    result = transcribe_with_whisper(audio, on_segment=on_segment,
+                                                     cancel_event=job.cancel_event, model=model)
+                    transcript = result["text"]
+            finally:
+                # Clean up audio file (streamed audio only lives in memory)
+                cleanup_audio(audio)
+
+            source = f"{stt_backend.name}:{model}"
+            result_cache.put_transcript(video_id, stt_backend.name, model, transcript)
+            save_segments(video_id, source, result["segments"])
+            if fingerprint is not None and len(fingerprint):
+                seconds = len(audio) / timed_import("audio_ingest").SAMPLE_RATE
+                result_cache.put_fingerprint(video_id, seconds, stt_backend.name, model, fingerprint.tobytes())
+
+    if transcript:
+        index_transcript(video_id, transcript)  # Unchanged transcripts are skipped by digest
+
+    # Generate summary using Ollama (cached per transcript source and prompt)
+    # Partial summary text is exposed through the job status while streaming
+    with job.stage("summarize"):
+        summary = get_video_summary(
+            video_id, transcript, source,
+            on_token=lambda token: job.append_partial("summary", token),
+            on_progress=lambda kind, done, total: job.set_progress(
+                "summarize", 0.9 * done / total, f"{kind} {done}/{total}")
+        )
+
+    return {"video_id": video_id, "transcript": transcript, "summary": summary, "source": source}
+
+# ===== Summarization Job Queue =====
+summary_jobs = JobManager(
+    run_summary_pipeline,
+    stage_names=["captions", "admission", "download", "transcribe", "summarize"],
+    max_workers=int(os.getenv('JOB_WORKERS', 4)),
+    stage_limits={
+        "download": int(os.getenv('JOB_DOWNLOAD_CONCURRENCY', 2)),
+        "transcribe": int(os.getenv('JOB_TRANSCRIBE_CONCURRENCY', 1)),
+        "summarize": int(os.getenv('JOB_SUMMARIZE_CONCURRENCY', 2)),
+    },
+    context_factory=app.app_context,
+    stage_observer=lambda stage, seconds, outcome: job_stage_seconds.observe(seconds, stage=stage, outcome=outcome),
+    trace_id=current_trace_id
+)
+
+def parse_video_request():
+    """Return (video_id, error_response) for summarize requests"""
+    data = request.json or {}
     video_id = data.get('video_id')
-    
+
     if not video_id:
-        return jsonify({"success": False, "message": "Video ID is required."})
-    
+        return None, jsonify({"success": False, "message": "Video ID is required."})
+
     # Extract video ID from URL if needed
     extracted_id = extract_video_id(video_id)
     if not extracted_id:
-        return jsonify({"success": False, "message": "Invalid YouTube video ID or URL."})
-    video_id = extracted_id
+        return None, jsonify({"success": False, "message": "Invalid YouTube video ID or URL."})
+    return extracted_id, None
+
+@app.route('/api/summarize_video', methods=['POST'])
+def summarize_video_api():
+    """Generate summary and transcript for a YouTube video (blocks until done)"""
+    video_id, error = parse_video_request()
+    if error:
+        return error
     
-    try:
-        # First try to get official captions
-        transcript = get_transcript_from_youtube(video_id)
-        
-        # Fallback to Whisper transcription if no captions
-        if not transcript:
-            current_app.logger.info(f"No YouTube transcript for {video_id}, using Whisper...")
-            audio_path = download_video(video_id)
-            
-            try:
-                transcript = transcribe_with_whisper(audio_path)
-            finally:
-                # Clean up audio file
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
-        
-        # Generate summary using Ollama
-        summary = summarize_with_ollama(transcript)
-        
+    # Share the queued job with any other request for the same video
+    job, _ = summary_jobs.submit(video_id, video_id=video_id)
+    job.wait()
+
+    if job.status == COMPLETED:
         return jsonify({
             "success": True,
-            "transcript": transcript,
-            "summary": summary
+            "transcript": job.result["transcript"],
+            "summary": job.result["summary"]
         })
-    except Exception as e:
-        current_app.logger.error(f"Summarization error: {str(e)}")
-        return jsonify({"success": False, "message": f"Error: {str(e)}"})
 
-@app.route('/api/generate_quiz', methods=['POST'])
-def generate_quiz_api():
-    """Generate quiz questions from video transcript"""
-    data = request.json
+    current_app.logger.error(f"Summarization error: {job.error}")
+    return jsonify({"success": False, "message": f"Error: {job.error or job.status}"})
+
+@app.route('/api/summarize_video/jobs', methods=['POST'])
+def start_summary_job():
+    """Queue a summarization job and return its ID immediately"""
+    video_id, error = parse_video_request()
+    if error:
+        return error
+
+    job, created = summary_jobs.submit(video_id, video_id=video_id)
+    return jsonify({"success": True, "job_id": job.id, "created": created, "job": job.to_dict()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Report per-stage progress, and the result once completed"""
+    job = summary_jobs.get(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "Job not found."}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a job (it keeps running while other clients still wait on it)"""
+    job = summary_jobs.cancel(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "Job not found."}), 404
+    return jsonify({"success": True, "job": job.to_dict(include_result=False)})
+
+@app.route('/api/summarize_video/stream', methods=['POST'])
+def summarize_stream_api():
+    """Stream a summary of a transcript as Server-Sent Events"""
+    data = request.json or {}
+    transcript = data.get('transcript')
+    video_id = data.get('video_id')
+
+    # Resolve the transcript from the cache when only a video is given
+    source = None
+    if not transcript and video_id:
+        video_id = extract_video_id(video_id)
+        cached = lookup_cached_transcript(video_id) if video_id else None
+        if not cached:
+            return jsonify({"success": False, "message": "No transcript available yet. Start a summarization job first."})
+        transcript, source = cached
+
+    if not transcript:
+        return jsonify({"success": False, "message": "Transcript or video ID is required."})
+
+    def events():
+        # Serve a cached summary in one go
+        if source:
+            summary = result_cache.get_summary(video_id, source, OLLAMA_MODEL, SUMMARY_PROMPT_VERSION)
+            if summary:
+                yield sse_event("done", {"summary": summary, "cached": True})
+                return
+
+        error = ollama.unavailable_reason()
+        if error:
+            yield sse_event("error", {"message": error})
+            return
+
+        parts = []
+        try:
+            condensed = summary_chunker.condense(transcript, OLLAMA_MODEL)
+            for token in ollama.stream(build_summary_prompt(condensed), OLLAMA_MODEL):
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+        except Exception as e:
+            app.logger.error(f"Summary stream error: {str(e)}")
+            yield sse_event("error", {"message": str(e)})
+            return
+
+        summary = format_summary_html("".join(parts).strip())
+        if source:
+            result_cache.put_summary(video_id, source, OLLAMA_MODEL, SUMMARY_PROMPT_VERSION, summary)
+        yield sse_event("done", {"summary": summary, "cached": False})
+
+    return sse_response(events())
+
+# ===== Quiz Endpoints =====
+QUIZ_PROMPT_VERSION = "2"  # Bump when the quiz prompt or schema changes to invalidate cached quizzes
+QUIZ_DEFAULT_QUESTIONS = 5
+QUIZ_MAX_QUESTIONS = 20
+
+# JSON-constrained generation; rejected questions are re-requested on their own
+quiz_generator = QuizGenerator(ollama.stream, max_attempts=int(os.getenv('QUIZ_MAX_ATTEMPTS', 3)))
+
+def parse_quiz_request():
+    """Return (transcript, count, difficulty, error_response) for quiz requests"""
+    data = request.json or {}
     transcript = data.get('transcript')  # Transcript from summarization endpoint
-    
     if not transcript:
-        return jsonify({"success": False, "message": "Transcript is required."})
+        return None, None, None, jsonify({"success": False, "message": "Transcript is required."})
+
+    try:
+        count = int(data.get('count', QUIZ_DEFAULT_QUESTIONS))
+    except (TypeError, ValueError):
+        count = 0
+    if not 1 <= count <= QUIZ_MAX_QUESTIONS:
+        return None, None, None, jsonify({"success": False, "message": f"Question count must be 1-{QUIZ_MAX_QUESTIONS}."})
+
+    difficulty = data.get('difficulty', 'medium')
+    if difficulty not in DIFFICULTIES:
+        return None, None, None, jsonify({"success": False, "message": f"Difficulty must be one of: {', '.join(DIFFICULTIES)}."})
+    return transcript, count, difficulty, None
+
+def lookup_cached_quiz(digest, count, difficulty):
+    """Return a finished quiz for this transcript, count and difficulty, or None"""
+    questions = result_cache.get_quiz(digest, OLLAMA_MODEL, count, difficulty, QUIZ_PROMPT_VERSION)
+    result_cache_lookups.inc(table="quizzes", outcome="hit" if questions else "miss")
+    return questions
+
+def quiz_context(transcript, digest):
+    """Transcript condensed to the quiz prompt budget, computed once for every count and difficulty"""
+    if estimate_tokens(transcript) <= QUIZ_CONTEXT_TOKENS:
+        return transcript
+    context = result_cache.get_quiz_context(digest, OLLAMA_MODEL, QUIZ_CONTEXT_TOKENS, SUMMARY_PROMPT_VERSION)
+    if context is None:
+        context = summary_chunker.condense(transcript, OLLAMA_MODEL, QUIZ_CONTEXT_TOKENS)
+        result_cache.put_quiz_context(digest, OLLAMA_MODEL, QUIZ_CONTEXT_TOKENS, SUMMARY_PROMPT_VERSION, context)
+    return context
+
+def store_quiz(digest, count, difficulty, questions):
+    """Cache a quiz once it is complete (partial quizzes are regenerated next time)"""
+    if len(questions) == count:
+        result_cache.put_quiz(digest, OLLAMA_MODEL, count, difficulty, QUIZ_PROMPT_VERSION, questions)
+
+@app.route('/api/generate_quiz', methods=['POST'])
+def generate_quiz_api():
+    """Generate quiz questions from video transcript (optional count and difficulty in the body)"""
+    transcript, count, difficulty, error = parse_quiz_request()
+    if error:
+        return error
+
+    digest = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    cached = lookup_cached_quiz(digest, count, difficulty)
+    if cached:
+        return jsonify({"success": True, "quiz": cached, "cached": True})
     
     try:
-        # Prepare prompt for quiz generation
-        prompt = f"""Based on the following transcript, generate 5 multiple-choice quiz questions:
+        # Fail fast if Ollama is known to be down (health is cached)
+        error = ollama.unavailable_reason()
+        if error:
+            return jsonify({"success": False, "message": f"{error}. Please make sure Ollama is running."})
+
+        # Long transcripts are condensed, not cut off
+        content = quiz_context(transcript, digest)
         
-Format:  
-1. [Question 1]?
-    a) [Option A]
-    b) [Option B]
-    c) [Option C]
-    d) [Option D]
-Answer: [Correct Option]
-
-Transcript content:
-{transcript[:7000]}  # Use first 2000 characters"""
-
-        # Verify Ollama is running
-        try:
-            response = requests.get(OLLAMA_URL + "/api/tags", timeout=5)
-            if response.status_code != 200:
-                return jsonify({"success": False, "message": "Ollama server is not running. Please start Ollama."})
-        except requests.exceptions.RequestException:
-            return jsonify({"success": False, "message": "Could not connect to Ollama. Please make sure it's running."})
+        # Request validated questions from Ollama
+        with stage_seconds.time(stage="quiz_generate"):
+            questions = quiz_generator.generate(content, OLLAMA_MODEL, count, difficulty)
+        store_quiz(digest, count, difficulty, questions)
         
-        # Request quiz from Ollama
-        response = requests.post(
-            OLLAMA_URL + "/api/generate",
-            json={
-                "model": "mistral",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            quiz_text = response.json().get("response", "Quiz generation failed.")
-            
-            # Parse generated quiz text
-            questions = []
-            current_question = None
-            
-            for line in quiz_text.split("\n"):
-                line = line.strip()
-                
-                # Question detection
-                if line and line[0].isdigit() and "." in line:
-                    if current_question:
-                        questions.append(current_question)
-                    
-                    question_text = line.split(".", 1)[1].strip()
-                    if not question_text.endswith("?"):
-                        question_text += "?"
-                    current_question = {"question": question_text, "options": [], "answer": ""}
-                
-                # Option detection
-                elif line.startswith(("a)", "b)", "c)", "d)")):
-                    if current_question:
-                        current_question["options"].append(line)
-                
-                # Answer detection
-                elif "Answer:" in line:
-                    if current_question:
-                        current_question["answer"] = line.split("Answer:")[-1].strip()
-            
-            # Add final question
-            if current_question:
-                questions.append(current_question)
-            
-            return jsonify({"success": True, "quiz": questions})
-        else:
-            return jsonify({"success": False, "message": f"Error from Ollama API: {response.text}"})
-    except requests.exceptions.Timeout:
+        return jsonify({"success": True, "quiz": questions, "cached": False})
+    except OllamaTimeout:
         return jsonify({"success": False, "message": "Ollama request timed out. Try with a shorter transcript."})
     except Exception as e:
         app.logger.error(f"Error in generate_quiz_api: {str(e)}")
         app.logger.error(traceback.format_exc())
         return jsonify({"success": False, "message": f"Error generating quiz: {str(e)}"})
 
-# ===== Database Initialization & Server Startup =====
-if __name__ == "__main__":
-    # Create database tables if they don't exist
-    with app.app_context():
+@app.route('/api/generate_quiz/stream', methods=['POST'])
+def generate_quiz_stream_api():
+    """Stream quiz questions as Server-Sent Events, one per validated question"""
+    transcript, count, difficulty, error = parse_quiz_request()
+    if error:
+        return error
+
+    def events():
+        digest = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+        cached = lookup_cached_quiz(digest, count, difficulty)
+        if cached:
+            for index, question in enumerate(cached):
+                yield sse_event("question", {"index": index, "question": question})
+            yield sse_event("done", {"count": len(cached), "cached": True})
+            return
+
+        error = ollama.unavailable_reason()
+        if error:
+            yield sse_event("error", {"message": f"{error}. Please make sure Ollama is running."})
+            return
+
+        questions = []
+        try:
+            content = quiz_context(transcript, digest)
+            with stage_seconds.time(stage="quiz_stream"):
+                # Each question is sent as soon as its JSON object is complete and valid
+                for question in quiz_generator.iter_questions(content, OLLAMA_MODEL, count, difficulty):
+                    yield sse_event("question", {"index": len(questions), "question": question})
+                    questions.append(question)
+        except Exception as e:
+            app.logger.error(f"Quiz stream error: {str(e)}")
+            yield sse_event("error", {"message": f"Error generating quiz: {str(e)}"})
+            return
+
+        store_quiz(digest, count, difficulty, questions)
+        yield sse_event("done", {"count": len(questions), "cached": False})
+
+    return sse_response(events())
+
+# ===== Health =====
+
+# Stats kept by existing components, read when /metrics is scraped
+registry.callback("widviz_cache_events_total", "In-memory cache hits, misses and evictions",
+                  lambda: {(name, event): stats[event]
+                           for name, stats in (("search", search_cache.stats()), ("calendar", calendar_cache.stats()),
+                                               ("video_info", video_info_cache.stats()),
+                                               ("sessions", sessions.stats()))
+                           for event in ("hits", "misses", "evictions")},
+                  type="counter", labelnames=("cache", "event"))
+registry.callback("widviz_ollama_events_total", "Ollama calls, retries, failures and circuit-breaker rejections",
+                  ollama.stats, type="counter", labelnames=("event",))
+registry.callback("widviz_quiz_events_total", "Quiz prompts, follow-up retries and accepted/rejected questions",
+                  quiz_generator.stats, type="counter", labelnames=("event",))
+registry.callback("widviz_db_pool", "MySQL pool state and counters", mysql.pool.stats, labelnames=("stat",))
+registry.callback("widviz_outbox_messages", "Queued email by status", outbox.stats, labelnames=("status",))
+registry.callback("widviz_whisper_models_loaded", "Whisper models in memory", lambda: len(whisper_models.loaded()))
+
+# Modules loaded on first use; the health report shows which ones a process has paid for
+LAZY_MODULES = ["torch", "whisper", "faster_whisper", "numpy", "googleapiclient.discovery",
+                "google_auth_oauthlib.flow", "reportlab.pdfgen.canvas"]
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Readiness probe: ready once the database answers; optional services are reported, not required"""
+    try:
         cur = mysql.connection.cursor()
-        
-        # Users table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(100) NOT NULL,
-                email VARCHAR(100) NOT NULL UNIQUE,
-                password VARCHAR(100) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Notes table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS notes (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_email VARCHAR(100) NOT NULL,
-                title VARCHAR(255) NOT NULL,
-                content TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_email) REFERENCES users(email)
-            )
-        ''')
-        
-        # Goals table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS goals (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(100) NOT NULL,
-                goal_text TEXT NOT NULL,
-                goal_date DATE NOT NULL,
-                status VARCHAR(20) DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (email) REFERENCES users(email)
-            )
-        ''')
-        
-        mysql.connection.commit()
+        cur.execute("SELECT 1")
         cur.close()
-    
+        database_error = None
+    except (MySQLdb.Error, PoolTimeout) as e:
+        database_error = str(e)
+    ready = database_error is None
+
+    return jsonify({
+        "success": True,
+        "ready": ready,
+        "database": {"ok": ready, "error": database_error, "pool": mysql.pool.stats()},
+        "ollama": ollama.cached_health(),
+        "whisper": {"backend": stt_backend.name,
+                    "loaded": [name for name, _ in whisper_models.loaded()],
+                    "pools": [name for name, _ in whisper_models.pools()]},
+        "outbox": outbox.stats(),
+        "modules": {name: imported(name) for name in LAZY_MODULES},
+        "import_profile": import_profile()
+    }), 200 if ready else 503
+
+# ===== Server Startup =====
+
+def start_background_services(role='all'):
+    """Start per-process background threads (call once in each serving process)
+
+    The api role never transcribes, so it skips preloading Whisper.
+    """
+    if role in ('all', 'media'):
+        # Check external tools once instead of on every download (off the startup path: it imports numpy)
+        def check_tools():
+            missing = [name for name, path in timed_import("audio_ingest").find_tools().items() if not path]
+            if missing:
+                app.logger.warning(f"Missing tools (video transcription will fail): {missing}")
+        threading.Thread(target=check_tools, name="tool-check", daemon=True).start()
+        # Preload Whisper in the background so the first video is not delayed
+        start_whisper_maintenance()
+    ollama.start_health_monitor()
+    outbox.start_worker()  # Deliver anything left queued by the previous run
+    # Open the search index off the startup path so note changes are indexed as they happen
+    threading.Thread(target=get_search_index, name="search-open", daemon=True).start()
+
+mark("app loaded")
+
+if __name__ == "__main__":
+    # Development server. Production: python serve.py (see wsgi.py); schema: python migrations.py upgrade
+
+    # Skip the reloader's watcher process, which never serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
+
     # Start Flask development server
     port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=True)
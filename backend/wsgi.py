@@ -0,0 +1,10 @@
+# wsgi.py - WSGI entry point for production servers
+# gunicorn -c gunicorn.conf.py wsgi:app   (python serve.py wraps this and picks a server)
+
+import os
+
+from widviz_backend import app, start_background_services
+
+# Runs in each worker process (the app is not preloaded in the master),
+# so background threads are never lost to a fork
+start_background_services(os.getenv('WIDVIZ_ROLE', 'all'))
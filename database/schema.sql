@@ -1,21 +1,56 @@
-CREATE TABLE users (
+-- Snapshot of the schema produced by backend/migrations.py (version 5).
+-- migrations.py is the source of truth; prefer `python migrations.py upgrade`.
+-- Loading this file records the versions it contains so migrations.py only applies newer ones.
+
+CREATE TABLE IF NOT EXISTS users (
   id INT AUTO_INCREMENT PRIMARY KEY,
-  username VARCHAR(255),
-  email VARCHAR(255)
+  username VARCHAR(100) NOT NULL,
+  email VARCHAR(100) NOT NULL UNIQUE,
+  password VARCHAR(100) NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  goals_version INT NOT NULL DEFAULT 0
 );
 
-CREATE TABLE notes (
+CREATE TABLE IF NOT EXISTS notes (
   id INT AUTO_INCREMENT PRIMARY KEY,
-  user_id INT,
+  user_email VARCHAR(100) NOT NULL,
+  title VARCHAR(255) NOT NULL,
   content TEXT,
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+  deleted_at TIMESTAMP(6) NULL DEFAULT NULL,
+  FOREIGN KEY (user_email) REFERENCES users(email),
+  INDEX idx_notes_user_updated (user_email, updated_at, id),
+  INDEX idx_notes_user_created (user_email, created_at, id)
 );
 
-CREATE TABLE goals (
+CREATE TABLE IF NOT EXISTS goals (
   id INT AUTO_INCREMENT PRIMARY KEY,
-  user_id INT,
-  goal_text TEXT,
-  goal_date DATE,
+  email VARCHAR(100) NOT NULL,
+  goal_text TEXT NOT NULL,
+  goal_date DATE NOT NULL,
   status VARCHAR(20) DEFAULT 'pending',
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-); 
\ No newline at end of file
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (email) REFERENCES users(email),
+  INDEX idx_goals_email_date (email, goal_date)
+);
+
+CREATE TABLE IF NOT EXISTS session_revocations (
+  subject VARCHAR(120) PRIMARY KEY,
+  not_before DOUBLE NOT NULL,
+  expires_at DOUBLE NOT NULL,
+  INDEX idx_session_revocations_expires (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INT PRIMARY KEY,
+  description VARCHAR(255) NOT NULL,
+  applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO schema_migrations (version, description) VALUES
+  (1, 'Create users, notes and goals tables'),
+  (2, 'Add notes updated_at/deleted_at for delta sync'),
+  (3, 'Index notes and goals by user for list and calendar queries'),
+  (4, 'Add users.goals_version for calendar caching across workers'),
+  (5, 'Create session_revocations for logout across workers');
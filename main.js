@@ -59,9 +59,10 @@ function createWindow() {
 // Start Python backend server
 function startPythonBackend() {
   // Get path to Python script based on environment
+  // serve.py runs the backend under a production server (gunicorn, or waitress on Windows)
   let pythonScript = app.isPackaged
-    ? path.join(process.resourcesPath, "backend", "widviz_backend.py")
-    : path.join(__dirname, "backend", "widviz_backend.py")
+    ? path.join(process.resourcesPath, "backend", "serve.py")
+    : path.join(__dirname, "backend", "serve.py")
 
   console.log("Python script path:", pythonScript)
 
@@ -72,7 +73,7 @@ function startPythonBackend() {
   }
 
   const pythonExecutable = process.platform === "win32" ? "python" : "python3"
-  pythonProcess = spawn(pythonExecutable, [pythonScript])
+  pythonProcess = spawn(pythonExecutable, [pythonScript, "--host", "0.0.0.0", "--port", "5000", "--migrate"])
 
   // Handle Python process output
   pythonProcess.stdout.on("data", (data) => {
@@ -93,18 +94,43 @@ function startPythonBackend() {
     }
   })
 
-  // Wait for server to start
-  setTimeout(() => {
+  // Tell the renderer as soon as the backend reports ready
+  waitForBackend().then((health) => {
     const localIp = getLocalIpAddress()
-    console.log(`Server running at http://${localIp}:5000`)
+    const ready = Boolean(health && health.ready)
+    console.log(`Server running at http://${localIp}:5000 (ready: ${ready})`)
+    if (health && health.import_profile) {
+      console.log("Backend startup profile:", JSON.stringify(health.import_profile.milestones))
+    }
 
     if (mainWindow) {
       mainWindow.webContents.send("server-started", {
         url: serverUrl,
         localIp: `http://${localIp}:5000`,
+        ready,
       })
     }
-  }, 2000)
+  })
+}
+
+// Poll the readiness endpoint instead of guessing how long startup takes
+const HEALTH_POLL_MS = 100
+const HEALTH_TIMEOUT_MS = 30000
+
+async function waitForBackend() {
+  const deadline = Date.now() + HEALTH_TIMEOUT_MS
+  let health = null
+  while (Date.now() < deadline && pythonProcess && pythonProcess.exitCode === null) {
+    try {
+      const response = await fetch(`${serverUrl}/api/health`, { signal: AbortSignal.timeout(2000) })
+      health = await response.json()
+      if (health.ready) break
+    } catch (error) {
+      // Not listening yet
+    }
+    await new Promise((resolve) => setTimeout(resolve, HEALTH_POLL_MS))
+  }
+  return health
 }
 
 // App lifecycle events
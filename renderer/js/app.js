@@ -4,7 +4,13 @@ let currentUser = null
 let currentNote = null
 let currentVideoId = null
 let currentTranscript = null
+let currentJobId = null
+let notesById = new Map() // Local copy of the notes list; bodies are fetched on demand
+let notesOwner = null // Email the cached notes belong to
+let notesSyncToken = null
+let notesNextCursor = null
 let currentMonth = new Date().getMonth() + 1
+let calendarCache = new Map() // "year-month" -> { etag, data } for instant month navigation
 let currentYear = new Date().getFullYear()
 
 // DOM Elements - Authentication
@@ -66,7 +72,9 @@ const noteTitle = document.getElementById("note-title")
 const noteContent = document.getElementById("note-content")
 const saveNoteBtn = document.getElementById("save-note-btn")
 const exportNoteBtn = document.getElementById("export-note-btn")
+const exportAllNotesBtn = document.getElementById("export-all-notes-btn")
 const deleteNoteBtn = document.getElementById("delete-note-btn")
+const notesSearch = document.getElementById("notes-search")
 
 // DOM Elements - Goals
 const currentMonthDisplay = document.getElementById("current-month-display")
@@ -120,6 +128,12 @@ function checkAuthStatus() {
   if (savedUser) {
     try {
       currentUser = JSON.parse(savedUser)
+      if (!currentUser.token) {
+        // Saved before session tokens existed; log in again
+        currentUser = null
+        localStorage.removeItem("user")
+        return
+      }
       showMainApp()
     } catch (error) {
       console.error("Error parsing saved user:", error)
@@ -223,6 +237,7 @@ function setupEventListeners() {
   // YouTube Summarizer
   searchBtn.addEventListener("click", handleVideoSearch)
   backToResultsBtn.addEventListener("click", () => {
+    cancelSummaryJob()
     videoSummary.classList.add("hidden")
     searchResults.classList.remove("hidden")
   })
@@ -252,7 +267,9 @@ function setupEventListeners() {
   addNoteBtn.addEventListener("click", handleAddNote)
   saveNoteBtn.addEventListener("click", handleSaveNote)
   exportNoteBtn.addEventListener("click", handleExportNote)
+  exportAllNotesBtn.addEventListener("click", handleExportAllNotes)
   deleteNoteBtn.addEventListener("click", handleDeleteNote)
+  notesSearch.addEventListener("input", handleNotesSearchInput)
 
   // Goals
   prevMonthBtn.addEventListener("click", () => {
@@ -465,9 +482,19 @@ async function handleResetPassword(e) {
 }
 
 function handleLogout() {
+  // End the server session (best effort)
+  if (currentUser && currentUser.token) {
+    fetch(`${serverUrl}/api/logout`, {
+      method: "POST",
+      headers: { Authorization: `Bearer ${currentUser.token}` },
+    }).catch(() => {})
+  }
+
   // Clear user data
   currentUser = null
   localStorage.removeItem("user")
+  resetNotesCache()
+  calendarCache.clear()
 
   // Show login form
   mainContainer.classList.add("hidden")
@@ -577,6 +604,15 @@ function displaySearchResults(videos) {
   })
 }
 
+// Human-readable labels for summarization job stages
+const JOB_STAGE_LABELS = {
+  captions: "Checking for captions...",
+  admission: "Checking video length...",
+  download: "Downloading audio...",
+  transcribe: "Transcribing audio...",
+  summarize: "Generating summary...",
+}
+
 async function handleVideoSummary(videoId) {
   // Show summary section
   searchResults.classList.add("hidden");
@@ -584,8 +620,12 @@ async function handleVideoSummary(videoId) {
   summaryLoading.classList.remove("hidden");
   summaryText.innerHTML = "";
 
+  const loadingMessage = summaryLoading.querySelector("p");
+  const defaultMessage = loadingMessage.textContent;
+
   try {
-    const response = await fetch(`${serverUrl}/api/summarize_video`, {
+    // Queue the job; the server returns immediately with a job ID
+    const response = await fetch(`${serverUrl}/api/summarize_video/jobs`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -594,13 +634,24 @@ async function handleVideoSummary(videoId) {
     });
 
     const data = await response.json();
+    if (!data.success) {
+      summaryText.innerHTML = `<p class="error-message">${data.message}</p>`;
+      currentVideoData = null;
+      return;
+    }
 
-    if (data.success) {
+    currentJobId = data.job_id;
+    const job = await pollSummaryJob(data.job_id, loadingMessage);
+    if (!job) {
+      return; // Cancelled or superseded by another video
+    }
+
+    if (job.status === "completed") {
       // Store all video data together
       currentVideoData = {
         id: videoId,
-        transcript: data.transcript,
-        summary: data.summary,
+        transcript: job.result.transcript,
+        summary: job.result.summary,
         timestamp: Date.now() // Add timestamp for freshness
       };
 
@@ -612,15 +663,20 @@ async function handleVideoSummary(videoId) {
       quizQuestions.innerHTML = "";
       quizResults.classList.add("hidden");
     } else {
-      summaryText.innerHTML = `<p class="error-message">${data.message}</p>`;
+      summaryText.innerHTML = `<p class="error-message">Error: ${job.error || job.status}</p>`;
       currentVideoData = null; // Clear invalid data
     }
   } catch (error) {
     console.error("Video summarization error:", error);
     summaryText.innerHTML = '<p class="error-message">An error occurred while summarizing the video.</p>';
     currentVideoData = null; // Clear on error
+    currentJobId = null;
   } finally {
-    summaryLoading.classList.add("hidden");
+    // Leave the spinner alone if a newer video's job has taken over
+    if (!currentJobId) {
+      summaryLoading.classList.add("hidden");
+      loadingMessage.textContent = defaultMessage;
+    }
     
     // Add cleanup for previous video data
     if (!currentVideoData) {
@@ -630,6 +686,51 @@ async function handleVideoSummary(videoId) {
   }
 }
 
+// Poll a summarization job until it finishes; returns null if it was abandoned
+async function pollSummaryJob(jobId, loadingMessage) {
+  while (currentJobId === jobId) {
+    const response = await fetch(`${serverUrl}/api/jobs/${jobId}`)
+    const data = await response.json()
+    if (!data.success) {
+      throw new Error(data.message)
+    }
+
+    const job = data.job
+    if (["completed", "failed", "cancelled"].includes(job.status)) {
+      currentJobId = null
+      return job
+    }
+
+    // Show the summary as it streams in from the model
+    if (job.partial?.summary) {
+      summaryText.innerHTML = job.partial.summary.replace(/\n/g, "<br>").replace(/- /g, "• ")
+    }
+
+    // Show the stage currently being worked on
+    const active = job.stages.find((stage) => ["waiting", "running"].includes(stage.status))
+    if (active) {
+      const percent = Math.round(active.progress * 100)
+      loadingMessage.textContent =
+        active.status === "waiting"
+          ? "Waiting in queue..."
+          : `${JOB_STAGE_LABELS[active.name] || "Processing video..."}${percent > 0 && percent < 100 ? ` ${percent}%` : ""}`
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, 1000))
+  }
+  return null
+}
+
+// Cancel the summarization job the user navigated away from
+function cancelSummaryJob() {
+  if (!currentJobId) return
+  const jobId = currentJobId
+  currentJobId = null
+  fetch(`${serverUrl}/api/jobs/${jobId}/cancel`, { method: "POST" }).catch((error) =>
+    console.error("Error cancelling job:", error),
+  )
+}
+
 async function handleGenerateQuiz() {
   // Validate current video data
   if (!currentVideoData?.transcript) {
@@ -645,7 +746,7 @@ async function handleGenerateQuiz() {
   quizResults.classList.add("hidden");
 
   try {
-    const response = await fetch(`${serverUrl}/api/generate_quiz`, {
+    const response = await fetch(`${serverUrl}/api/generate_quiz/stream`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -656,16 +757,39 @@ async function handleGenerateQuiz() {
       }),
     });
 
-    const data = await response.json();
-
-    if (data.success) {
-      // Store quiz with video data
-      currentVideoData.quiz = data.quiz;
-      displayQuiz(data.quiz);
-    } else {
+    // Validation errors come back as plain JSON instead of a stream
+    if (!response.headers.get("Content-Type")?.includes("text/event-stream")) {
+      const data = await response.json();
       quizQuestions.innerHTML = `<p class="error-message">${data.message}</p>`;
+      currentVideoData.quiz = null;
+      return;
+    }
+
+    // Render each question as soon as the server has parsed it
+    const questions = [];
+    let failed = false;
+    await readEventStream(response, (event, data) => {
+      if (event === "question") {
+        questions.push(data.question);
+        displayQuiz(questions);
+        quizQuestions.insertAdjacentHTML(
+          "beforeend",
+          '<div class="loading-indicator"><div class="spinner"></div><p>Generating more questions...</p></div>',
+        );
+      } else if (event === "error") {
+        failed = true;
+        quizQuestions.innerHTML = `<p class="error-message">${data.message}</p>`;
+      }
+    });
+
+    if (failed) {
       currentVideoData.quiz = null; // Clear invalid quiz
+      return;
     }
+
+    // Store quiz with video data
+    currentVideoData.quiz = questions;
+    displayQuiz(questions);
   } catch (error) {
     console.error("Quiz generation error:", error);
     quizQuestions.innerHTML = '<p class="error-message">An error occurred while generating the quiz.</p>';
@@ -673,6 +797,34 @@ async function handleGenerateQuiz() {
   }
 }
 
+// Read a Server-Sent Events response body, calling onEvent(event, data) per message
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    // Messages are separated by a blank line
+    let boundary
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+
+      let event = "message"
+      let data = ""
+      message.split("\n").forEach((line) => {
+        if (line.startsWith("event: ")) event = line.slice(7)
+        else if (line.startsWith("data: ")) data += line.slice(6)
+      })
+      onEvent(event, data ? JSON.parse(data) : null)
+    }
+  }
+}
+
 function displayQuiz(questions) {
   if (questions.length === 0) {
     quizQuestions.innerHTML = "<p>No quiz questions could be generated from this video.</p>"
@@ -767,22 +919,91 @@ async function loadNotes() {
   if (!currentUser) return
 
   try {
-    const response = await fetch(`${serverUrl}/api/notes?email=${currentUser.email}`)
-    const data = await response.json()
-
-    if (data.success) {
-      displayNotes(data.notes)
+    // The first visit loads one page; afterwards only changes are fetched
+    if (notesOwner === currentUser.email) {
+      await syncNotes()
     } else {
-      notesList.innerHTML = `<p class="error-message">${data.message}</p>`
+      resetNotesCache()
+      await loadNotesPage(null)
     }
+    displayNotes()
   } catch (error) {
-    notesList.innerHTML = '<p class="error-message">An error occurred while loading notes.</p>'
+    notesList.innerHTML = `<p class="error-message">${error.message || "An error occurred while loading notes."}</p>`
     console.error("Notes loading error:", error)
   }
 }
 
-function displayNotes(notes) {
-  if (notes.length === 0) {
+function resetNotesCache() {
+  notesById = new Map()
+  notesOwner = null
+  notesSyncToken = null
+  notesNextCursor = null
+}
+
+async function loadNotesPage(cursor) {
+  const params = new URLSearchParams()
+  if (cursor) params.set("cursor", cursor)
+
+  const response = await authFetch(`${serverUrl}/api/notes/list?${params}`)
+  const data = await response.json()
+  if (!data.success) throw new Error(data.message)
+
+  data.notes.forEach((note) => notesById.set(note.id, note))
+  notesNextCursor = data.next_cursor
+  if (!cursor) {
+    notesOwner = currentUser.email
+    notesSyncToken = data.sync_token
+  }
+}
+
+async function loadMoreNotes() {
+  try {
+    await loadNotesPage(notesNextCursor)
+    displayNotes()
+  } catch (error) {
+    showToast("An error occurred while loading notes")
+    console.error("Notes loading error:", error)
+  }
+}
+
+function compareNotes(a, b) {
+  // Newest first, matching the server's (created_at, id) ordering
+  if (a.created_at !== b.created_at) return a.created_at < b.created_at ? 1 : -1
+  return b.id - a.id
+}
+
+async function syncNotes() {
+  let hasMore = true
+
+  while (hasMore) {
+    const params = new URLSearchParams()
+    if (notesSyncToken) params.set("since", notesSyncToken)
+
+    const response = await authFetch(`${serverUrl}/api/notes/sync?${params}`)
+    const data = await response.json()
+    if (!data.success) throw new Error(data.message)
+
+    data.deleted.forEach((id) => notesById.delete(id))
+
+    // Notes older than the loaded pages arrive with "Load more" instead
+    const loaded = Array.from(notesById.values()).sort(compareNotes)
+    const oldest = notesNextCursor ? loaded[loaded.length - 1] : null
+
+    data.changes.forEach((note) => {
+      if (notesById.has(note.id) || !oldest || compareNotes(note, oldest) <= 0) {
+        notesById.set(note.id, note) // Drops any cached body; it is refetched when opened
+      }
+    })
+
+    notesSyncToken = data.sync_token
+    hasMore = data.has_more
+  }
+}
+
+function displayNotes() {
+  const notes = Array.from(notesById.values()).sort(compareNotes)
+
+  if (notes.length === 0 && !notesNextCursor) {
     notesList.innerHTML = '<p class="note-item">No notes yet. Click "New Note" to create one.</p>'
     return
   }
@@ -791,10 +1012,11 @@ function displayNotes(notes) {
 
   notes.forEach((note) => {
     const date = new Date(note.created_at).toLocaleDateString()
-    const preview = note.content ? note.content.substring(0, 50) + "..." : "No content"
+    const preview = note.preview ? note.preview.substring(0, 50) + "..." : "No content"
+    const active = currentNote && currentNote.id === note.id ? " active" : ""
 
     html += `
-      <div class="note-item" data-id="${note.id}">
+      <div class="note-item${active}" data-id="${note.id}">
         <h3>${note.title}</h3>
         <p>${preview}</p>
         <small>${date}</small>
@@ -802,23 +1024,149 @@ function displayNotes(notes) {
     `
   })
 
+  if (notesNextCursor) {
+    html += '<button id="load-more-notes" class="btn btn-secondary">Load more</button>'
+  }
+
   notesList.innerHTML = html
 
   // Add event listeners to note items
-  document.querySelectorAll(".note-item").forEach((item) => {
+  document.querySelectorAll(".note-item[data-id]").forEach((item) => {
     item.addEventListener("click", () => {
-      const noteId = item.getAttribute("data-id")
-      selectNote(noteId, notes)
+      selectNote(Number(item.getAttribute("data-id")))
     })
   })
+
+  const loadMoreBtn = document.getElementById("load-more-notes")
+  if (loadMoreBtn) loadMoreBtn.addEventListener("click", loadMoreNotes)
+}
+
+// Search Functions
+let notesSearchTimer = null
+
+function escapeHtml(text) {
+  const div = document.createElement("div")
+  div.textContent = text == null ? "" : String(text)
+  return div.innerHTML
 }
 
-function selectNote(noteId, notes) {
+function handleNotesSearchInput() {
+  clearTimeout(notesSearchTimer)
+  const query = notesSearch.value.trim()
+
+  if (!query) {
+    displayNotes()
+    return
+  }
+
+  // Query once typing pauses
+  notesSearchTimer = setTimeout(() => searchNotes(query), 200)
+}
+
+async function searchNotes(query) {
+  try {
+    const params = new URLSearchParams({ q: query, limit: "20" })
+    const response = await authFetch(`${serverUrl}/api/search?${params}`)
+    const data = await response.json()
+
+    if (notesSearch.value.trim() !== query) return // Superseded by a newer query
+
+    if (!data.success) {
+      showToast(data.message)
+      return
+    }
+    displaySearchResults(data.results)
+  } catch (error) {
+    showToast("An error occurred while searching")
+    console.error("Search error:", error)
+  }
+}
+
+function displaySearchResults(results) {
+  if (results.length === 0) {
+    notesList.innerHTML = '<p class="note-item">No matches.</p>'
+    return
+  }
+
+  notesList.innerHTML = results
+    .map(
+      (hit) => `
+      <div class="note-item search-hit" data-kind="${hit.kind}" data-ref="${escapeHtml(hit.ref)}">
+        <h3>${escapeHtml(hit.title)}</h3>
+        <p>${escapeHtml(hit.snippet)}</p>
+        <small>${hit.kind === "note" ? "Note" : "Video transcript"}</small>
+      </div>
+    `,
+    )
+    .join("")
+
+  document.querySelectorAll(".search-hit").forEach((item) => {
+    item.addEventListener("click", () => {
+      const ref = item.getAttribute("data-ref")
+      if (item.getAttribute("data-kind") === "note") {
+        openSearchedNote(Number(ref))
+      } else {
+        openSearchedVideo(ref)
+      }
+    })
+  })
+}
+
+async function openSearchedNote(noteId) {
+  // Hits can be older than the pages loaded so far
+  if (!notesById.has(noteId)) {
+    try {
+      const response = await authFetch(`${serverUrl}/api/notes/get?id=${noteId}`)
+      const data = await response.json()
+
+      if (!data.success) {
+        showToast(data.message)
+        return
+      }
+      notesById.set(noteId, data.note)
+    } catch (error) {
+      showToast("An error occurred while loading the note")
+      console.error("Note loading error:", error)
+      return
+    }
+  }
+  selectNote(noteId)
+}
+
+function openSearchedVideo(videoId) {
+  // Cached transcripts make the summary come back immediately
+  navLinks.forEach((l) => {
+    if (l.getAttribute("data-page") === "summarizer") {
+      l.click()
+    }
+  })
+  handleVideoSummary(videoId)
+}
+
+async function selectNote(noteId) {
   // Find the note
-  const note = notes.find((n) => n.id == noteId)
+  const note = notesById.get(noteId)
 
   if (!note) return
 
+  // Fetch the body the first time the note is opened
+  if (note.content === undefined) {
+    try {
+      const response = await authFetch(`${serverUrl}/api/notes/get?id=${noteId}`)
+      const data = await response.json()
+
+      if (!data.success) {
+        showToast(data.message)
+        return
+      }
+      note.content = data.note.content
+    } catch (error) {
+      showToast("An error occurred while loading the note")
+      console.error("Note loading error:", error)
+      return
+    }
+  }
+
   // Store current note
   currentNote = note
 
@@ -871,7 +1219,7 @@ async function handleSaveNote() {
 
     if (currentNote) {
       // Update existing note
-      response = await fetch(`${serverUrl}/api/notes/edit`, {
+      response = await authFetch(`${serverUrl}/api/notes/edit`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -884,13 +1232,12 @@ async function handleSaveNote() {
       })
     } else {
       // Create new note
-      response = await fetch(`${serverUrl}/api/notes/add`, {
+      response = await authFetch(`${serverUrl}/api/notes/add`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
         body: JSON.stringify({
-          email: currentUser.email,
           title,
           content,
         }),
@@ -911,6 +1258,31 @@ async function handleSaveNote() {
   }
 }
 
+async function downloadFile(url, fallbackName) {
+  const response = await authFetch(url)
+  const type = response.headers.get("Content-Type") || ""
+
+  // Errors come back as JSON; files come back as binary
+  if (type.includes("application/json")) {
+    const data = await response.json()
+    throw new Error(data.message)
+  }
+
+  const disposition = response.headers.get("Content-Disposition") || ""
+  const match = disposition.match(/filename="?([^";]+)"?/)
+  const blob = await response.blob()
+
+  // Create download link
+  const objectUrl = URL.createObjectURL(blob)
+  const a = document.createElement("a")
+  a.href = objectUrl
+  a.download = match ? match[1] : fallbackName
+  document.body.appendChild(a)
+  a.click()
+  document.body.removeChild(a)
+  URL.revokeObjectURL(objectUrl)
+}
+
 async function handleExportNote() {
   if (!currentNote) {
     showToast("Please select a note to export")
@@ -918,37 +1290,25 @@ async function handleExportNote() {
   }
 
   try {
-    const response = await fetch(`${serverUrl}/api/notes/export_pdf?id=${currentNote.id}&email=${currentUser.email}`)
-    const data = await response.json()
-
-    if (data.success) {
-      // Convert base64 to blob
-      const byteCharacters = atob(data.pdf)
-      const byteNumbers = new Array(byteCharacters.length)
-      for (let i = 0; i < byteCharacters.length; i++) {
-        byteNumbers[i] = byteCharacters.charCodeAt(i)
-      }
-      const byteArray = new Uint8Array(byteNumbers)
-      const blob = new Blob([byteArray], { type: "application/pdf" })
-
-      // Create download link
-      const url = URL.createObjectURL(blob)
-      const a = document.createElement("a")
-      a.href = url
-      a.download = data.filename
-      document.body.appendChild(a)
-      a.click()
-      document.body.removeChild(a)
-      URL.revokeObjectURL(url)
-    } else {
-      showToast(data.message)
-    }
+    await downloadFile(`${serverUrl}/api/notes/download_pdf?id=${currentNote.id}`, "note.pdf")
   } catch (error) {
-    showToast("An error occurred while exporting the note")
+    showToast(error.message || "An error occurred while exporting the note")
     console.error("Note export error:", error)
   }
 }
 
+async function handleExportAllNotes() {
+  if (!currentUser) return
+
+  try {
+    showToast("Preparing your notes...")
+    await downloadFile(`${serverUrl}/api/notes/export_all?format=zip`, "widviz_notes.zip")
+  } catch (error) {
+    showToast(error.message || "An error occurred while exporting notes")
+    console.error("Notes export error:", error)
+  }
+}
+
 async function handleDeleteNote() {
   if (!currentNote) {
     showToast("Please select a note to delete")
@@ -960,7 +1320,7 @@ async function handleDeleteNote() {
   }
 
   try {
-    const response = await fetch(`${serverUrl}/api/notes/delete`, {
+    const response = await authFetch(`${serverUrl}/api/notes/delete`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -991,23 +1351,58 @@ async function handleDeleteNote() {
 async function loadGoalsCalendar() {
   if (!currentUser) return
 
+  const month = currentMonth
+  const year = currentYear
+  const cached = calendarCache.get(`${year}-${month}`)
+
+  // Show the cached month right away, then revalidate it with the server
+  if (cached) {
+    displayCalendar(cached.data.calendar_weeks, cached.data.current_month_name, cached.data.current_year)
+  }
+
   try {
-    const response = await fetch(
-      `${serverUrl}/api/goals?email=${currentUser.email}&month=${currentMonth}&year=${currentYear}`,
-    )
-    const data = await response.json()
+    const data = await fetchCalendarMonth(year, month)
+
+    if (month !== currentMonth || year !== currentYear) return // User navigated away meanwhile
 
     if (data.success) {
-      displayCalendar(data.calendar_weeks, data.current_month_name, data.current_year)
+      if (!cached || cached.data !== data) {
+        displayCalendar(data.calendar_weeks, data.current_month_name, data.current_year)
+      }
+      // Warm the neighbouring months so navigation does not wait on the network
+      const prev = month === 1 ? [year - 1, 12] : [year, month - 1]
+      const next = month === 12 ? [year + 1, 1] : [year, month + 1]
+      ;[prev, next].forEach(([y, m]) => {
+        if (!calendarCache.has(`${y}-${m}`)) fetchCalendarMonth(y, m).catch(() => {})
+      })
     } else {
       calendarGrid.innerHTML = `<p class="error-message">${data.message}</p>`
     }
   } catch (error) {
-    calendarGrid.innerHTML = '<p class="error-message">An error occurred while loading the calendar.</p>'
+    if (!cached) {
+      calendarGrid.innerHTML = '<p class="error-message">An error occurred while loading the calendar.</p>'
+    }
     console.error("Calendar loading error:", error)
   }
 }
 
+async function fetchCalendarMonth(year, month) {
+  const key = `${year}-${month}`
+  const cached = calendarCache.get(key)
+  const headers = cached ? { "If-None-Match": cached.etag } : {}
+
+  const response = await authFetch(`${serverUrl}/api/goals?month=${month}&year=${year}`, {
+    headers,
+  })
+
+  if (response.status === 304) return cached.data
+
+  const data = await response.json()
+  const etag = response.headers.get("ETag")
+  if (data.success && etag) calendarCache.set(key, { etag, data })
+  return data
+}
+
 function displayCalendar(calendarWeeks, monthName, year) {
   currentMonthDisplay.textContent = `${monthName} ${year}`
 
@@ -1096,13 +1491,12 @@ async function handleAddGoal(e) {
   }
 
   try {
-    const response = await fetch(`${serverUrl}/api/goals/add`, {
+    const response = await authFetch(`${serverUrl}/api/goals/add`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
       body: JSON.stringify({
-        email: currentUser.email,
         goal_text: text,
         goal_date: date,
       }),
@@ -1113,6 +1507,7 @@ async function handleAddGoal(e) {
     if (data.success) {
       showToast("Goal added successfully")
       goalForm.classList.add("hidden")
+      calendarCache.clear()
       loadGoalsCalendar()
     } else {
       showToast(data.message)
@@ -1125,7 +1520,7 @@ async function handleAddGoal(e) {
 
 async function handleCompleteGoal(goalId) {
   try {
-    const response = await fetch(`${serverUrl}/api/goals/complete`, {
+    const response = await authFetch(`${serverUrl}/api/goals/complete`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -1139,6 +1534,7 @@ async function handleCompleteGoal(goalId) {
 
     if (data.success) {
       showToast("Goal marked as completed")
+      calendarCache.clear()
       loadGoalsCalendar()
     } else {
       showToast(data.message)
@@ -1155,7 +1551,7 @@ async function handleDeleteGoal(goalId) {
   }
 
   try {
-    const response = await fetch(`${serverUrl}/api/goals/delete`, {
+    const response = await authFetch(`${serverUrl}/api/goals/delete`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -1169,6 +1565,7 @@ async function handleDeleteGoal(goalId) {
 
     if (data.success) {
       showToast("Goal deleted successfully")
+      calendarCache.clear()
       loadGoalsCalendar()
     } else {
       showToast(data.message)
@@ -1180,6 +1577,19 @@ async function handleDeleteGoal(goalId) {
 }
 
 // Utility Functions
+async function authFetch(url, options = {}) {
+  // Attach the session token; an expired session sends the user back to login
+  const headers = { ...(options.headers || {}), Authorization: `Bearer ${currentUser.token}` }
+  const response = await fetch(url, { ...options, headers })
+
+  if (response.status === 401) {
+    showToast("Your session has expired. Please log in again.")
+    handleLogout()
+    throw new Error("Session expired")
+  }
+  return response
+}
+
 function showToast(message) {
   const toast = document.createElement("div")
   toast.className = "toast"